@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import SchoolUpdate
+from django.utils import timezone
+from .models import OutboundEmail, SchoolUpdate
 
 @admin.register(SchoolUpdate)
 class SchoolUpdateAdmin(admin.ModelAdmin):
@@ -7,4 +8,20 @@ class SchoolUpdateAdmin(admin.ModelAdmin):
     search_fields = ('title', 'summary', 'content')
     list_filter = ('category', 'posted_on')
 
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('attempts', 'claim', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+
+    @admin.action(description="Retry selected emails now")
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='sent').update(
+            status='queued', attempts=0, claim='', next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{count} email(s) queued again.")
+
 # Register your models here.
@@ -0,0 +1,84 @@
+# coreapp/identity.py
+"""
+Session identities for teachers and students.
+
+Teachers and students don't use django.contrib.auth; their login views put
+'teacher_id' / 'student_id' in the session. IdentityMiddleware turns those
+into request.teacher and request.student, each loaded on first use and then
+reused for the rest of the request (at most one query each, plus the
+teacher's subjects). Either is falsy when nobody of that kind is logged in,
+so test them with `if request.teacher:` rather than `is None`.
+
+teacher_required / student_required replace the guard each view used to
+repeat. Staff are django.contrib.auth users; their pages use
+@user_passes_test(is_staff_user).
+"""
+from functools import wraps
+
+from django.contrib import messages
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
+
+
+def load_teacher(request):
+    from teachers.models import Subject, Teacher
+
+    teacher_id = request.session.get('teacher_id')
+    if not teacher_id:
+        return None
+    # nearly every teacher page lists the teacher's subjects with their class
+    subjects = Subject.objects.select_related('class_assigned').order_by('class_assigned__name', 'name')
+    return (
+        Teacher.objects.filter(id=teacher_id)
+        .prefetch_related(Prefetch('subjects', queryset=subjects))
+        .first()
+    )
+
+
+def load_student(request):
+    from students.models import Student
+
+    student_id = request.session.get('student_id')
+    if not student_id:
+        return None
+    return Student.objects.select_related('class_assigned').filter(id=student_id).first()
+
+
+class IdentityMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.teacher = SimpleLazyObject(lambda: load_teacher(request))
+        request.student = SimpleLazyObject(lambda: load_student(request))
+        return self.get_response(request)
+
+
+def _guard(attr, login_url, message):
+    def decorator(view_func=None, *, json=False):
+        def wrap(view):
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if not getattr(request, attr):
+                    if json:
+                        return JsonResponse({'error': message}, status=403)
+                    messages.error(request, message)
+                    return redirect(login_url)
+                return view(request, *args, **kwargs)
+            return wrapper
+        return wrap(view_func) if view_func is not None else wrap
+    return decorator
+
+
+teacher_required = _guard('teacher', 'teacher_login', "Please log in first.")
+teacher_required.__doc__ = "Let only a logged-in teacher in; use json=True for endpoints."
+
+student_required = _guard('student', 'students:student_login', "Please log in to continue.")
+student_required.__doc__ = "Let only a logged-in student in; use json=True for endpoints."
+
+
+def is_staff_user(user):
+    """Allow only users in 'Staff' group or superusers."""
+    return user.groups.filter(name='Staff').exists() or user.is_superuser
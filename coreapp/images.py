@@ -0,0 +1,197 @@
+# coreapp/images.py
+"""
+Resized renditions of uploaded photos.
+
+Uploads are kept as they came, often several MB straight off a phone.
+generate() makes WebP and JPEG copies at RENDITION_WIDTHS (never wider than
+the original) and stores them in the same storage as
+
+    renditions/<first 16 hex digits of the original's SHA-256>/<width>.<ext>
+
+Because the name comes from the file's content, an unchanged photo is never
+resized twice, and a replaced one gets new names, so they can be cached
+forever. What was made for each upload is recorded in a small manifest,
+renditions/manifests/<md5 of the upload's name>.json, and in the cache, so
+pages never reopen the original.
+
+Renditions are made once the transaction saving an upload commits (see the
+receivers in staff.models and students.models), and `manage.py
+make_renditions` makes them for photos uploaded before this existed. Page
+views never resize anything: until an upload's renditions exist, they show
+the original. In templates, {% responsive_image %} from the `images` tag
+library turns them into a <picture> with srcset and sizes.
+"""
+import hashlib
+import io
+import json
+import logging
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 1024)
+# (extension, Pillow format, MIME type), preferred first
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+QUALITY = {'WEBP': 80, 'JPEG': 82}
+DIRECTORY = 'renditions'
+CACHE_PREFIX = 'renditions:'
+# how long a page remembers that an upload has no renditions yet
+MISSING_TIMEOUT = 60
+
+
+def _cache_key(name):
+    return CACHE_PREFIX + hashlib.md5(name.encode()).hexdigest()
+
+
+def _manifest_name(name):
+    return f"{DIRECTORY}/manifests/{hashlib.md5(name.encode()).hexdigest()}.json"
+
+
+def _write_manifest(field_file, names):
+    storage = field_file.storage
+    manifest = _manifest_name(field_file.name)
+    storage.delete(manifest)  # storage.save() would pick a new name instead of replacing it
+    storage.save(manifest, ContentFile(json.dumps(names).encode()))
+
+
+def _read_manifest(field_file):
+    try:
+        with field_file.storage.open(_manifest_name(field_file.name), 'rb') as manifest:
+            return {ext: [tuple(r) for r in group] for ext, group in json.load(manifest).items()}
+    except (OSError, ValueError):
+        return None
+
+
+def _widths(source_width):
+    widths = [w for w in RENDITION_WIDTHS if w < source_width]
+    if len(widths) < len(RENDITION_WIDTHS):
+        widths.append(source_width)  # a small original is used at its own width
+    return widths
+
+
+def _flatten(image):
+    """An RGB copy of `image` with any transparency laid over white (for JPEG)."""
+    if image.mode == 'RGB':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def generate(field_file):
+    """
+    Make whichever renditions of `field_file` don't exist yet. Returns
+    {ext: [(storage name, width), ...]} with widths ascending.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+
+    image = Image.open(io.BytesIO(data))  # reads the header only
+    # JPEGs can decode straight at a fraction of their size, which is far
+    # cheaper than decoding a 12-megapixel photo and shrinking it
+    largest = RENDITION_WIDTHS[-1]
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    widths = _widths(image.width)
+
+    names = {
+        ext: [(f"{DIRECTORY}/{digest}/{w}.{ext}", w) for w in widths]
+        for ext, _, _ in FORMATS
+    }
+    missing = {name for group in names.values() for name, _ in group if not storage.exists(name)}
+    if not missing:
+        return names
+
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    # shrink largest first, each size from the one before
+    resized = image
+    for width in reversed(widths):
+        height = max(1, round(image.height * width / image.width))
+        if resized.size != (width, height):
+            resized = resized.resize((width, height), Image.LANCZOS)
+        for ext, fmt, _ in FORMATS:
+            name = f"{DIRECTORY}/{digest}/{width}.{ext}"
+            if name not in missing:
+                continue
+            buffer = io.BytesIO()
+            out = _flatten(resized) if fmt == 'JPEG' else resized
+            out.save(buffer, fmt, quality=QUALITY[fmt], optimize=True)
+            saved = storage.save(name, ContentFile(buffer.getvalue()))
+            if saved != name:
+                # another worker wrote it first; keep theirs
+                storage.delete(saved)
+    return names
+
+
+def make_renditions(field_file):
+    """
+    Make (or find) the renditions of `field_file` and record them. Returns
+    what renditions() will, and logs uploads that can't be read as images.
+    """
+    if not field_file:
+        return None
+    try:
+        found = generate(field_file)
+        _write_manifest(field_file, found)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning("No renditions for %s: %s", field_file.name, exc)
+        found = {}
+    cache.set(_cache_key(field_file.name), found, None if found else MISSING_TIMEOUT)
+    return found or None
+
+
+def renditions(field_file):
+    """
+    The renditions recorded for `field_file`, or None when there is no file
+    or none have been made yet. Never opens or resizes the original.
+    """
+    if not field_file:
+        return None
+    key = _cache_key(field_file.name)
+    found = cache.get(key)
+    if found is None:
+        found = _read_manifest(field_file) or {}
+        cache.set(key, found, None if found else MISSING_TIMEOUT)
+    return found or None
+
+
+def prepare_renditions(instance, *field_names):
+    """
+    Once the current transaction commits, make renditions for the given
+    image fields. Uploads already seen are skipped: storage never reuses a
+    name, so a known name means an unchanged file.
+    """
+    def run():
+        for field_name in field_names:
+            field_file = getattr(instance, field_name)
+            if field_file and not renditions(field_file):
+                make_renditions(field_file)
+    transaction.on_commit(run)
+
+
+def srcset(field_file, ext):
+    found = renditions(field_file)
+    if not found:
+        return ''
+    storage = field_file.storage
+    return ', '.join(f"{storage.url(name)} {width}w" for name, width in found[ext])
+
+
+def rendition_url(field_file, width):
+    """URL of the JPEG rendition closest to `width` without going under it (or the original)."""
+    found = renditions(field_file)
+    if not found:
+        return field_file.url if field_file else ''
+    group = found['jpg']
+    name = next((name for name, w in group if w >= width), group[-1][0])
+    return field_file.storage.url(name)
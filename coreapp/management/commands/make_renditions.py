@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from coreapp.images import make_renditions, renditions
+
+
+class Command(BaseCommand):
+    help = (
+        "Make resized renditions for every uploaded image that doesn't have them yet, "
+        "e.g. photos uploaded before renditions existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Check every image again, even ones already done.")
+
+    def handle(self, *args, **options):
+        made = skipped = failed = 0
+        for model in apps.get_models():
+            fields = [f.name for f in model._meta.fields if isinstance(f, models.ImageField)]
+            if not fields:
+                continue
+            for instance in model.objects.only('pk', *fields).iterator():
+                for name in fields:
+                    field_file = getattr(instance, name)
+                    if not field_file:
+                        continue
+                    if not options['force'] and renditions(field_file):
+                        skipped += 1
+                    elif make_renditions(field_file):
+                        made += 1
+                    else:
+                        failed += 1
+
+        line = f"Made renditions for {made} image(s); {skipped} already had them, {failed} could not be read."
+        self.stdout.write(self.style.WARNING(line) if failed else self.style.SUCCESS(line))
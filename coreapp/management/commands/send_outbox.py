@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from coreapp.models import OutboundEmail
+from coreapp.outbox import drain
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued emails over one SMTP connection, retrying failures with backoff. "
+        "Use --loop to keep running as the outbox worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running until interrupted.")
+        parser.add_argument('--interval', type=float, default=10.0, help="Seconds between drains with --loop.")
+        parser.add_argument('--batch-size', type=int, default=50, help="Emails claimed at a time.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                stats = drain(options['batch_size'])
+                if stats or not options['loop']:
+                    self.report(stats)
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def report(self, stats):
+        waiting = OutboundEmail.objects.filter(status='queued').count()
+        dead = OutboundEmail.objects.filter(status='dead').count()
+        line = (
+            f"Sent {stats['sent']}, {stats['retrying']} to retry, {stats['dead']} given up; "
+            f"{waiting} still queued, {dead} dead in total."
+        )
+        self.stdout.write(self.style.WARNING(line) if stats['dead'] else self.style.SUCCESS(line))
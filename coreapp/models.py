@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class SchoolUpdate(models.Model):
     CATEGORY_CHOICES = [
@@ -15,3 +16,37 @@ class SchoolUpdate(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting to be sent, or the record of one that was. Views queue
+    mail through coreapp.outbox instead of talking to SMTP themselves.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Gave up'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # when a queued email is next due; for 'sending', when the claim expires
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
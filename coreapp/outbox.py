@@ -0,0 +1,199 @@
+# coreapp/outbox.py
+"""
+Outgoing email, queued in the database and sent in the background.
+
+Views call enqueue() (or enqueue_many()) instead of send_mail(). This only
+inserts an OutboundEmail row, so a page never waits on the SMTP relay.
+drain() claims due rows in batches and sends them all over one SMTP
+connection, instead of one TLS handshake per email.
+
+A failed email is retried with exponential backoff (OUTBOX_RETRY_BASE
+seconds, doubling, capped at OUTBOX_RETRY_MAX). After OUTBOX_MAX_ATTEMPTS
+tries, or straight away when the relay refuses it outright (an unknown
+recipient, say), it is marked 'dead' and left for staff to look at in the
+admin.
+
+Who sends:
+    `manage.py send_outbox --loop` is the worker, and also picks up retries.
+    With OUTBOX_DRAIN_ON_COMMIT (the default) each enqueue also starts a
+    drain on a background thread once its transaction commits, so mail goes
+    out promptly even when no worker is running.
+
+Claims expire after CLAIM_TIMEOUT, so a drain that died halfway through
+doesn't strand its batch.
+"""
+import logging
+import random
+import smtplib
+import threading
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+CLAIM_TIMEOUT = timedelta(minutes=10)
+DUE_STATUSES = ('queued', 'sending')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(subject, body, recipients, from_email=None):
+    """Queue one email; it is sent after the current transaction commits."""
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+    _drain_on_commit()
+    return email
+
+
+def enqueue_many(messages, from_email=None):
+    """Queue (subject, body, recipients) tuples with a single insert."""
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    emails = OutboundEmail.objects.bulk_create(
+        OutboundEmail(subject=subject, body=body, from_email=from_email, recipients=list(recipients))
+        for subject, body, recipients in messages
+    )
+    if emails:
+        _drain_on_commit()
+    return emails
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts` (1-based), with a little jitter."""
+    base = _setting('OUTBOX_RETRY_BASE', 60)
+    delay = min(base * 2 ** (attempts - 1), _setting('OUTBOX_RETRY_MAX', 6 * 3600))
+    return delay * random.uniform(1.0, 1.1)
+
+
+def _permanent(exc):
+    """Whether retrying can't help: the relay rejected this email itself."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return False  # our credentials, not the email; fix and retry
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code >= 500
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    due = OutboundEmail.objects.filter(status__in=DUE_STATUSES, next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # re-checks the due condition, so rows another drain took meanwhile are skipped
+    due.filter(pk__in=ids).update(status='sending', claim=token, next_attempt_at=now + CLAIM_TIMEOUT)
+    return list(OutboundEmail.objects.filter(claim=token, status='sending').order_by('id'))
+
+
+def _send(smtp, batch):
+    """Send a claimed batch; returns (sent ids, [(email, exception)], relay reachable)."""
+    sent, failed = [], []
+    for i, email in enumerate(batch):
+        try:
+            smtp.open()  # no-op while the connection is up
+        except Exception as exc:
+            # the relay is unreachable: retry the rest later rather than
+            # waiting out a connect timeout for each one
+            failed.extend((e, exc) for e in batch[i:])
+            return sent, failed, False
+        message = EmailMessage(email.subject, email.body, email.from_email, email.recipients, connection=smtp)
+        try:
+            smtp.send_messages([message])
+        except Exception as exc:
+            failed.append((email, exc))
+            smtp.close()  # it may be half-broken; the next email reconnects
+        else:
+            sent.append(email.pk)
+    return sent, failed, True
+
+
+def _record(sent, failed, stats):
+    now = timezone.now()
+    if sent:
+        OutboundEmail.objects.filter(pk__in=sent).update(
+            status='sent', sent_at=now, claim='', last_error='',
+        )
+        stats['sent'] += len(sent)
+    max_attempts = _setting('OUTBOX_MAX_ATTEMPTS', 8)
+    for email, exc in failed:
+        email.attempts += 1
+        email.claim = ''
+        email.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+        if email.attempts >= max_attempts or _permanent(exc):
+            email.status = 'dead'
+            stats['dead'] += 1
+            logger.error("Gave up on email %s to %s: %s", email.pk, email.recipients, email.last_error)
+        else:
+            email.status = 'queued'
+            email.next_attempt_at = now + timedelta(seconds=backoff(email.attempts))
+            stats['retrying'] += 1
+        email.save(update_fields=['attempts', 'claim', 'last_error', 'status', 'next_attempt_at'])
+
+
+def drain(batch_size=50):
+    """
+    Send every email that is due, batch_size at a time, over one SMTP
+    connection. Returns a Counter of sent / retrying / dead.
+    """
+    stats = Counter()
+    smtp = get_connection(fail_silently=False)
+    try:
+        while True:
+            batch = _claim(batch_size)
+            if not batch:
+                break
+            sent, failed, reachable = _send(smtp, batch)
+            _record(sent, failed, stats)
+            if not reachable:
+                break
+    finally:
+        smtp.close()
+    return stats
+
+
+# --------------------------
+# In-process sending
+# --------------------------
+_drain_lock = threading.Lock()
+_drain_wanted = threading.Event()
+
+
+def _drain_on_commit():
+    if _setting('OUTBOX_DRAIN_ON_COMMIT', True):
+        transaction.on_commit(drain_in_background)
+
+
+def drain_in_background():
+    """Drain on a daemon thread; at most one per process, rerun if more mail arrives meanwhile."""
+    _drain_wanted.set()
+    if not _drain_lock.acquire(blocking=False):
+        return  # the running drain will see _drain_wanted
+
+    def run():
+        try:
+            while _drain_wanted.is_set():
+                _drain_wanted.clear()
+                drain()
+        except Exception:
+            logger.exception("Background outbox drain failed")
+        finally:
+            connection.close()
+            _drain_lock.release()
+        if _drain_wanted.is_set():
+            drain_in_background()  # enqueued between the last drain and the release
+
+    threading.Thread(target=run, name='outbox-drain', daemon=True).start()
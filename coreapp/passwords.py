@@ -0,0 +1,53 @@
+# coreapp/passwords.py
+"""
+Bounded password hashing for the login and sign-up views.
+
+PBKDF2 is deliberately slow. Run without a limit, a burst of logins ties up
+every request worker on hashing. Here at most PASSWORD_HASHER_WORKERS
+hashes run at once in each process. A request that finds them all busy
+waits at most PASSWORD_HASHER_WAIT seconds (none by default) and then gets
+HasherBusy, so the view can answer "try again" straight away instead of
+queueing behind the burst.
+
+The hash runs on the request's own thread; handing it to another thread
+would only add a queue, since the request has to wait for the answer
+anyway.
+
+Only views use this. Student/Teacher.set_password and check_password stay
+plain, so admin actions and commands never see HasherBusy.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+WORKERS = getattr(settings, 'PASSWORD_HASHER_WORKERS', 2)
+WAIT_SECONDS = getattr(settings, 'PASSWORD_HASHER_WAIT', 0)
+
+_slots = threading.BoundedSemaphore(WORKERS)
+
+
+class HasherBusy(Exception):
+    """Too many passwords are being hashed right now; try again shortly."""
+
+
+@contextmanager
+def _slot():
+    acquired = _slots.acquire(timeout=WAIT_SECONDS) if WAIT_SECONDS else _slots.acquire(blocking=False)
+    if not acquired:
+        raise HasherBusy
+    try:
+        yield
+    finally:
+        _slots.release()
+
+
+def verify_password(raw_password, encoded):
+    with _slot():
+        return check_password(raw_password, encoded)
+
+
+def hash_password(raw_password):
+    with _slot():
+        return make_password(raw_password)
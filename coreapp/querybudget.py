@@ -0,0 +1,155 @@
+# coreapp/querybudget.py
+"""
+Query budgets.
+
+QueryRecorder hooks into connection.execute_wrapper and records how many
+queries ran, how long they took in the database, and how often each
+statement repeated (numbers, strings and IN lists collapsed), which is what
+gives an N+1 away.
+
+Views declare a budget with @query_budget(...). QueryBudgetMiddleware
+records every request and, when a view goes over its budget or repeats a
+statement QUERY_BUDGET_REPEAT_THRESHOLD times, logs a warning (or raises
+QueryBudgetExceeded with QUERY_BUDGET_STRICT = True). Tests use
+QueryBudgetTestMixin.assertQueryBudget() for the same check.
+
+Settings:
+    QUERY_BUDGET_ENABLED           record requests at all (default: DEBUG)
+    QUERY_BUDGET_STRICT            raise instead of logging (default: False)
+    QUERY_BUDGET_DEFAULT           budget for views without one (default: None)
+    QUERY_BUDGET_REPEAT_THRESHOLD  repeats that count as an N+1 (default: 5)
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?|[-\d.]+)\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """An execute_wrapper that counts, times and groups the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[normalize_sql(sql)] += 1
+
+    @property
+    def ms(self):
+        return self.seconds * 1000
+
+    def repeated(self, threshold=2):
+        """(statement, times) for statements run at least `threshold` times, most first."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+    def report(self, threshold=2):
+        lines = [f"{self.count} queries, {self.ms:.1f} ms in the database"]
+        for sql, n in self.repeated(threshold):
+            lines.append(f"  {n}x {sql[:300]}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries(using=None):
+    """Record queries on one connection, or on every configured connection."""
+    recorder = QueryRecorder()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def check_budget(recorder, max_queries=None, max_ms=None, repeat_threshold=None):
+    """A list of the ways `recorder` went over budget (empty when within it)."""
+    problems = []
+    if max_queries is not None and recorder.count > max_queries:
+        problems.append(f"{recorder.count} queries (budget {max_queries})")
+    if max_ms is not None and recorder.ms > max_ms:
+        problems.append(f"{recorder.ms:.1f} ms in the database (budget {max_ms} ms)")
+    if repeat_threshold is not None:
+        for sql, n in recorder.repeated(repeat_threshold):
+            problems.append(f"same query run {n} times: {sql[:200]}")
+    return problems
+
+
+def query_budget(max_queries, max_ms=None):
+    """Declare how many queries (and optionally DB milliseconds) a view may use."""
+    def decorator(view_func):
+        # other decorators copy the attribute along with __dict__
+        view_func.query_budget = (max_queries, max_ms)
+        return view_func
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as recorder:
+            response = self.get_response(request)
+
+        budget = getattr(request, '_query_budget', None)
+        if budget is None:
+            budget = (getattr(settings, 'QUERY_BUDGET_DEFAULT', None), None)
+        threshold = getattr(settings, 'QUERY_BUDGET_REPEAT_THRESHOLD', 5)
+
+        response['X-Query-Count'] = str(recorder.count)
+        response['X-Query-Time-Ms'] = f"{recorder.ms:.1f}"
+
+        problems = check_budget(recorder, *budget, repeat_threshold=threshold)
+        if problems:
+            message = f"{request.method} {request.path}: " + '; '.join(problems)
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(f"{message}\n{recorder.report(threshold)}")
+            logger.warning("%s\n%s", message, recorder.report(threshold))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+
+
+class QueryBudgetTestMixin:
+    """For TestCase: `with self.assertQueryBudget(5): self.client.get(url)`."""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, max_ms=None, repeat_threshold=3):
+        with record_queries() as recorder:
+            yield recorder
+        problems = check_budget(recorder, max_queries, max_ms, repeat_threshold)
+        if problems:
+            self.fail('; '.join(problems) + '\n' + recorder.report())
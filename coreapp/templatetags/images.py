@@ -0,0 +1,50 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from coreapp.images import FORMATS, rendition_url, renditions, srcset
+
+register = template.Library()
+
+# the width browsers without srcset support get
+FALLBACK_WIDTH = 640
+
+
+@register.simple_tag
+def responsive_image(field_file, sizes='100vw', **attrs):
+    """
+    {% responsive_image item.image sizes="(min-width: 992px) 33vw, 100vw" alt=item.title class="..." %}
+
+    A <picture> offering the WebP and JPEG renditions of an uploaded image,
+    lazily loaded unless loading="eager" is given. Falls back to a plain <img>
+    of the original when no renditions can be made.
+    """
+    if not field_file:
+        return ''
+    attrs.setdefault('alt', '')
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    extra = format_html_join(' ', '{}="{}"', attrs.items())
+
+    if not renditions(field_file):
+        return format_html('<img src="{}" {}>', field_file.url, extra)
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset(field_file, ext), sizes) for ext, _, mime in FORMATS[:-1]),
+    )
+    # display: contents keeps <picture> out of the layout, so the <img> sizes
+    # against its container exactly as it did before
+    return format_html(
+        '<picture style="display: contents">{}<img src="{}" srcset="{}" sizes="{}" {}></picture>',
+        sources,
+        rendition_url(field_file, FALLBACK_WIDTH),
+        srcset(field_file, FORMATS[-1][0]),
+        sizes,
+        extra,
+    )
+
+
+@register.simple_tag
+def image_url(field_file, width):
+    """URL of a rendition at least `width` pixels wide, e.g. for a lightbox."""
+    return rendition_url(field_file, width)
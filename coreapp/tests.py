@@ -1,3 +1,286 @@
-from django.test import TestCase
+import io
+import socket
+import socketserver
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+from django.utils import timezone
+
+from coreapp.images import renditions
+from coreapp.models import OutboundEmail
+from coreapp.outbox import drain, enqueue
+from coreapp.querybudget import (
+    QueryBudgetExceeded,
+    QueryBudgetTestMixin,
+    check_budget,
+    normalize_sql,
+    query_budget,
+    record_queries,
+)
+
+
+@query_budget(2)
+def n_plus_one_view(request):
+    for pk in range(1, 7):
+        User.objects.filter(pk=pk).exists()
+    return HttpResponse("ok")
+
+
+@query_budget(2)
+def cheap_view(request):
+    User.objects.filter(pk__in=[1, 2, 3]).exists()
+    return HttpResponse("ok")
+
+
+urlpatterns = [
+    path('n-plus-one/', n_plus_one_view),
+    path('cheap/', cheap_view),
+]
+
+
+class NormalizeSqlTests(TestCase):
+    def test_literals_and_in_lists_collapse(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 12 AND b = 'x''y' AND c IN (%s, %s, %s)"),
+            normalize_sql("SELECT * FROM t WHERE a = 7 AND b = 'z' AND c IN (%s)"),
+        )
+
+
+class RecorderTests(TestCase):
+    def test_groups_repeated_queries(self):
+        with record_queries() as recorder:
+            for pk in range(4):
+                User.objects.filter(pk=pk).first()
+            User.objects.count()
+        self.assertEqual(recorder.count, 5)
+        self.assertEqual(len(recorder.repeated()), 1)
+        self.assertEqual(recorder.repeated()[0][1], 4)
+        self.assertEqual(len(check_budget(recorder, max_queries=5)), 0)
+        self.assertEqual(len(check_budget(recorder, max_queries=4, repeat_threshold=3)), 2)
+
+
+class AssertQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    def test_fails_on_n_plus_one(self):
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget(10, repeat_threshold=3):
+                for pk in range(3):
+                    User.objects.filter(pk=pk).exists()
+
+    def test_passes_within_budget(self):
+        with self.assertQueryBudget(1):
+            User.objects.exists()
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    MIDDLEWARE=['coreapp.querybudget.QueryBudgetMiddleware'],
+    QUERY_BUDGET_ENABLED=True,
+    QUERY_BUDGET_REPEAT_THRESHOLD=5,
+)
+class MiddlewareTests(TestCase):
+    def test_headers_report_queries(self):
+        response = self.client.get('/cheap/')
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertIn('X-Query-Time-Ms', response)
+
+    def test_over_budget_logs_warning(self):
+        with self.assertLogs('coreapp.querybudget', 'WARNING') as logs:
+            self.client.get('/n-plus-one/')
+        self.assertIn('6 queries (budget 2)', logs.output[0])
+        self.assertIn('same query run 6 times', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_mode_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/n-plus-one/')
+
+    @override_settings(QUERY_BUDGET_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn('X-Query-Count', self.client.get('/cheap/'))
+
+
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, width, height):
+        from PIL import Image
+        from staff.models import GalleryItem
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), 'red').save(buffer, 'JPEG')
+        with self.captureOnCommitCallbacks(execute=True):
+            return GalleryItem.objects.create(
+                title='Sports day', image=SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg'),
+            )
+
+    def render(self, item):
+        template = Template('{% load images %}{% responsive_image item.image sizes="50vw" alt=item.title %}')
+        return template.render(Context({'item': item}))
+
+    def test_large_photo_gets_every_width_in_both_formats(self):
+        item = self.upload(2400, 1600)
+        found = renditions(item.image)
+        self.assertEqual([w for _, w in found['webp']], [320, 640, 1024])
+        self.assertTrue(all(item.image.storage.exists(name) for name, _ in found['jpg']))
+
+        html = self.render(item)
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('1024.webp 1024w', html)
+        self.assertIn('src="/media/renditions/', html)
+        self.assertIn('alt="Sports day"', html)
+
+    def test_small_photo_is_not_enlarged(self):
+        item = self.upload(200, 150)
+        self.assertEqual([w for _, w in renditions(item.image)['jpg']], [200])
+
+    def test_renditions_survive_a_cache_flush(self):
+        item = self.upload(800, 600)
+        cache.clear()
+        with mock.patch('coreapp.images.generate') as generate:
+            self.assertEqual([w for _, w in renditions(item.image)['jpg']], [320, 640, 800])
+        generate.assert_not_called()  # read back from the manifest
+
+    def test_page_views_never_resize(self):
+        from staff.models import GalleryItem
+
+        # saved without its commit callbacks running, as for photos from before renditions
+        item = GalleryItem.objects.create(title='Old', image=SimpleUploadedFile('old.jpg', b'x', 'image/jpeg'))
+        with mock.patch('coreapp.images.generate') as generate:
+            html = self.render(item)
+        generate.assert_not_called()
+        self.assertEqual(html, f'<img src="{item.image.url}" alt="Old" loading="lazy" decoding="async">')
+
+    def test_command_makes_missing_renditions(self):
+        from PIL import Image
+        from staff.models import GalleryItem
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (700, 500), 'blue').save(buffer, 'JPEG')
+        item = GalleryItem.objects.create(
+            title='Before', image=SimpleUploadedFile('before.jpg', buffer.getvalue(), 'image/jpeg'),
+        )
+        self.assertIsNone(renditions(item.image))
+
+        cache.clear()
+        out = io.StringIO()
+        call_command('make_renditions', stdout=out)
+        self.assertIn('Made renditions for 1 image(s)', out.getvalue())
+        self.assertEqual([w for _, w in renditions(item.image)['webp']], [320, 640, 700])
+
+    def test_unreadable_upload_falls_back_to_the_original(self):
+        from staff.models import GalleryItem
+
+        with self.assertLogs('coreapp.images', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            item = GalleryItem.objects.create(
+                title='Broken', image=SimpleUploadedFile('photo.jpg', b'not an image', 'image/jpeg'),
+            )
+        html = self.render(item)
+        self.assertEqual(html, f'<img src="{item.image.url}" alt="Broken" loading="lazy" decoding="async">')
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; refuses any recipient at bounce.example.com."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost ready')
+        in_data = False
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    self.server.delivered += 1
+                    self.reply('250 queued')
+                continue
+            verb = line[:4].upper()
+            if not line or verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            if verb == 'RCPT' and 'bounce.example.com' in line:
+                self.reply('550 no such user')
+            elif verb == 'DATA':
+                in_data = True
+                self.reply('354 go ahead')
+            else:
+                self.reply('250 ok')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+    EMAIL_HOST='127.0.0.1', EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+    EMAIL_TIMEOUT=5,
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeSMTPHandler)
+        self.server.daemon_threads = True
+        self.server.connections = self.server.delivered = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        port = override_settings(EMAIL_PORT=self.server.server_address[1])
+        port.enable()
+        self.addCleanup(port.disable)
+
+    def test_batch_goes_out_over_one_connection(self):
+        for i in range(5):
+            enqueue(f"Notice {i}", "Body", [f"parent{i}@example.com"])
+        stats = drain()
+        self.assertEqual(stats['sent'], 5)
+        self.assertEqual((self.server.connections, self.server.delivered), (1, 5))
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+
+    def test_refused_recipient_is_dead_lettered_and_the_rest_still_sent(self):
+        enqueue("Hello", "Body", ["nobody@bounce.example.com"])
+        enqueue("Hello", "Body", ["parent@example.com"])
+        stats = drain()
+        self.assertEqual((stats['sent'], stats['dead']), (1, 1))
+        dead = OutboundEmail.objects.get(status='dead')
+        self.assertEqual(dead.attempts, 1)
+        self.assertIn('550', dead.last_error)
+
+    def test_unreachable_relay_backs_off_then_gives_up(self):
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        port = closed.getsockname()[1]
+        closed.close()
+        email = enqueue("Hello", "Body", ["parent@example.com"])
+
+        with self.settings(EMAIL_PORT=port, OUTBOX_MAX_ATTEMPTS=2):
+            self.assertEqual(drain()['retrying'], 1)
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ('queued', 1))
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+            self.assertEqual(drain()['retrying'], 0)  # not due yet
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(drain()['dead'], 1)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_contact_form_queues_instead_of_sending(self):
+        self.client.post(reverse('public:contact_us'), {'name': 'Ann', 'email': 'ann@example.com', 'message': 'Hi'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.get().status, 'queued')
+        drain()
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,86 @@
+# coreapp/throttle.py
+"""
+Token-bucket throttling for login-style endpoints.
+
+Each bucket lives in the default cache under (scope, key). It holds up to
+`burst` tokens, refills at `rate` tokens per `per` seconds, and each attempt
+spends one. Buckets are checked before any password is hashed, so a
+credential-stuffing run costs almost nothing once it is throttled.
+
+Each attempt spends from three buckets:
+  * 'ip': per client address, capping how many identities one client tries;
+  * 'identity': per (identity, client IP), the tight limit a single client
+    guessing one account runs into first;
+  * 'account': per identity alone, with a looser limit, so guesses spread
+    across many addresses still add up to a per-account ceiling. It is kept
+    loose because anyone who knows a registration number can spend it, so
+    the owner is only locked out by a sustained attack.
+
+The read-modify-write is not atomic, so two workers racing on one bucket
+can both spend the same token; that slack is fine for throttling.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# scope: (attempts, per seconds)
+DEFAULT_LIMITS = {
+    'identity': (5, 300),   # per registration number / national ID, from one client
+    'account': (20, 900),   # per registration number / national ID, from anywhere
+    'ip': (30, 300),        # per client address
+}
+
+
+def _limits():
+    return {**DEFAULT_LIMITS, **getattr(settings, 'LOGIN_THROTTLE_LIMITS', {})}
+
+
+def take_token(scope, key, rate, per, burst=None):
+    """
+    Spend one token from the (scope, key) bucket. Returns 0 when allowed,
+    otherwise the seconds until the next token is due.
+    """
+    burst = burst or rate
+    cache_key = f'throttle:{scope}:{key}'
+    now = time.time()
+    tokens, updated = cache.get(cache_key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * rate / per)
+    if tokens < 1:
+        cache.set(cache_key, (tokens, now), per)
+        return (1 - tokens) * per / rate
+    cache.set(cache_key, (tokens - 1, now), per)
+    return 0
+
+
+def client_ip(request):
+    if getattr(settings, 'THROTTLE_TRUST_FORWARDED_FOR', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def throttle_attempt(request, action, identity=None):
+    """
+    Spend an attempt for this client IP and, if given, this identity both
+    from this IP and overall. Returns 0 when the attempt may go ahead, else
+    seconds to wait.
+    """
+    limits = _limits()
+    ip = client_ip(request)
+    wait = take_token(f'{action}:ip', ip, *limits['ip'])
+    if identity:
+        identity = str(identity).strip().lower()
+        wait = max(
+            wait,
+            take_token(f'{action}:identity', f"{identity}@{ip}", *limits['identity']),
+            take_token(f'{action}:account', identity, *limits['account']),
+        )
+    return wait
+
+
+def throttled_message(wait):
+    minutes, seconds = divmod(int(wait) + 1, 60)
+    delay = f"{minutes} min {seconds} s" if minutes else f"{seconds} s"
+    return f"Too many attempts. Please try again in {delay}."
@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib import messages
+from coreapp.outbox import enqueue
 from staff.models import GalleryItem, StudentLifeItem, LeadershipProfile
 
 def about_us(request):
@@ -20,7 +20,7 @@ def contact_us(request):
         full_message = f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}"
 
         try:
-            send_mail(subject, full_message, settings.DEFAULT_FROM_EMAIL, [settings.ADMIN_EMAIL])
+            enqueue(subject, full_message, [settings.ADMIN_EMAIL])
             messages.success(request, 'Your message has been sent successfully!')
         except Exception as e:
             messages.error(request, f'Error sending message: {e}')
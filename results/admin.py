@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Term, Mark
+from .models import Term, Mark, TermSummary, GradeBoundary
 
 @admin.register(Term)
 class TermAdmin(admin.ModelAdmin):
@@ -13,4 +13,17 @@ class MarkAdmin(admin.ModelAdmin):
     list_filter = ('term', 'subject')
     search_fields = ('student__full_name', 'student__registration_number', 'subject__name')
 
+@admin.register(GradeBoundary)
+class GradeBoundaryAdmin(admin.ModelAdmin):
+    list_display = ('grade', 'min_score', 'term', 'class_assigned')
+    list_filter = ('term', 'class_assigned')
+
+@admin.register(TermSummary)
+class TermSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'term', 'mark_count', 'average', 'position', 'updated_at')
+    list_filter = ('term',)
+    list_select_related = ('student', 'term')
+    search_fields = ('student__registration_number', 'student__first_name', 'student__last_name')
+    readonly_fields = [f.name for f in TermSummary._meta.fields]
+
 # Register your models here.
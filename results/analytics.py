@@ -0,0 +1,96 @@
+# results/analytics.py
+import math
+from array import array
+from itertools import groupby
+
+from django.core.cache import cache
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .cache import data_version
+from .grading import FAIL_GRADE, boundaries_for
+from .models import Mark
+
+STATS_TIMEOUT = 60 * 60
+HISTOGRAM_BINS = 10  # 0-9, 10-19, ... 90-100
+
+
+def _percentile(ordered, fraction):
+    """Linear interpolation between closest ranks, as numpy.percentile does."""
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def describe(scores, pass_mark):
+    """
+    Summary statistics for an array('d') of scores, from one sort and one
+    pass over the values.
+    """
+    n = len(scores)
+    ordered = array('d', sorted(scores))
+    mean = math.fsum(ordered) / n
+    variance = math.fsum((x - mean) ** 2 for x in ordered) / n
+
+    histogram = [0] * HISTOGRAM_BINS
+    passed = 0
+    for x in ordered:
+        histogram[min(int(x // (100 / HISTOGRAM_BINS)), HISTOGRAM_BINS - 1)] += 1
+        if x >= pass_mark:
+            passed += 1
+
+    def r(value):
+        return round(value, 2)
+
+    return {
+        'count': n,
+        'mean': r(mean),
+        'median': r(_percentile(ordered, 0.5)),
+        'std_dev': r(math.sqrt(variance)),
+        'min': r(ordered[0]),
+        'q1': r(_percentile(ordered, 0.25)),
+        'q3': r(_percentile(ordered, 0.75)),
+        'p10': r(_percentile(ordered, 0.10)),
+        'p90': r(_percentile(ordered, 0.90)),
+        'max': r(ordered[-1]),
+        'pass_rate': r(100 * passed / n),
+        'histogram': histogram,
+    }
+
+
+def subject_statistics(class_id, term_id):
+    """
+    Per-subject score statistics for a class and term.
+
+    Scores come back from one query as floats (no Decimal per row) and are
+    packed into a flat array per subject. Results are cached under the same
+    data version as the results pages, so any mark write in the class
+    brings fresh numbers.
+    """
+    key = f'results:stats:{class_id}:{term_id}:{data_version(class_id, term_id)}'
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    # anything graded above a fail counts as a pass
+    pass_mark = min(
+        (minimum for grade, minimum in boundaries_for(term_id, class_id) if grade != FAIL_GRADE),
+        default=0,
+    )
+
+    rows = (
+        Mark.objects.filter(term_id=term_id, student__class_assigned_id=class_id)
+        .order_by('subject__name', 'subject_id')
+        .values_list('subject_id', 'subject__name', Cast('score', FloatField()))
+    )
+
+    stats = []
+    for (subject_id, name), group in groupby(rows, key=lambda row: (row[0], row[1])):
+        scores = array('d', (row[2] for row in group))
+        stats.append({'subject_id': subject_id, 'subject': name, **describe(scores, pass_mark)})
+
+    cache.set(key, stats, STATS_TIMEOUT)
+    return stats
@@ -0,0 +1,208 @@
+# results/bulk.py
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from students.models import Student
+from teachers.models import Subject
+from .models import Mark
+from .cache import marks_changed
+from .summaries import refresh_summaries
+from .terms import get_terms
+
+GRADEBOOK_COLUMNS = ('registration_number', 'subject', 'term', 'score', 'comment')
+MAX_GRADEBOOK_ROWS = 5000
+
+
+class GradebookError(Exception):
+    """The uploaded sheet as a whole can't be read."""
+
+
+def _csv_rows(upload):
+    text = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise GradebookError(f"Could not read CSV file: {e}")
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(upload):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise GradebookError("Excel uploads need the openpyxl package; upload a CSV file instead.")
+    try:
+        workbook = load_workbook(upload.file, read_only=True, data_only=True)
+    except Exception as e:
+        raise GradebookError(f"Could not read Excel file: {e}")
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def read_gradebook(upload):
+    """
+    Yield (line_number, row dict) for each data row of a CSV or XLSX upload.
+    A header row naming the columns is optional.
+    """
+    name = (upload.name or '').lower()
+    rows = _xlsx_rows(upload) if name.endswith('.xlsx') else _csv_rows(upload)
+
+    for line, cells in enumerate(rows, start=1):
+        cells = [str(c).strip() for c in cells]
+        if not any(cells):
+            continue
+        if line == 1 and cells[0].lower().replace(' ', '_') == 'registration_number':
+            continue
+        if line > MAX_GRADEBOOK_ROWS + 1:
+            raise GradebookError(f"Too many rows; upload at most {MAX_GRADEBOOK_ROWS} marks at a time.")
+        cells += [''] * (len(GRADEBOOK_COLUMNS) - len(cells))
+        yield line, dict(zip(GRADEBOOK_COLUMNS, cells))
+
+
+def parse_score(value):
+    try:
+        score = Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+    if not score.is_finite() or score < 0 or score > 100:
+        return None
+    return score.quantize(Decimal('0.01'))
+
+
+def _write_marks(marks, batch_size=500):
+    Mark.objects.bulk_create(
+        marks,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['student', 'subject', 'term'],
+        update_fields=['score', 'comment', 'teacher'],
+    )
+    return {(m.student_id, m.term_id) for m in marks}
+
+
+def upsert_marks(marks, batch_size=500):
+    """
+    Insert or update Mark objects in one statement per batch, keyed on the
+    (student, subject, term) unique constraint. bulk_create skips model
+    signals, so the affected term summaries and cached results pages are
+    refreshed here.
+    """
+    if not marks:
+        return 0
+    with transaction.atomic():
+        keys = _write_marks(marks, batch_size)
+        refresh_summaries(keys)
+        marks_changed(keys)
+    return len(marks)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_gradebook(upload, teacher, chunk_size=500):
+    """
+    Validate every row of an uploaded gradebook and save the good ones.
+
+    The sheet is read and written chunk_size rows at a time, with one
+    student query per chunk; the teacher's subjects and the terms are
+    loaded once. Rows that fail validation are reported back and skipped;
+    the rest are written in one transaction, and term summaries are
+    refreshed once at the end.
+
+    Returns (saved_count, errors) where errors is a list of
+    {'line', 'registration_number', 'error'} dicts.
+    """
+    errors = []
+
+    # subject and term names match in any case, as typed in the sheet
+    subjects = {}
+    for name, class_id, subject_id in Subject.objects.filter(teachers=teacher).values_list(
+        'name', 'class_assigned_id', 'id'
+    ):
+        subjects.setdefault(name.strip().lower(), {})[class_id] = subject_id
+
+    terms = {}
+    for term in get_terms():
+        terms[str(term.id)] = term.id
+        terms[term.name.lower()] = term.id
+
+    written = set()
+    keys = set()
+    with transaction.atomic():
+        for rows in _chunks(read_gradebook(upload), chunk_size):
+            reg_numbers = {row['registration_number'] for _, row in rows if row['registration_number']}
+            students = {
+                reg: (pk, class_id)
+                for reg, pk, class_id in Student.objects.filter(
+                    registration_number__in=reg_numbers
+                ).values_list('registration_number', 'id', 'class_assigned_id')
+            }
+
+            marks = {}
+            for line, row in rows:
+                reg_no = row['registration_number']
+
+                def fail(message):
+                    errors.append({'line': line, 'registration_number': reg_no, 'error': message})
+
+                if not reg_no:
+                    fail("Missing registration number.")
+                    continue
+                if reg_no not in students:
+                    fail("No student with this registration number.")
+                    continue
+                student_id, class_id = students[reg_no]
+
+                by_class = subjects.get(row['subject'].lower())
+                if not by_class:
+                    fail(f"'{row['subject']}' is not one of your subjects.")
+                    continue
+                subject_id = by_class.get(class_id)
+                if subject_id is None:
+                    fail(f"You don't teach {row['subject']} to this student's class.")
+                    continue
+
+                term_id = terms.get(row['term'].lower())
+                if term_id is None:
+                    fail(f"Unknown term '{row['term']}'.")
+                    continue
+
+                score = parse_score(row['score'])
+                if score is None:
+                    fail(f"Score '{row['score']}' must be a number from 0 to 100.")
+                    continue
+
+                # a later row for the same mark replaces an earlier one; across
+                # chunks the later statement does the same
+                marks[(student_id, subject_id, term_id)] = Mark(
+                    student_id=student_id,
+                    subject_id=subject_id,
+                    term_id=term_id,
+                    score=score,
+                    comment=row['comment'],
+                    teacher=teacher,
+                )
+
+            if marks:
+                keys |= _write_marks(list(marks.values()))
+                written |= marks.keys()
+
+        if keys:
+            refresh_summaries(keys)
+            marks_changed(keys)
+    return len(written), errors
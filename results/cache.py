@@ -0,0 +1,106 @@
+# results/cache.py
+"""
+Versioned cache for the rendered results table.
+
+A fragment is keyed by (student, term, data version). The data version
+combines a counter per (class, term), bumped by every mark write for a
+student in that class, a counter per class, bumped whenever the class
+roster changes, and one global grading counter, bumped when grade
+boundaries change or the term summaries are rebuilt (both change grades
+and positions without any mark being written). Bumping a counter makes the
+old fragments unreachable, so nothing has to be deleted.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from students.models import Student
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+HITS_KEY = 'results:fragment:hits'
+GRADING_VERSION_KEY = 'results:version:grading'
+MISSES_KEY = 'results:fragment:misses'
+
+
+def _marks_version_key(class_id, term_id):
+    return f'results:version:marks:{class_id}:{term_id}'
+
+
+def _roster_version_key(class_id):
+    return f'results:version:roster:{class_id}'
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Start from a timestamp rather than 1 so a counter that was evicted
+        # never repeats a version an old fragment was stored under.
+        cache.add(key, time.time_ns())
+
+
+def _incr_counter(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1)
+
+
+def data_version(class_id, term_id):
+    keys = [_marks_version_key(class_id, term_id), _roster_version_key(class_id), GRADING_VERSION_KEY]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    for key, value in missing.items():
+        cache.add(key, value)
+    if missing:
+        versions = cache.get_many(keys)
+    return '.'.join(str(versions.get(key, 0)) for key in keys)
+
+
+def fragment_key(student_id, term_id, version):
+    return f'results:fragment:{student_id}:{term_id}:{version}'
+
+
+def get_fragment(key):
+    html = cache.get(key)
+    _incr_counter(HITS_KEY if html is not None else MISSES_KEY)
+    return html
+
+
+def set_fragment(key, html):
+    cache.set(key, html, FRAGMENT_TIMEOUT)
+
+
+def marks_changed(keys):
+    """Invalidate fragments after marks for these (student_id, term_id) pairs changed."""
+    keys = {(s, t) for s, t in keys if s is not None and t is not None}
+    if not keys:
+        return
+    classes = dict(
+        Student.objects.filter(id__in={s for s, _ in keys}).values_list('id', 'class_assigned_id')
+    )
+    version_keys = {_marks_version_key(classes.get(s), t) for s, t in keys}
+    # bump after commit so nobody caches the old rows under the new version
+    transaction.on_commit(lambda: [_bump(key) for key in version_keys])
+
+
+def roster_changed(*class_ids):
+    version_keys = {_roster_version_key(class_id) for class_id in class_ids}
+    transaction.on_commit(lambda: [_bump(key) for key in version_keys])
+
+
+def grading_changed():
+    """Invalidate every fragment: grades or positions changed without a mark write."""
+    transaction.on_commit(lambda: _bump(GRADING_VERSION_KEY))
+
+
+def stats():
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else None,
+    }
@@ -0,0 +1,124 @@
+# results/grading.py
+"""
+Grade boundaries.
+
+Boundaries live in results.GradeBoundary and can be set for every term and
+class, for one term, for one class, or for one class in one term (most
+specific wins). All rows are loaded once into a process-wide cache that is
+dropped whenever a boundary is saved or deleted. With no rows at all the
+built-in DEFAULT_GRADE_BOUNDARIES apply.
+"""
+import threading
+import time
+
+from django.db.models import Case, CharField, Q, Value, When
+
+GRADES = ('A', 'B', 'C', 'D', 'E')
+FAIL_GRADE = 'E'
+
+# Lowest score needed for each grade, best grade first. Anything below the
+# last boundary is a fail.
+DEFAULT_GRADE_BOUNDARIES = (
+    ('A', 75),
+    ('B', 65),
+    ('C', 50),
+    ('D', 40),
+)
+
+# Other worker processes only see a change when their copy expires.
+CACHE_SECONDS = 300
+
+_cache = {'scopes': None, 'loaded_at': 0.0}
+_lock = threading.Lock()
+
+
+def _load():
+    from .models import GradeBoundary
+
+    scopes = {}
+    rows = GradeBoundary.objects.order_by('-min_score').values_list(
+        'term_id', 'class_assigned_id', 'grade', 'min_score'
+    )
+    for term_id, class_id, grade, min_score in rows:
+        scopes.setdefault((term_id, class_id), []).append((grade, float(min_score)))
+    return {scope: tuple(bounds) for scope, bounds in scopes.items()}
+
+
+def _scopes():
+    scopes = _cache['scopes']
+    if scopes is None or time.monotonic() - _cache['loaded_at'] > CACHE_SECONDS:
+        with _lock:
+            scopes = _load()
+            _cache['scopes'] = scopes
+            _cache['loaded_at'] = time.monotonic()
+    return scopes
+
+
+def invalidate_grade_boundaries():
+    _cache['scopes'] = None
+
+
+def has_class_boundaries():
+    return any(class_id is not None for _, class_id in _scopes())
+
+
+def boundaries_for(term_id=None, class_id=None):
+    """The (grade, min_score) pairs that apply to a term and class."""
+    scopes = _scopes()
+    for scope in ((term_id, class_id), (term_id, None), (None, class_id), (None, None)):
+        if scope in scopes:
+            return scopes[scope]
+    return DEFAULT_GRADE_BOUNDARIES
+
+
+def grade_for_score(score, term_id=None, class_id=None):
+    try:
+        s = float(score)
+    except Exception:
+        return ''
+    for letter, minimum in boundaries_for(term_id, class_id):
+        if s >= minimum:
+            return letter
+    return FAIL_GRADE
+
+
+def _scope_q(term_id, class_id, term_field, class_field):
+    q = Q()
+    if term_id is not None:
+        q &= Q(**{term_field: term_id})
+    if class_id is not None:
+        q &= Q(**{class_field: class_id})
+    return q
+
+
+def grade_case(field='score', term_id=None, class_id=None,
+               term_field='term_id', class_field='student__class_assigned_id'):
+    """
+    A Case/When expression giving the grade letter of `field` in SQL.
+
+    Each configured scope contributes its boundaries, most specific scopes
+    first, followed by a catch-all fail for that scope so a low score never
+    falls through to a less specific scope. Passing term_id / class_id
+    leaves out scopes that can't apply.
+    """
+    scopes = _scopes()
+    ordered = sorted(
+        (scope for scope in scopes
+         if (term_id is None or scope[0] in (None, term_id))
+         and (class_id is None or scope[1] in (None, class_id))),
+        key=lambda scope: (scope[0] is None, scope[1] is None),
+    )
+
+    whens = []
+    for scope_term, scope_class in ordered:
+        if scope_term is None and scope_class is None:
+            continue
+        scope_q = _scope_q(scope_term, scope_class, term_field, class_field)
+        for letter, minimum in scopes[(scope_term, scope_class)]:
+            whens.append(When(scope_q & Q(**{f'{field}__gte': minimum}), then=Value(letter)))
+        whens.append(When(scope_q, then=Value(FAIL_GRADE)))
+
+    for letter, minimum in scopes.get((None, None), DEFAULT_GRADE_BOUNDARIES):
+        whens.append(When(Q(**{f'{field}__gte': minimum}), then=Value(letter)))
+
+    return Case(*whens, default=Value(FAIL_GRADE), output_field=CharField(max_length=2))
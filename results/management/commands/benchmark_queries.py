@@ -0,0 +1,207 @@
+import random
+import re
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Avg
+
+from results.models import Mark, Term
+from students.models import Class, Student
+from teachers.models import Subject
+
+# tables the hot lookups read; any SCAN of one is reported, even through a
+# covering index, since that still reads every entry
+HOT_TABLES = {Mark._meta.db_table, Student._meta.db_table}
+
+# (model, index name) pairs added for the hot lookups below
+BENCHMARK_INDEXES = (
+    (Mark, 'mark_student_term_idx'),
+    (Mark, 'mark_term_subject_idx'),
+    (Mark, 'mark_term_student_idx'),
+    (Student, 'student_reg_upper_idx'),
+    (Student, 'student_class_name_idx'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset inside a transaction, then print the query plan and "
+        "timings of the hot Mark and Student lookups with and without their indexes. "
+        "Everything is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--classes', type=int, default=20)
+        parser.add_argument('--subjects', type=int, default=8, help="Subjects per class.")
+        parser.add_argument('--terms', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per query; the best time is reported.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            sample = self.seed(options)
+            self.analyze()
+
+            self.toggle_indexes(create=False)
+            before = self.run_queries(sample, options['repeat'], "without indexes")
+            self.toggle_indexes(create=True)
+            self.analyze()
+            after = self.run_queries(sample, options['repeat'], "with indexes")
+
+            self.report(before, after)
+            transaction.set_rollback(True)
+
+    # ------------------------------------------------------------------
+
+    def seed(self, options):
+        rng = random.Random(2025)
+        started = time.perf_counter()
+
+        classes = Class.objects.bulk_create(
+            Class(name=f"Bench {i}", academic_year='2025') for i in range(options['classes'])
+        )
+        terms = Term.objects.bulk_create(
+            Term(name=f"Bench Term {i + 1}", start_date=date(2025, 1 + 4 * i % 12, 1))
+            for i in range(options['terms'])
+        )
+        subjects = Subject.objects.bulk_create(
+            Subject(name=f"Subject {j}", class_assigned=c)
+            for c in classes for j in range(options['subjects'])
+        )
+        subjects_by_class = {}
+        for subject in subjects:
+            subjects_by_class.setdefault(subject.class_assigned_id, []).append(subject)
+
+        students = Student.objects.bulk_create(
+            (
+                Student(
+                    first_name=f"First{i}",
+                    last_name=f"Last{rng.randrange(10000):04d}",
+                    email=f"bench{i}@example.com",
+                    password='!',
+                    date_of_birth=date(2010, 1, 1),
+                    phone_number='0700000000',
+                    registration_number=f"BEN2025-{i:05d}",
+                    class_assigned=classes[i % len(classes)],
+                    status='approved',
+                )
+                for i in range(options['students'])
+            ),
+            batch_size=1000,
+        )
+
+        marks = (
+            Mark(
+                student=student,
+                subject=subject,
+                term=term,
+                score=Decimal(rng.randrange(0, 10001)) / 100,
+            )
+            for student in students
+            for subject in subjects_by_class[student.class_assigned_id]
+            for term in terms
+        )
+        Mark.objects.bulk_create(marks, batch_size=2000)
+
+        count = Mark.objects.filter(term__in=terms).count()
+        self.stdout.write(
+            f"Seeded {len(students)} students, {len(subjects)} subjects and {count} marks "
+            f"in {time.perf_counter() - started:.1f}s ({connection.vendor})."
+        )
+        student = students[len(students) // 2]
+        return {
+            'student': student,
+            'term': terms[-1],
+            'class': student.class_assigned,
+            'subject': subjects_by_class[student.class_assigned_id][0],
+        }
+
+    def analyze(self):
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def toggle_indexes(self, create):
+        # Only used to build SQL: entering a schema editor isn't allowed
+        # inside the seeding transaction on SQLite.
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model, name in BENCHMARK_INDEXES:
+                index = next(i for i in model._meta.indexes if i.name == name)
+                if create:
+                    cursor.execute(str(index.create_sql(model, editor)))
+                else:
+                    cursor.execute(editor.sql_delete_index % {
+                        'table': editor.quote_name(model._meta.db_table),
+                        'name': editor.quote_name(name),
+                    })
+
+    def hot_queries(self, sample):
+        student, term = sample['student'], sample['term']
+        return [
+            ("student results for a term", lambda: Mark.objects.filter(
+                student=student, term=term).select_related('subject'), False),
+            ("class averages for a term", lambda: Mark.objects.filter(
+                term=term, student__class_assigned=sample['class']).order_by()
+                .values('student_id').annotate(average=Avg('score')), False),
+            ("one subject's marks for a term", lambda: Mark.objects.filter(
+                term=term, subject=sample['subject']), False),
+            ("class list by name", lambda: Student.objects.filter(
+                class_assigned=sample['class']).order_by('last_name', 'first_name'), False),
+            ("registration number, any case", lambda: Student.objects.by_registration_number(
+                student.registration_number.lower()), False),
+            # a substring match can't use a B-tree index at all
+            ("registration number contains", lambda: Student.objects.filter(
+                registration_number__icontains=student.registration_number[-4:]), True),
+        ]
+
+    def run_queries(self, sample, repeat, label):
+        results = {}
+        for name, build, scan_expected in self.hot_queries(sample):
+            plan = build().explain()
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(build())
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = {'plan': plan, 'ms': best * 1000, 'scan_expected': scan_expected}
+
+            self.stdout.write(f"\n[{label}] {name}: {best * 1000:.2f} ms")
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+        return results
+
+    def full_scans(self, plan):
+        """Hot tables (or their indexes) read start to finish (SQLite plans only)."""
+        if connection.vendor != 'sqlite':
+            return []
+        scans = []
+        for line in plan.splitlines():
+            match = re.search(r'\bSCAN (\S+)', line)
+            if match and match.group(1) in HOT_TABLES:
+                scans.append(match.group(1))
+        return scans
+
+    def report(self, before, after):
+        self.stdout.write("\nSummary")
+        problems = 0
+        for name, result in after.items():
+            scans = self.full_scans(result['plan'])
+            note = ''
+            if scans:
+                if result['scan_expected']:
+                    note = f"  (full scan of {', '.join(scans)}; expected)"
+                else:
+                    note = f"  FULL SCAN of {', '.join(scans)}"
+                    problems += 1
+            self.stdout.write(
+                f"  {name:<34} {before[name]['ms']:>9.2f} ms -> {result['ms']:>9.2f} ms{note}"
+            )
+        if problems:
+            self.stdout.write(self.style.WARNING(f"{problems} hot query(s) still scan a whole table or index."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Every hot query is served by an index."))
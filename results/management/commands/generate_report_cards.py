@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from results.models import Mark, Term
+from results.reportcards import generate_report_cards, run_queued
+
+
+class Command(BaseCommand):
+    help = (
+        "Render report card PDFs (one per student plus a ZIP) for a term, optionally for one class. "
+        "With --queued, render what staff requested from the report cards page instead; "
+        "add --loop to keep doing so every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', type=int, help="Term ID.")
+        parser.add_argument(
+            '--class', dest='classes', type=int, action='append',
+            help="Class ID; repeat for several classes. Defaults to every class with marks in the term.",
+        )
+        parser.add_argument('--queued', action='store_true', help="Render the jobs queued from the staff page.")
+        parser.add_argument('--loop', action='store_true', help="With --queued, keep running until interrupted.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between checks with --loop.")
+        parser.add_argument('--workers', type=int, default=None, help="Number of render processes.")
+        parser.add_argument('--output', default=None, help="Output directory (defaults to REPORT_CARD_ROOT).")
+
+    def handle(self, *args, **options):
+        if options['queued']:
+            return self.run_queued(options)
+        if options['term'] is None:
+            raise CommandError("Pass --term, or --queued to render requested jobs.")
+
+        term_id = options['term']
+        if not Term.objects.filter(pk=term_id).exists():
+            raise CommandError(f"No term with ID {term_id}.")
+
+        class_ids = options['classes'] or sorted(
+            Mark.objects.filter(term_id=term_id, student__class_assigned__isnull=False)
+            .order_by()
+            .values_list('student__class_assigned_id', flat=True)
+            .distinct()
+        )
+
+        total_cards, total_seconds = 0, 0.0
+        for class_id in class_ids:
+            result = generate_report_cards(
+                class_id, term_id, workers=options['workers'], output_dir=options['output']
+            )
+            if result is None:
+                self.stdout.write(self.style.WARNING(f"Class {class_id}: already being generated; skipped."))
+                continue
+            total_cards += result['cards']
+            total_seconds += result['seconds']
+            self.report(class_id, result)
+
+        rate = total_cards / total_seconds if total_seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {total_cards} report cards in {total_seconds:.2f}s ({rate:.1f} cards/s)."
+        ))
+
+    def run_queued(self, options):
+        try:
+            while True:
+                for (class_id, term_id), result in run_queued(options['workers']):
+                    if result is not None:
+                        self.report(class_id, result)
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def report(self, class_id, result):
+        self.stdout.write(
+            f"Class {class_id}: {result['cards']} cards in {result['seconds']:.2f}s "
+            f"({result['cards_per_second']:.1f} cards/s) -> {result['zip_path']}"
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from results.summaries import check_summaries, rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-student term summaries from results.Mark, or check them for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Only report summaries that no longer match the marks.",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = check_summaries()
+            for student_id, term_id, problem in drift:
+                self.stdout.write(f"student={student_id} term={term_id}: {problem}")
+            if drift:
+                self.stdout.write(self.style.WARNING(f"{len(drift)} summary problem(s) found."))
+            else:
+                self.stdout.write(self.style.SUCCESS("Term summaries are consistent."))
+            return
+
+        written = rebuild_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} term summaries."))
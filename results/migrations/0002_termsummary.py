@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0001_initial'),
+        ('students', '0003_student_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mark_count', models.PositiveIntegerField(default=0)),
+                ('score_total', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('average', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('grade_a', models.PositiveIntegerField(default=0)),
+                ('grade_b', models.PositiveIntegerField(default=0)),
+                ('grade_c', models.PositiveIntegerField(default=0)),
+                ('grade_d', models.PositiveIntegerField(default=0)),
+                ('grade_e', models.PositiveIntegerField(default=0)),
+                ('position', models.PositiveIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_summaries', to='students.student')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='results.term')),
+            ],
+            options={
+                'unique_together': {('student', 'term')},
+            },
+        ),
+    ]
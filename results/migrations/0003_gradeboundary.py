@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0002_termsummary'),
+        ('students', '0003_student_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeBoundary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C'), ('D', 'D'), ('E', 'E')], max_length=2)),
+                ('min_score', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('class_assigned', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='grade_boundaries', to='students.class')),
+                ('term', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='grade_boundaries', to='results.term')),
+            ],
+            options={
+                'ordering': ['term', 'class_assigned', '-min_score'],
+                'unique_together': {('grade', 'term', 'class_assigned')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+def keep_one_active_term(apps, schema_editor):
+    """Leave only the newest active term active before the constraint goes on."""
+    Term = apps.get_model('results', 'Term')
+    active = Term.objects.filter(is_active=True).order_by('-start_date', '-id')
+    newest = active.first()
+    if newest:
+        active.exclude(pk=newest.pk).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0003_gradeboundary'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_active_term, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='term',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='results_single_active_term'),
+        ),
+    ]
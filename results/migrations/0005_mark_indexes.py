@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0004_single_active_term'),
+        ('students', '0004_student_indexes'),
+        ('teachers', '0003_delete_mark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['student', 'term', 'score'], name='mark_student_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['term', 'subject'], name='mark_term_subject_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:32
+
+from django.db import migrations, models
+
+
+def drop_duplicate_boundaries(apps, schema_editor):
+    """Keep the newest row of each (grade, term, class) before the constraints go on."""
+    GradeBoundary = apps.get_model('results', 'GradeBoundary')
+    seen = set()
+    for boundary in GradeBoundary.objects.order_by('-id'):
+        scope = (boundary.grade, boundary.term_id, boundary.class_assigned_id)
+        if scope in seen:
+            boundary.delete()
+        else:
+            seen.add(scope)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0005_mark_indexes'),
+        ('students', '0005_student_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_boundaries, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='gradeboundary',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='gradeboundary',
+            constraint=models.UniqueConstraint(fields=('grade', 'term', 'class_assigned'), name='grade_boundary_term_class'),
+        ),
+        migrations.AddConstraint(
+            model_name='gradeboundary',
+            constraint=models.UniqueConstraint(condition=models.Q(('class_assigned__isnull', True)), fields=('grade', 'term'), name='grade_boundary_term'),
+        ),
+        migrations.AddConstraint(
+            model_name='gradeboundary',
+            constraint=models.UniqueConstraint(condition=models.Q(('term__isnull', True)), fields=('grade', 'class_assigned'), name='grade_boundary_class'),
+        ),
+        migrations.AddConstraint(
+            model_name='gradeboundary',
+            constraint=models.UniqueConstraint(condition=models.Q(('class_assigned__isnull', True), ('term__isnull', True)), fields=('grade',), name='grade_boundary_school'),
+        ),
+    ]
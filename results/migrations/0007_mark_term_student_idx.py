@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0006_grade_boundary_scope_constraints'),
+        ('students', '0005_student_search'),
+        ('teachers', '0003_delete_mark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mark',
+            index=models.Index(fields=['term', 'student', 'score'], name='mark_term_student_idx'),
+        ),
+    ]
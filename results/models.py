@@ -1,12 +1,15 @@
 from django.db import models
 
 # results/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from students.models import Student
-
-
-
+from .grading import (
+    GRADES, grade_case, grade_for_score, has_class_boundaries, invalidate_grade_boundaries,
+)
 
 
 class Term(models.Model):
@@ -17,10 +20,42 @@ class Term(models.Model):
 
     class Meta:
         ordering = ['-start_date', '-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_active'],
+                condition=Q(is_active=True),
+                name='results_single_active_term',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # only one term can be active; activating this one retires the other
+        with transaction.atomic():
+            if self.is_active:
+                Term.objects.filter(is_active=True).exclude(pk=self.pk).update(is_active=False)
+            super().save(*args, **kwargs)
+
+
+class MarkQuerySet(models.QuerySet):
+    def with_grade(self, term=None, class_assigned=None):
+        """
+        Annotate `letter_grade`, worked out in SQL from the grade boundaries.
+        Passing the term and/or class the rows belong to keeps the CASE small.
+        """
+        return self.annotate(letter_grade=grade_case(
+            term_id=getattr(term, 'pk', term),
+            class_id=getattr(class_assigned, 'pk', class_assigned),
+        ))
+
+    def grade_counts(self, term=None, class_assigned=None):
+        """Return {'A': n, ..., 'E': n} for this queryset in one aggregate query."""
+        return self.with_grade(term, class_assigned).aggregate(
+            **{letter: Count('id', filter=Q(letter_grade=letter)) for letter in GRADES}
+        )
+
 
 class Mark(models.Model):
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='result_marks')
@@ -31,28 +66,224 @@ class Mark(models.Model):
     comment = models.TextField(blank=True, null=True)
     date_recorded = models.DateTimeField(auto_now_add=True)
 
+    objects = MarkQuerySet.as_manager()
+
     class Meta:
         unique_together = ('student', 'subject', 'term')
         ordering = ['subject__name']
+        indexes = [
+            # one student's marks for a term; carries score so per-student
+            # and per-class averages are answered from the index alone
+            models.Index(fields=['student', 'term', 'score'], name='mark_student_term_idx'),
+            # one subject's marks for a term
+            models.Index(fields=['term', 'subject'], name='mark_term_subject_idx'),
+            # every mark in a term, grouped by student: class averages and
+            # rankings seek on term and read scores from the index
+            models.Index(fields=['term', 'student', 'score'], name='mark_term_student_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.full_name} - {self.subject.name}: {self.score}"
 
     @property
     def grade(self):
-        try:
-            s = float(self.score)
-        except Exception:
-            return ''
-        if s >= 75:
-            return "A"
-        if s >= 65:
-            return "B"
-        if s >= 50:
-            return "C"
-        if s >= 40:
-            return "D"
-        return "E"
+        """
+        The letter grade. Lists of marks should come from
+        Mark.objects.with_grade(), which works it out in SQL. Otherwise,
+        once any class has its own boundaries, the student must already be
+        loaded (select_related('student')); looking it up here would cost a
+        query per mark.
+        """
+        if 'letter_grade' in self.__dict__:
+            return self.letter_grade
+        class_id = None
+        if Mark.student.is_cached(self):
+            class_id = self.student.class_assigned_id
+        elif has_class_boundaries():
+            raise ValueError(
+                "Mark.grade needs the student's class: use Mark.objects.with_grade() "
+                "or select_related('student')."
+            )
+        return grade_for_score(self.score, self.term_id, class_id)
+
+
+class GradeBoundary(models.Model):
+    """
+    Lowest score for a grade. Leave term and class empty for the school-wide
+    scale; set either or both to override it. Scores below every boundary
+    in a scale get an E.
+    """
+    GRADE_CHOICES = [(letter, letter) for letter in GRADES]
+
+    grade = models.CharField(max_length=2, choices=GRADE_CHOICES)
+    min_score = models.DecimalField(max_digits=5, decimal_places=2)
+    term = models.ForeignKey('results.Term', on_delete=models.CASCADE, null=True, blank=True, related_name='grade_boundaries')
+    class_assigned = models.ForeignKey('students.Class', on_delete=models.CASCADE, null=True, blank=True, related_name='grade_boundaries')
+
+    class Meta:
+        ordering = ['term', 'class_assigned', '-min_score']
+        # one row per grade in each scope; NULLs never clash in a plain
+        # unique index, so each combination of empty term / class gets its own
+        constraints = [
+            models.UniqueConstraint(
+                fields=['grade', 'term', 'class_assigned'],
+                name='grade_boundary_term_class',
+            ),
+            models.UniqueConstraint(
+                fields=['grade', 'term'],
+                condition=Q(class_assigned__isnull=True),
+                name='grade_boundary_term',
+            ),
+            models.UniqueConstraint(
+                fields=['grade', 'class_assigned'],
+                condition=Q(term__isnull=True),
+                name='grade_boundary_class',
+            ),
+            models.UniqueConstraint(
+                fields=['grade'],
+                condition=Q(term__isnull=True, class_assigned__isnull=True),
+                name='grade_boundary_school',
+            ),
+        ]
+
+    def __str__(self):
+        scope = [str(x) for x in (self.term, self.class_assigned) if x]
+        return f"{self.grade} >= {self.min_score}" + (f" ({', '.join(scope)})" if scope else "")
+
+
+class TermSummary(models.Model):
+    """
+    Per-student totals for one term, kept in step with Mark writes so the
+    results page reads a single row instead of aggregating every mark.
+    Maintained by results.summaries; rebuild with `rebuild_term_summaries`.
+    """
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='term_summaries')
+    term = models.ForeignKey('results.Term', on_delete=models.CASCADE, related_name='summaries')
+    mark_count = models.PositiveIntegerField(default=0)
+    score_total = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    average = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    grade_a = models.PositiveIntegerField(default=0)
+    grade_b = models.PositiveIntegerField(default=0)
+    grade_c = models.PositiveIntegerField(default=0)
+    grade_d = models.PositiveIntegerField(default=0)
+    grade_e = models.PositiveIntegerField(default=0)
+    position = models.PositiveIntegerField(null=True, blank=True)  # cached class position
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'term')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.term_id}: {self.average}"
+
+    @property
+    def grade_counts(self):
+        return {
+            'A': self.grade_a,
+            'B': self.grade_b,
+            'C': self.grade_c,
+            'D': self.grade_d,
+            'E': self.grade_e,
+        }
+
+
+# -------------------------
+# Signals for the term registry
+# -------------------------
+@receiver(post_save, sender=Term)
+@receiver(post_delete, sender=Term)
+def terms_changed(sender, **kwargs):
+    from .terms import invalidate_terms
+
+    invalidate_terms()
+    # and again once committed, in case another request cached the old list
+    transaction.on_commit(invalidate_terms)
+
+
+# -------------------------
+# Signals keeping TermSummary in step with Mark
+# -------------------------
+@receiver(post_init, sender=Mark)
+def remember_mark_key(sender, instance, **kwargs):
+    # the (student, term) a mark was loaded with, so a save that moves it
+    # also refreshes the summary it left
+    instance._summary_key = (instance.student_id, instance.term_id)
+
+
+@receiver(post_save, sender=Mark)
+def refresh_summary_on_save(sender, instance, **kwargs):
+    from .cache import marks_changed
+    from .summaries import refresh_summaries
+
+    keys = {(instance.student_id, instance.term_id), instance._summary_key}
+    refresh_summaries(keys)
+    marks_changed(keys)
+    instance._summary_key = (instance.student_id, instance.term_id)
+
+
+@receiver(post_delete, sender=Mark)
+def refresh_summary_on_delete(sender, instance, **kwargs):
+    from .cache import marks_changed
+    from .summaries import refresh_summaries
+
+    keys = {(instance.student_id, instance.term_id)}
+    refresh_summaries(keys)
+    marks_changed(keys)
+
+
+# -------------------------
+# Signals for class roster changes
+# -------------------------
+@receiver(post_init, sender=Student)
+def remember_student_class(sender, instance, **kwargs):
+    instance._results_class_id = instance.class_assigned_id
+
+
+@receiver(post_save, sender=Student)
+def student_class_changed(sender, instance, created, **kwargs):
+    from .cache import roster_changed
+    from .summaries import refresh_positions, refresh_summaries
+
+    old_class_id = instance._results_class_id
+    instance._results_class_id = instance.class_assigned_id
+    if not created and old_class_id == instance.class_assigned_id:
+        return
+
+    roster_changed(old_class_id, instance.class_assigned_id)
+    if created:
+        return
+    term_ids = list(TermSummary.objects.filter(student=instance).values_list('term_id', flat=True))
+    # grade counts follow the new class's boundaries; this also re-ranks the
+    # class the student joined
+    refresh_summaries({(instance.pk, term_id) for term_id in term_ids})
+    if old_class_id is not None:
+        for term_id in term_ids:
+            refresh_positions(old_class_id, term_id)
+
+
+@receiver(post_delete, sender=Student)
+def student_removed(sender, instance, **kwargs):
+    from .cache import roster_changed
+
+    roster_changed(instance.class_assigned_id)
+
+
+@receiver(post_init, sender=GradeBoundary)
+def remember_boundary_scope(sender, instance, **kwargs):
+    instance._loaded_scope = (instance.term_id, instance.class_assigned_id)
+
+
+@receiver(post_save, sender=GradeBoundary)
+@receiver(post_delete, sender=GradeBoundary)
+def grade_boundaries_changed(sender, instance, **kwargs):
+    from .cache import grading_changed
+    from .summaries import grade_scopes_changed
+
+    invalidate_grade_boundaries()
+    grading_changed()
+    # stored grade counts in these scopes were worked out with the old boundaries
+    grade_scopes_changed({instance._loaded_scope, (instance.term_id, instance.class_assigned_id)})
+    instance._loaded_scope = (instance.term_id, instance.class_assigned_id)
 
 
 # Create your models here.
@@ -0,0 +1,107 @@
+# results/pdf.py
+"""
+Report card rendering.
+
+Kept free of Django imports so worker processes started by
+results.reportcards can import it cheaply. The PDF writer only supports
+what a report card needs: one A4 page of text in the standard Helvetica
+fonts plus horizontal rules.
+"""
+
+PAGE_WIDTH = 595   # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 50
+
+
+def _escape(text):
+    text = str(text).encode('cp1252', 'replace').decode('cp1252')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _truncate(text, length):
+    text = str(text or '')
+    return text if len(text) <= length else text[:length - 1] + '…'
+
+
+def build_pdf(texts, rules=()):
+    """
+    Build a one-page PDF.
+
+    texts: iterable of (x, y, size, bold, text); y is measured from the top.
+    rules: iterable of (x1, x2, y) horizontal lines, y measured from the top.
+    """
+    ops = []
+    for x1, x2, y in rules:
+        ops.append(f"{x1} {PAGE_HEIGHT - y} m {x2} {PAGE_HEIGHT - y} l S")
+    for x, y, size, bold, text in texts:
+        font = 'F2' if bold else 'F1'
+        ops.append(f"BT /{font} {size} Tf {x} {PAGE_HEIGHT - y} Td ({_escape(text)}) Tj ET")
+    content = '\n'.join(ops).encode('cp1252')
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>"
+        ).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        b"<< /Length " + str(len(content)).encode() + b" >>\nstream\n" + content + b"\nendstream",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def render_report_card(card):
+    """
+    Render one report card dict (as built by results.reportcards) to PDF.
+    Returns (filename, pdf_bytes).
+    """
+    right = PAGE_WIDTH - MARGIN
+    texts = [
+        (MARGIN, 60, 18, True, card['school']),
+        (MARGIN, 82, 12, False, f"Report Card - {card['term']}"),
+        (MARGIN, 115, 11, True, card['student_name']),
+        (MARGIN, 131, 10, False, f"Registration No: {card['registration_number']}"),
+        (MARGIN, 145, 10, False, f"Class: {card['class_name']}"),
+    ]
+    rules = [(MARGIN, right, 95), (MARGIN, right, 180)]
+
+    columns = [(MARGIN, 'Subject'), (210, 'Score'), (260, 'Grade'), (310, 'Teacher'), (420, 'Comment')]
+    for x, heading in columns:
+        texts.append((x, 175, 10, True, heading))
+
+    y = 198
+    for mark in card['marks']:
+        texts.extend([
+            (MARGIN, y, 10, False, _truncate(mark['subject'], 28)),
+            (210, y, 10, False, mark['score']),
+            (260, y, 10, False, mark['grade']),
+            (310, y, 10, False, _truncate(mark['teacher'] or '-', 20)),
+            (420, y, 9, False, _truncate(mark['comment'], 24)),
+        ])
+        y += 18
+        if y > PAGE_HEIGHT - 120:
+            texts.append((MARGIN, y, 9, False, "(further subjects omitted)"))
+            y += 18
+            break
+
+    rules.append((MARGIN, right, y - 6))
+    y += 14
+    average = card['average'] if card['average'] is not None else 'N/A'
+    texts.append((MARGIN, y, 11, True, f"Average: {average}"))
+    if card['position']:
+        texts.append((260, y, 11, True, f"Class position: {card['position']} of {card['class_size']}"))
+
+    return f"{card['registration_number'] or card['student_id']}.pdf", build_pdf(texts, rules)
@@ -0,0 +1,86 @@
+# results/ranking.py
+from django.db import connection
+from django.db.models import Avg, Count, F, Window
+from django.db.models.functions import DenseRank, Rank, Round
+
+from .models import Mark
+
+
+def _round_average(value):
+    return round(float(value), 2) if value is not None else None
+
+
+def assign_positions(rows):
+    """
+    Rank rows (dicts with an 'average' key) in place, highest average first.
+
+    'position' uses competition ranking (1, 2, 2, 4) and 'dense_position'
+    uses dense ranking (1, 2, 2, 3). Averages are expected to be rounded to
+    two decimal places already, so students showing the same average share
+    a rank.
+    Rows without an average (no marks) are left unranked at the end.
+    """
+    ranked = [r for r in rows if r['average'] is not None]
+    unranked = [r for r in rows if r['average'] is None]
+    ranked.sort(key=lambda r: (-r['average'], r['student_id']))
+
+    previous, position, dense = None, 0, 0
+    for idx, row in enumerate(ranked, start=1):
+        if row['average'] != previous:
+            position, dense, previous = idx, dense + 1, row['average']
+        row['position'] = position
+        row['dense_position'] = dense
+
+    for row in unranked:
+        row['position'] = None
+        row['dense_position'] = None
+    return ranked + unranked
+
+
+def class_rankings(class_id, term):
+    """
+    Averages and ranks for every student with marks in a class for a term.
+
+    Runs a single grouped query over Mark. Where the database supports window
+    functions the ranks are computed in SQL, otherwise they are assigned in
+    Python from the same rows. Students without any marks for the term are
+    not part of the ranking (their position is None).
+
+    Returns a list of dicts: student_id, average, mark_count, position,
+    dense_position, ordered by position.
+    """
+    if class_id is None or term is None:
+        return []
+
+    term_id = getattr(term, 'pk', term)
+    qs = (
+        Mark.objects.filter(term_id=term_id, student__class_assigned_id=class_id)
+        .order_by()
+        .values('student_id')
+        .annotate(average=Round(Avg('score'), 2), mark_count=Count('id'))
+    )
+
+    if not connection.features.supports_over_clause:
+        rows = [
+            {**row, 'average': _round_average(row['average'])}
+            for row in qs
+        ]
+        return assign_positions(rows)
+
+    qs = qs.annotate(
+        position=Window(expression=Rank(), order_by=F('average').desc()),
+        dense_position=Window(expression=DenseRank(), order_by=F('average').desc()),
+    ).order_by('-average', 'student_id')
+
+    rows = list(qs)
+    for row in rows:
+        row['average'] = _round_average(row['average'])
+    return rows
+
+
+def student_position(student, term):
+    """Return the ranking row for one student, or None if they have no marks."""
+    for row in class_rankings(student.class_assigned_id, term):
+        if row['student_id'] == student.pk:
+            return row
+    return None
@@ -0,0 +1,254 @@
+# results/reportcards.py
+"""
+Report card PDFs, one per student, bundled into a ZIP per class and term.
+
+Cards hold grades, so they are written under REPORT_CARD_ROOT, outside
+MEDIA_ROOT, and only reach staff through the download view.
+
+Rendering runs in a pool of processes, which doesn't belong in a web
+worker. The staff page only queues a request (a `<job>.request` file);
+`manage.py generate_report_cards --queued --loop` picks requests up and
+renders them. While a job runs it holds an flock on `<job>.lock`, and
+when it finishes it leaves its timings in `<job>.json`.
+"""
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+
+from django.conf import settings
+
+from students.models import Class
+from .grading import grade_for_score
+from .models import Mark, Term
+from .pdf import render_report_card
+from .ranking import assign_positions
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = re.compile(r'^term(\d+)_class(\d+)$')
+
+
+def report_card_dir():
+    path = Path(getattr(settings, 'REPORT_CARD_ROOT', Path(settings.BASE_DIR) / 'var' / 'report_cards'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _job_name(class_id, term_id):
+    return f"term{term_id}_class{class_id}"
+
+
+def collect_report_cards(class_id, term_id):
+    """
+    Build plain report card dicts for every student with marks in a class
+    for a term, from a single query over Mark.
+    """
+    term = Term.objects.get(pk=term_id)
+    school_class = Class.objects.get(pk=class_id)
+
+    rows = (
+        Mark.objects.filter(term_id=term_id, student__class_assigned_id=class_id)
+        .order_by('student__last_name', 'student__first_name', 'student_id', 'subject__name')
+        .values_list(
+            'student_id', 'student__registration_number', 'student__first_name',
+            'student__last_name', 'subject__name', 'score', 'teacher__full_name', 'comment',
+        )
+    )
+
+    cards = OrderedDict()
+    for student_id, reg_no, first, last, subject, score, teacher, comment in rows:
+        card = cards.get(student_id)
+        if card is None:
+            card = cards[student_id] = {
+                'school': settings.SCHOOL_NAME,
+                'term': term.name,
+                'class_name': str(school_class),
+                'student_id': student_id,
+                'registration_number': reg_no,
+                'student_name': f"{first} {last}",
+                'marks': [],
+                'total': Decimal(0),
+            }
+        card['marks'].append({
+            'subject': subject,
+            'score': str(score),
+            'grade': grade_for_score(score, term_id, class_id),
+            'teacher': teacher,
+            'comment': comment or '',
+        })
+        card['total'] += score
+
+    ranking = []
+    for card in cards.values():
+        total = card.pop('total')
+        card['average'] = (total / len(card['marks'])).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        ranking.append({'student_id': card['student_id'], 'average': float(card['average'])})
+
+    for row in assign_positions(ranking):
+        cards[row['student_id']]['position'] = row['position']
+    for card in cards.values():
+        card['average'] = str(card['average'])
+        card['class_size'] = len(cards)
+    return list(cards.values())
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', name)
+
+
+def generate_report_cards(class_id, term_id, workers=None, output_dir=None):
+    """
+    Render a PDF per student for a class and term across a process pool,
+    then bundle them into one ZIP.
+
+    Returns a dict with the number of cards, elapsed seconds, cards per
+    second and the path of the ZIP file, or None if the same job is
+    already running elsewhere.
+    """
+    output_dir = Path(output_dir or report_card_dir())
+    output_dir.mkdir(parents=True, exist_ok=True)
+    name = _job_name(class_id, term_id)
+    lock_fd = os.open(output_dir / f"{name}.lock", os.O_WRONLY | os.O_CREAT, 0o640)
+    try:
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        result = _generate(class_id, term_id, workers, output_dir)
+    finally:
+        os.close(lock_fd)
+
+    timings = output_dir / f"{name}.json"
+    timings.with_suffix('.json.part').write_text(json.dumps({
+        'cards': result['cards'],
+        'seconds': result['seconds'],
+        'cards_per_second': result['cards_per_second'],
+    }))
+    os.replace(timings.with_suffix('.json.part'), timings)
+    return result
+
+
+def _generate(class_id, term_id, workers, output_dir):
+    started = time.perf_counter()
+    cards = collect_report_cards(class_id, term_id)
+
+    card_dir = output_dir / f"term{term_id}" / f"class{class_id}"
+    card_dir.mkdir(parents=True, exist_ok=True)
+    zip_path = output_dir / f"{_job_name(class_id, term_id)}.zip"
+
+    if workers is None:
+        workers = min(os.cpu_count() or 1, 4)
+    workers = max(1, min(workers, len(cards) or 1))
+
+    if workers == 1:
+        rendered = map(render_report_card, cards)
+        pool = None
+    else:
+        # spawn: workers only import results.pdf and never touch Django or
+        # the parent's database connection
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        rendered = pool.map(render_report_card, cards, chunksize=max(1, len(cards) // (workers * 4)))
+
+    tmp_zip = zip_path.with_suffix('.zip.part')
+    try:
+        with zipfile.ZipFile(tmp_zip, 'w', zipfile.ZIP_DEFLATED) as bundle:
+            for filename, pdf in rendered:
+                filename = _safe_name(filename)
+                (card_dir / filename).write_bytes(pdf)
+                bundle.writestr(filename, pdf)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    os.replace(tmp_zip, zip_path)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'cards': len(cards),
+        'seconds': elapsed,
+        'cards_per_second': len(cards) / elapsed if elapsed else 0,
+        'zip_path': zip_path,
+    }
+
+
+# --------------------------
+# Queued jobs
+# --------------------------
+def _is_running(lock_path):
+    fd = os.open(lock_path, os.O_WRONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)  # also releases the lock if we got it
+    return False
+
+
+def _job_key(path):
+    match = JOB_NAME.match(path.name.split('.')[0])
+    return (int(match[2]), int(match[1])) if match else None
+
+
+def request_report_cards(class_id, term_id):
+    """
+    Queue report cards for a class and term for the worker. Returns False
+    if they are already queued or being generated.
+    """
+    directory = report_card_dir()
+    name = _job_name(class_id, term_id)
+    lock = directory / f"{name}.lock"
+    if lock.exists() and _is_running(lock):
+        return False
+    try:
+        with open(directory / f"{name}.request", 'x'):
+            pass
+    except FileExistsError:
+        return False
+    return True
+
+
+def run_queued(workers=None):
+    """Generate every queued job, oldest request first. Returns [((class_id, term_id), result)]."""
+    directory = report_card_dir()
+    done = []
+    for request in sorted(directory.glob('*.request'), key=lambda p: p.stat().st_mtime):
+        key = _job_key(request)
+        request.unlink(missing_ok=True)
+        if key is None:
+            continue
+        class_id, term_id = key
+        try:
+            result = generate_report_cards(class_id, term_id, workers=workers, output_dir=directory)
+        except Exception:
+            logger.exception("Report card generation failed for class %s, term %s", class_id, term_id)
+            continue
+        if result is not None:
+            logger.info(
+                "Report cards for class %s, term %s: %d cards in %.1fs (%.1f cards/s)",
+                class_id, term_id, result['cards'], result['seconds'], result['cards_per_second'],
+            )
+        done.append((key, result))
+    return done
+
+
+def job_status():
+    """(class_id, term_id) jobs queued or running, and the timings of finished ones."""
+    directory = report_card_dir()
+    pending = {_job_key(p) for p in directory.glob('*.request')}
+    pending |= {_job_key(p) for p in directory.glob('*.lock') if _is_running(p)}
+    results = {}
+    for path in directory.glob('*.json'):
+        key = _job_key(path)
+        if key is not None:
+            results[key] = json.loads(path.read_text())
+    pending.discard(None)
+    return pending, results
@@ -0,0 +1,289 @@
+# results/summaries.py
+import threading
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import Round
+
+from students.models import Student
+from .cache import grading_changed
+from .grading import GRADES
+from .models import Mark, TermSummary
+from .ranking import assign_positions, class_rankings, student_position
+
+GRADE_FIELDS = {letter: f'grade_{letter.lower()}' for letter in GRADES}
+
+
+def _summary_aggregates():
+    # expects a queryset annotated with Mark.objects.with_grade()
+    aggregates = {
+        'mark_count': Count('id'),
+        'score_total': Sum('score'),
+    }
+    for letter, field in GRADE_FIELDS.items():
+        aggregates[field] = Count('id', filter=Q(letter_grade=letter))
+    return aggregates
+
+
+def _summary_fields(row):
+    """Turn one aggregate row into TermSummary field values."""
+    count = row['mark_count']
+    total = Decimal(row['score_total'] or 0)
+    fields = {
+        'mark_count': count,
+        'score_total': total,
+        'average': (total / count).quantize(Decimal('0.01'), ROUND_HALF_UP) if count else None,
+    }
+    for name in GRADE_FIELDS.values():
+        fields[name] = row[name]
+    return fields
+
+
+def unsaved_summary(student, term, marks):
+    """
+    Build a TermSummary in memory from marks loaded with with_grade(), for
+    a page that finds no stored row. Nothing is saved: writing the row is
+    left to the Mark signals and `rebuild_term_summaries`.
+    """
+    row = {
+        'mark_count': len(marks),
+        'score_total': sum((mark.score for mark in marks), Decimal(0)),
+    }
+    for letter, field in GRADE_FIELDS.items():
+        row[field] = sum(1 for mark in marks if mark.letter_grade == letter)
+    ranked = student_position(student, term) if student.class_assigned_id else None
+    return TermSummary(
+        student=student,
+        term=term,
+        position=ranked['position'] if ranked else None,
+        **_summary_fields(row),
+    )
+
+
+def refresh_positions(class_id, term_id):
+    """Copy the current class ranking into the cached position column."""
+    positions = {
+        row['student_id']: row['position']
+        for row in class_rankings(class_id, term_id)
+    }
+    summaries = list(
+        TermSummary.objects.filter(term_id=term_id, student__class_assigned_id=class_id)
+    )
+    changed = []
+    for summary in summaries:
+        position = positions.get(summary.student_id)
+        if summary.position != position:
+            summary.position = position
+            changed.append(summary)
+    if changed:
+        TermSummary.objects.bulk_update(changed, ['position'])
+
+
+def refresh_summaries(keys):
+    """
+    Recompute the summary rows for the given (student_id, term_id) pairs.
+
+    One grouped query covers every pair, the rows are upserted in bulk and
+    class positions are then refreshed once per affected class and term.
+    """
+    keys = {(s, t) for s, t in keys if s is not None and t is not None}
+    if not keys:
+        return
+
+    with transaction.atomic():
+        rows = (
+            Mark.objects.filter(
+                student_id__in={s for s, _ in keys}, term_id__in={t for _, t in keys}
+            )
+            .with_grade()
+            .order_by()
+            .values('student_id', 'term_id')
+            .annotate(**_summary_aggregates())
+        )
+        summaries = []
+        for row in rows:
+            key = (row['student_id'], row['term_id'])
+            if key in keys:
+                summaries.append(TermSummary(student_id=key[0], term_id=key[1], **_summary_fields(row)))
+
+        TermSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['student', 'term'],
+            update_fields=['mark_count', 'score_total', 'average', *GRADE_FIELDS.values(), 'updated_at'],
+        )
+
+        emptied = keys - {(obj.student_id, obj.term_id) for obj in summaries}
+        if emptied:
+            gone = Q()
+            for student_id, term_id in emptied:
+                gone |= Q(student_id=student_id, term_id=term_id)
+            TermSummary.objects.filter(gone).delete()
+
+        classes = dict(
+            Student.objects.filter(id__in={s for s, _ in keys}).values_list('id', 'class_assigned_id')
+        )
+        for class_id, term_id in {(classes.get(s), t) for s, t in keys}:
+            if class_id is not None:
+                refresh_positions(class_id, term_id)
+
+        # a student without a class has no class position
+        unranked = [(s, t) for s, t in keys if classes.get(s) is None]
+        if unranked:
+            stale = Q()
+            for student_id, term_id in unranked:
+                stale |= Q(student_id=student_id, term_id=term_id)
+            TermSummary.objects.filter(stale, position__isnull=False).update(position=None)
+
+
+def _scope_filter(scopes):
+    """
+    Q matching Mark or TermSummary rows in any of the (term_id, class_id)
+    scopes; None in a scope means every term or every class.
+    """
+    matched = Q(pk__in=[])
+    for term_id, class_id in scopes:
+        scope = Q(term__isnull=False)
+        if term_id is not None:
+            scope &= Q(term_id=term_id)
+        if class_id is not None:
+            scope &= Q(student__class_assigned_id=class_id)
+        matched |= scope
+    return matched
+
+
+def refresh_grade_counts(scopes):
+    """
+    Recount the grade columns of the summaries in the given scopes, after
+    their grade boundaries changed. Averages and positions don't depend on
+    the boundaries, so only rows whose counts moved are written.
+    """
+    if not scopes:
+        return 0
+    counts = {
+        (row['student_id'], row['term_id']): row
+        for row in Mark.objects.filter(_scope_filter(scopes))
+        .with_grade()
+        .order_by()
+        .values('student_id', 'term_id')
+        .annotate(**{
+            field: Count('id', filter=Q(letter_grade=letter))
+            for letter, field in GRADE_FIELDS.items()
+        })
+    }
+    changed = []
+    for summary in TermSummary.objects.filter(_scope_filter(scopes)):
+        row = counts.get((summary.student_id, summary.term_id), {})
+        values = {field: row.get(field, 0) for field in GRADE_FIELDS.values()}
+        if any(getattr(summary, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(summary, field, value)
+            changed.append(summary)
+    if changed:
+        TermSummary.objects.bulk_update(changed, list(GRADE_FIELDS.values()), batch_size=1000)
+    return len(changed)
+
+
+_pending = threading.local()
+
+
+def grade_scopes_changed(scopes):
+    """
+    Recount grades for these scopes once the transaction commits.
+
+    Scopes from every boundary saved in the same transaction are pooled,
+    so editing a whole grading scale recounts each scope once rather than
+    once per grade.
+    """
+    pending = getattr(_pending, 'scopes', None)
+    if pending is None:
+        pending = _pending.scopes = set()
+    pending.update(scopes)
+    transaction.on_commit(_flush_grade_scopes)
+
+
+def _flush_grade_scopes():
+    scopes, _pending.scopes = getattr(_pending, 'scopes', None), set()
+    if not scopes:
+        return
+    if (None, None) in scopes:
+        scopes = {(None, None)}
+    if refresh_grade_counts(scopes):
+        grading_changed()
+
+
+def _expected_summaries():
+    """Build every summary from scratch with one grouped query over Mark."""
+    rows = (
+        Mark.objects.filter(term__isnull=False)
+        .with_grade()
+        .order_by()
+        .values('student_id', 'term_id', 'student__class_assigned_id')
+        .annotate(rank_average=Round(Avg('score'), 2), **_summary_aggregates())
+    )
+
+    summaries = {}
+    by_class = defaultdict(list)
+    for row in rows:
+        fields = _summary_fields(row)
+        summaries[(row['student_id'], row['term_id'])] = fields
+        class_id = row['student__class_assigned_id']
+        if class_id is not None:
+            by_class[(class_id, row['term_id'])].append({
+                'student_id': row['student_id'],
+                # same expression class_rankings() ranks on
+                'average': float(row['rank_average']),
+            })
+
+    for (_, term_id), ranking in by_class.items():
+        for ranked in assign_positions(ranking):
+            summaries[(ranked['student_id'], term_id)]['position'] = ranked['position']
+    for fields in summaries.values():
+        fields.setdefault('position', None)
+    return summaries
+
+
+def rebuild_summaries(batch_size=1000):
+    """Replace the whole summary table. Returns the number of rows written."""
+    summaries = _expected_summaries()
+    objs = [
+        TermSummary(student_id=student_id, term_id=term_id, **fields)
+        for (student_id, term_id), fields in summaries.items()
+    ]
+    with transaction.atomic():
+        TermSummary.objects.all().delete()
+        TermSummary.objects.bulk_create(objs, batch_size=batch_size)
+        # cached results tables show the old grades and positions
+        grading_changed()
+    return len(objs)
+
+
+def check_summaries():
+    """
+    Compare stored summaries with what the marks say they should be.
+
+    Returns a list of (student_id, term_id, problem) tuples; an empty list
+    means the table is consistent.
+    """
+    expected = _expected_summaries()
+    fields = ['mark_count', 'score_total', 'average', 'position', *GRADE_FIELDS.values()]
+    stored = {
+        (row['student_id'], row['term_id']): row
+        for row in TermSummary.objects.values('student_id', 'term_id', *fields)
+    }
+
+    drift = []
+    for key, values in expected.items():
+        row = stored.pop(key, None)
+        if row is None:
+            drift.append((*key, 'missing'))
+            continue
+        for name in fields:
+            want, have = values[name], row[name]
+            if want != have:
+                drift.append((*key, f"{name}: stored {have}, expected {want}"))
+    for key in stored:
+        drift.append((*key, 'orphaned (no marks)'))
+    return drift
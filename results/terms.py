@@ -0,0 +1,56 @@
+# results/terms.py
+"""
+Term registry.
+
+Terms change a few times a year but are read on almost every results and
+marks page, so the ordered term list is kept in the shared cache (see
+CACHES in settings) with a short-lived copy in each process on top. Saving
+or deleting a Term clears the shared copy and this process's copy (see the
+signals in results.models); other processes notice within LOCAL_SECONDS.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import Term
+
+CACHE_KEY = 'results:terms'
+# a backstop in case a change is made behind the signals' back (e.g. .update())
+CACHE_SECONDS = 5 * 60
+# Other processes drop their local copy within this many seconds of a change.
+LOCAL_SECONDS = 30
+
+_local = {'terms': None, 'loaded_at': 0.0}
+
+
+def get_terms():
+    """All terms in Term.Meta.ordering order (newest first)."""
+    terms = _local['terms']
+    if terms is not None and time.monotonic() - _local['loaded_at'] < LOCAL_SECONDS:
+        return terms
+
+    terms = cache.get(CACHE_KEY)
+    if terms is None:
+        terms = tuple(Term.objects.all())
+        cache.set(CACHE_KEY, terms, CACHE_SECONDS)
+    _local['terms'] = terms
+    _local['loaded_at'] = time.monotonic()
+    return terms
+
+
+def get_active_term():
+    return next((term for term in get_terms() if term.is_active), None)
+
+
+def get_term(term_id):
+    """Look a term up by ID from the cached list; None if it doesn't exist."""
+    try:
+        term_id = int(term_id)
+    except (TypeError, ValueError):
+        return None
+    return next((term for term in get_terms() if term.id == term_id), None)
+
+
+def invalidate_terms():
+    _local['terms'] = None
+    cache.delete(CACHE_KEY)
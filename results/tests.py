@@ -1,3 +1,601 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import zipfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Avg
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from coreapp.querybudget import QueryBudgetTestMixin
+from results.analytics import subject_statistics
+from results import cache as results_cache
+from results.cache import data_version
+from results.grading import invalidate_grade_boundaries
+from results.management.commands.benchmark_queries import Command as BenchmarkCommand
+from results.models import GradeBoundary, Mark, Term, TermSummary
+from results.ranking import class_rankings, student_position
+from results.reportcards import generate_report_cards, job_status, request_report_cards
+from results.summaries import check_summaries, rebuild_summaries, refresh_grade_counts
+from results import terms as terms_module
+from results.terms import get_active_term, get_term, get_terms, invalidate_terms
+from results.trends import score_pivot
+from students.models import Class, Student
+from teachers.models import Subject
+
+
+class StudentResultsQueryTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        school_class = Class.objects.create(name='Form 2')
+        cls.student = Student.objects.create(
+            first_name='Brian', last_name='Kamau', email='b@example.com', password='!',
+            date_of_birth='2010-01-01', phone_number='1', registration_number='VSS2025-0002',
+            class_assigned=school_class,
+        )
+        cls.term = Term.objects.create(name='Term 1', is_active=True)
+        # class boundaries used to make every mark look its student up again
+        GradeBoundary.objects.create(grade='A', min_score=80, class_assigned=school_class)
+        for i in range(8):
+            subject = Subject.objects.create(name=f'Subject {i}', class_assigned=school_class)
+            Mark.objects.create(student=cls.student, subject=subject, term=cls.term, score=40 + 5 * i)
+
+    def setUp(self):
+        # cached results tables are keyed by ids, which repeat across tests
+        cache.clear()
+
+    def test_results_page_budget(self):
+        url = f'/results/student/?student={self.student.id}&term={self.term.id}'
+        with self.assertQueryBudget(12):
+            response = self.client.get(url)
+        self.assertContains(response, 'Subject 7')
+
+    def test_trend_page_budget(self):
+        with self.assertQueryBudget(8):
+            self.client.get(f'/results/student/trend/?student={self.student.id}')
+
+    def test_missing_summary_is_computed_without_writing(self):
+        TermSummary.objects.all().delete()
+        url = f'/results/student/?student={self.student.id}&term={self.term.id}'
+        with self.assertQueryBudget(12), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertFalse(any(q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')) for q in queries))
+        self.assertFalse(TermSummary.objects.exists())
+        # scores 40..75 in steps of 5
+        self.assertContains(response, '<strong>Average:</strong> 57.5')
+        self.assertContains(response, '<strong>Class position:</strong> 1')
+
+    def test_mark_writes_move_the_class_version(self):
+        class_id = self.student.class_assigned_id
+        versions = [data_version(class_id, self.term.id)]
+        mark = Mark.objects.filter(student=self.student).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mark.score = 99
+            mark.save()
+        versions.append(data_version(class_id, self.term.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            mark.delete()
+        versions.append(data_version(class_id, self.term.id))
+
+        self.assertEqual(len(set(versions)), 3)
+        # other classes keep their cached tables
+        other = Class.objects.create(name='Form 3')
+        before = data_version(other.id, self.term.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Mark.objects.filter(student=self.student).first().delete()
+        self.assertEqual(data_version(other.id, self.term.id), before)
+
+    def test_hits_and_misses_are_counted(self):
+        url = f'/results/student/?student={self.student.id}&term={self.term.id}'
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(results_cache.stats(), {'hits': 2, 'misses': 1, 'hit_rate': 0.667})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Mark.objects.filter(student=self.student).first().save()
+        self.client.get(url)
+        self.assertEqual(results_cache.stats()['misses'], 2)
+
+    def test_grading_changes_invalidate_cached_tables(self):
+        class_id = self.student.class_assigned_id
+        url = f'/results/student/?student={self.student.id}&term={self.term.id}'
+        self.client.get(url)
+        before = data_version(class_id, self.term.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GradeBoundary.objects.create(grade='B', min_score=65, class_assigned_id=class_id)
+        after_boundary = data_version(class_id, self.term.id)
+        self.assertNotEqual(after_boundary, before)
+        # Subject 5 scored 65: graded with the new boundary, not served from the old fragment
+        self.assertContains(self.client.get(url), '<td class="text-center">B</td>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_summaries()
+        self.assertNotEqual(data_version(class_id, self.term.id), after_boundary)
+
+
+
+class SummaryMaintenanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form1 = Class.objects.create(name='Form 1')
+        cls.form2 = Class.objects.create(name='Form 2')
+        cls.term1 = Term.objects.create(name='Term 1', start_date='2025-01-06', is_active=True)
+        cls.term2 = Term.objects.create(name='Term 2', start_date='2025-05-05')
+        cls.maths = Subject.objects.create(name='Maths', class_assigned=cls.form1)
+        cls.english = Subject.objects.create(name='English', class_assigned=cls.form1)
+        cls.amina, cls.brian = [
+            Student.objects.create(
+                first_name=name, last_name='Summary', email=f'{name}@example.com', password='!',
+                date_of_birth='2010-01-01', phone_number='1', registration_number=f'VSS2025-110{i}',
+                class_assigned=cls.form1,
+            )
+            for i, name in enumerate(('Amina', 'Brian'))
+        ]
+
+    def setUp(self):
+        cache.clear()
+        invalidate_grade_boundaries()
+
+    def summary(self, student, term=None):
+        return TermSummary.objects.filter(student=student, term=term or self.term1).first()
+
+    def assertSummary(self, student, mark_count, average, position, term=None):
+        summary = self.summary(student, term)
+        self.assertEqual(
+            (summary.mark_count, summary.average, summary.position),
+            (mark_count, Decimal(average), position),
+        )
+        self.assertEqual(check_summaries(), [])
+
+    def test_marks_written_one_by_one_keep_summaries_in_step(self):
+        mark = Mark.objects.create(student=self.amina, subject=self.maths, term=self.term1, score=60)
+        self.assertSummary(self.amina, 1, '60.00', 1)
+        self.assertEqual(self.summary(self.amina).grade_c, 1)
+
+        Mark.objects.create(student=self.amina, subject=self.english, term=self.term1, score=81)
+        Mark.objects.create(student=self.brian, subject=self.maths, term=self.term1, score=75)
+        self.assertSummary(self.amina, 2, '70.50', 2)
+        self.assertSummary(self.brian, 1, '75.00', 1)
+
+        mark.score = 90
+        mark.save()
+        self.assertSummary(self.amina, 2, '85.50', 1)
+        self.assertSummary(self.brian, 1, '75.00', 2)
+
+        mark.delete()
+        self.assertSummary(self.amina, 1, '81.00', 1)
+
+    def test_a_mark_moved_to_another_term_or_student(self):
+        mark = Mark.objects.create(student=self.amina, subject=self.maths, term=self.term1, score=60)
+
+        mark.term = self.term2
+        mark.save()
+        self.assertIsNone(self.summary(self.amina))
+        self.assertSummary(self.amina, 1, '60.00', 1, term=self.term2)
+
+        mark.student = self.brian
+        mark.save()
+        self.assertIsNone(self.summary(self.amina, self.term2))
+        self.assertSummary(self.brian, 1, '60.00', 1, term=self.term2)
+
+    def test_class_changes_rerank_both_classes(self):
+        Mark.objects.create(student=self.amina, subject=self.maths, term=self.term1, score=80)
+        Mark.objects.create(student=self.brian, subject=self.maths, term=self.term1, score=70)
+        self.assertSummary(self.brian, 1, '70.00', 2)
+
+        self.amina.class_assigned = self.form2
+        self.amina.save()
+        self.assertSummary(self.amina, 1, '80.00', 1)
+        self.assertSummary(self.brian, 1, '70.00', 1)
+
+        self.brian.class_assigned = None
+        self.brian.save()
+        self.assertSummary(self.brian, 1, '70.00', None)
+
+    def test_check_finds_drift_and_rebuild_fixes_it(self):
+        Mark.objects.create(student=self.amina, subject=self.maths, term=self.term1, score=80)
+        Mark.objects.create(student=self.brian, subject=self.maths, term=self.term1, score=70)
+        TermSummary.objects.filter(student=self.amina).update(mark_count=5, position=2)
+        TermSummary.objects.filter(student=self.brian).delete()
+        TermSummary.objects.create(student=self.amina, term=self.term2)
+
+        self.assertEqual(sorted(check_summaries()), sorted([
+            (self.amina.id, self.term1.id, 'mark_count: stored 5, expected 1'),
+            (self.amina.id, self.term1.id, 'position: stored 2, expected 1'),
+            (self.brian.id, self.term1.id, 'missing'),
+            (self.amina.id, self.term2.id, 'orphaned (no marks)'),
+        ]))
+
+        self.assertEqual(rebuild_summaries(), 2)
+        self.assertEqual(check_summaries(), [])
+
+class GradeBoundaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.term = Term.objects.create(name='Term 1', is_active=True)
+        cls.form1 = Class.objects.create(name='Form 1')
+        cls.form2 = Class.objects.create(name='Form 2')
+        for i, school_class in enumerate((cls.form1, cls.form2)):
+            student = Student.objects.create(
+                first_name=f'Pupil{i}', last_name='Otieno', email=f'o{i}@example.com', password='!',
+                date_of_birth='2010-01-01', phone_number='1', registration_number=f'VSS2025-020{i}',
+                class_assigned=school_class,
+            )
+            subject = Subject.objects.create(name='Maths', class_assigned=school_class)
+            Mark.objects.create(student=student, subject=subject, term=cls.term, score=70)
+        rebuild_summaries()
+
+    def setUp(self):
+        cache.clear()
+
+    def summary(self, school_class):
+        return TermSummary.objects.get(student__class_assigned=school_class, term=self.term)
+
+    def test_grade_will_not_look_the_student_up_per_mark(self):
+        GradeBoundary.objects.create(grade='A', min_score=65, class_assigned=self.form1)
+        mark = Mark.objects.get(student__class_assigned=self.form1)
+        with self.assertRaises(ValueError):
+            mark.grade
+
+        mark = Mark.objects.select_related('student').get(student__class_assigned=self.form1)
+        with self.assertNumQueries(0):
+            self.assertEqual(mark.grade, 'A')
+        self.assertEqual(Mark.objects.with_grade().get(pk=mark.pk).grade, 'A')
+
+    def test_boundary_change_recounts_only_its_class(self):
+        self.assertEqual(self.summary(self.form1).grade_b, 1)  # 70 is a B by default
+        untouched = self.summary(self.form2).updated_at
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GradeBoundary.objects.create(grade='A', min_score=65, class_assigned=self.form1)
+
+        self.assertEqual((self.summary(self.form1).grade_a, self.summary(self.form1).grade_b), (1, 0))
+        form2 = self.summary(self.form2)
+        self.assertEqual((form2.grade_a, form2.grade_b), (0, 1))
+        self.assertEqual(form2.updated_at, untouched)
+
+    def test_moving_a_boundary_recounts_the_class_it_left(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            boundary = GradeBoundary.objects.create(grade='A', min_score=65, class_assigned=self.form1)
+        with self.captureOnCommitCallbacks(execute=True):
+            boundary.class_assigned = self.form2
+            boundary.save()
+
+        self.assertEqual(self.summary(self.form1).grade_b, 1)
+        self.assertEqual(self.summary(self.form2).grade_a, 1)
+
+    def test_a_whole_scale_is_recounted_once(self):
+        scale = (('A', 80), ('B', 70), ('C', 60), ('D', 50))
+        with mock.patch('results.summaries.refresh_grade_counts', wraps=refresh_grade_counts) as recount:
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                for grade, min_score in scale:
+                    GradeBoundary.objects.create(grade=grade, min_score=min_score, class_assigned=self.form1)
+
+        recount.assert_called_once_with({(None, self.form1.id)})
+        self.assertEqual(self.summary(self.form1).grade_b, 1)
+
+    def test_moving_a_student_regrades_their_summary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            GradeBoundary.objects.create(grade='A', min_score=65, class_assigned=self.form2)
+        student = Student.objects.get(class_assigned=self.form2)
+        self.assertEqual(self.summary(self.form2).grade_a, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student.class_assigned = self.form1
+            student.save()
+
+        summary = TermSummary.objects.get(student=student)
+        self.assertEqual((summary.grade_a, summary.grade_b), (0, 1))
+        self.assertEqual(check_summaries(), [])
+
+    def test_only_one_school_wide_boundary_per_grade(self):
+        GradeBoundary.objects.create(grade='A', min_score=80)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            GradeBoundary.objects.create(grade='A', min_score=85)
+        GradeBoundary.objects.create(grade='A', min_score=85, term=self.term)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            GradeBoundary.objects.create(grade='A', min_score=90, term=self.term)
+
+
+
+
+class TermRegistryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.term1 = Term.objects.create(name='Term 1', start_date='2025-01-06', is_active=True)
+
+    def setUp(self):
+        cache.clear()
+        invalidate_terms()
+
+    def test_terms_are_read_once(self):
+        self.assertEqual([t.name for t in get_terms()], ['Term 1'])
+        with self.assertNumQueries(0):
+            get_terms()
+            get_term(self.term1.id)
+        # a process without its own copy reads the shared one
+        terms_module._local['terms'] = None
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_term(), self.term1)
+
+    def test_saving_or_deleting_a_term_refreshes_the_registry(self):
+        get_terms()
+        with self.captureOnCommitCallbacks(execute=True):
+            term2 = Term.objects.create(name='Term 2', start_date='2025-05-05')
+        self.assertIsNone(cache.get(terms_module.CACHE_KEY))
+        self.assertEqual([t.name for t in get_terms()], ['Term 2', 'Term 1'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            term2.name = 'Second Term'
+            term2.save()
+        self.assertEqual(get_term(term2.id).name, 'Second Term')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            term2.delete()
+        self.assertIsNone(get_term(term2.id))
+
+    def test_activating_a_term_retires_the_previous_one(self):
+        self.assertEqual(get_active_term(), self.term1)
+        with self.captureOnCommitCallbacks(execute=True):
+            term2 = Term.objects.create(name='Term 2', start_date='2025-05-05', is_active=True)
+
+        self.assertEqual(get_active_term(), term2)
+        self.assertFalse(get_term(self.term1.id).is_active)
+        self.assertEqual(list(Term.objects.filter(is_active=True)), [term2])
+
+class ClassRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school_class = Class.objects.create(name='Form 4')
+        cls.term = Term.objects.create(name='Term 1', is_active=True)
+        subjects = [Subject.objects.create(name=f'Subject {i}', class_assigned=cls.school_class) for i in range(3)]
+        # averages: 80, 66.67 (70/70/60), 66.67, 60, and one student with no marks
+        scores = [(80,), (70, 70, 60), (66.67,), (60,), ()]
+        cls.students = []
+        for i, marks in enumerate(scores):
+            student = Student.objects.create(
+                first_name=f'Pupil{i}', last_name='Ranked', email=f'r{i}@example.com', password='!',
+                date_of_birth='2009-01-01', phone_number='1', registration_number=f'VSS2024-020{i}',
+                class_assigned=cls.school_class,
+            )
+            for subject, score in zip(subjects, marks):
+                Mark.objects.create(student=student, subject=subject, term=cls.term, score=score)
+            cls.students.append(student)
+
+    def ranking(self):
+        return [
+            (row['student_id'], row['average'], row['position'], row['dense_position'])
+            for row in class_rankings(self.school_class.id, self.term)
+        ]
+
+    def test_ties_share_a_position(self):
+        s = [student.id for student in self.students]
+        self.assertEqual(self.ranking(), [
+            (s[0], 80.0, 1, 1),
+            (s[1], 66.67, 2, 2),
+            (s[2], 66.67, 2, 2),
+            (s[3], 60.0, 4, 3),
+        ])
+
+    def test_python_fallback_ranks_the_same(self):
+        in_sql = self.ranking()
+        with mock.patch.object(connection.features, 'supports_over_clause', False):
+            self.assertEqual(self.ranking(), in_sql)
+
+    def test_students_without_marks_are_unranked(self):
+        self.assertIsNone(student_position(self.students[4], self.term))
+        self.assertEqual(student_position(self.students[3], self.term)['position'], 4)
+        self.assertEqual(class_rankings(self.school_class.id, None), [])
+
+
+class SubjectStatisticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school_class = Class.objects.create(name='Form 1')
+        cls.term = Term.objects.create(name='Term 1', is_active=True)
+        cls.biology = Subject.objects.create(name='Biology', class_assigned=cls.school_class)
+        art = Subject.objects.create(name='Art', class_assigned=cls.school_class)
+        for i, score in enumerate((35, 55, 60, 75, 90)):
+            student = Student.objects.create(
+                first_name=f'Pupil{i}', last_name='Stats', email=f's{i}@example.com', password='!',
+                date_of_birth='2010-01-01', phone_number='1', registration_number=f'VSS2025-090{i}',
+                class_assigned=cls.school_class,
+            )
+            Mark.objects.create(student=student, subject=cls.biology, term=cls.term, score=score)
+        Mark.objects.create(student=student, subject=art, term=cls.term, score=100)
+
+    def setUp(self):
+        cache.clear()
+        # boundaries saved by another test are rolled back without a signal
+        invalidate_grade_boundaries()
+
+    def test_values(self):
+        art, biology = subject_statistics(self.school_class.id, self.term.id)
+
+        self.assertEqual(art['subject'], 'Art')
+        self.assertEqual((art['count'], art['median'], art['std_dev'], art['histogram'][-1]), (1, 100, 0, 1))
+        self.assertEqual(
+            {k: v for k, v in biology.items() if k != 'histogram'},
+            {
+                'subject_id': self.biology.id, 'subject': 'Biology', 'count': 5,
+                'mean': 63.0, 'median': 60.0, 'std_dev': 18.6, 'min': 35.0, 'max': 90.0,
+                'q1': 55.0, 'q3': 75.0, 'p10': 43.0, 'p90': 84.0,
+                'pass_rate': 80.0,  # 35 is below the default D boundary of 40
+            },
+        )
+        self.assertEqual(biology['histogram'], [0, 0, 0, 1, 0, 1, 1, 1, 0, 1])
+
+    def test_pass_mark_follows_the_class_boundaries(self):
+        GradeBoundary.objects.create(grade='D', min_score=30, class_assigned=self.school_class)
+        biology = subject_statistics(self.school_class.id, self.term.id)[1]
+        self.assertEqual(biology['pass_rate'], 100.0)
+
+    def test_cached_until_marks_change(self):
+        subject_statistics(self.school_class.id, self.term.id)
+        with self.assertNumQueries(0):
+            subject_statistics(self.school_class.id, self.term.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Mark.objects.filter(subject=self.biology, score=35).get().delete()
+        biology = subject_statistics(self.school_class.id, self.term.id)[1]
+        self.assertEqual((biology['count'], biology['pass_rate']), (4, 100.0))
+
+
+class ScorePivotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school_class = Class.objects.create(name='Form 2')
+        cls.term1 = Term.objects.create(name='Term 1', start_date='2025-01-06')
+        cls.term2 = Term.objects.create(name='Term 2', start_date='2025-05-05', is_active=True)
+        Term.objects.create(name='Term 3', start_date='2025-09-01')  # no marks yet
+        maths = Subject.objects.create(name='Maths', class_assigned=cls.school_class)
+        english = Subject.objects.create(name='English', class_assigned=cls.school_class)
+        cls.amina, brian = [
+            Student.objects.create(
+                first_name=name, last_name='Trend', email=f'{name}@example.com', password='!',
+                date_of_birth='2010-01-01', phone_number='1', registration_number=f'VSS2025-100{i}',
+                class_assigned=cls.school_class,
+            )
+            for i, name in enumerate(('Amina', 'Brian'))
+        ]
+        for student, subject, term, score in [
+            (cls.amina, maths, cls.term1, 60), (cls.amina, maths, cls.term2, 70.5),
+            (cls.amina, english, cls.term2, 80), (brian, maths, cls.term1, 80),
+        ]:
+            Mark.objects.create(student=student, subject=subject, term=term, score=score)
+
+    def setUp(self):
+        cache.clear()
+
+    def table(self, pivot):
+        return [(row['subject'], row['scores'], row['change']) for row in pivot['rows']]
+
+    def test_student_pivot_from_one_query(self):
+        get_terms()
+        with self.assertNumQueries(1):
+            pivot = score_pivot(Mark.objects.filter(student=self.amina))
+
+        self.assertEqual([t.name for t in pivot['terms']], ['Term 1', 'Term 2'])
+        self.assertEqual(self.table(pivot), [
+            ('English', [None, 80.0], None),
+            ('Maths', [60.0, 70.5], 10.5),
+        ])
+        self.assertEqual(pivot['term_averages'], [60.0, 75.25])
+        self.assertEqual(pivot['chart_points'], '0.0,36.0 320.0,22.3')
+
+    def test_class_pivot_averages_every_mark(self):
+        pivot = score_pivot(Mark.objects.filter(student__class_assigned=self.school_class))
+
+        self.assertEqual(self.table(pivot), [
+            ('English', [None, 80.0], None),
+            ('Maths', [70.0, 70.5], 0.5),
+        ])
+        # weighted by marks, not by subject: (60 + 80) / 2 and (70.5 + 80) / 2
+        self.assertEqual(pivot['term_averages'], [70.0, 75.25])
+
+    def test_trend_page_shows_the_pivot(self):
+        response = self.client.get(f'/results/student/trend/?student={self.amina.id}')
+        self.assertContains(response, '<polyline')
+        self.assertContains(response, '10.5')
+
+
+class BenchmarkQueriesTests(TestCase):
+    def test_covering_index_scans_are_reported(self):
+        full_scans = BenchmarkCommand().full_scans
+        self.assertEqual(full_scans(
+            "SCAN results_mark USING COVERING INDEX mark_student_term_idx\n"
+            "SEARCH students_student USING INTEGER PRIMARY KEY (rowid=?)\n"
+            "SCAN teachers_subject"
+        ), ['results_mark'])
+
+    def test_class_averages_seek_on_term(self):
+        plan = (
+            Mark.objects.filter(term_id=1, student__class_assigned_id=1).order_by()
+            .values('student_id').annotate(average=Avg('score')).explain()
+        )
+        self.assertIn('SEARCH results_mark USING COVERING INDEX mark_term_student_idx', plan)
+        self.assertNotIn('SCAN results_mark', plan)
+
+    def test_command_finds_no_unexpected_scans(self):
+        out = io.StringIO()
+        call_command('benchmark_queries', students=60, classes=3, repeat=1, stdout=out)
+        self.assertIn("Every hot query is served by an index.", out.getvalue())
+
+class ReportCardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.school_class = Class.objects.create(name='Form 3')
+        cls.term = Term.objects.create(name='Term 2', is_active=True)
+        subject = Subject.objects.create(name='History', class_assigned=cls.school_class)
+        for i, score in enumerate((71, 58)):
+            student = Student.objects.create(
+                first_name=f'Pupil{i}', last_name='Moyo', email=f'p{i}@example.com', password='!',
+                date_of_birth='2009-01-01', phone_number='1', registration_number=f'VSS2024-010{i}',
+                class_assigned=cls.school_class,
+            )
+            Mark.objects.create(student=student, subject=subject, term=cls.term, score=score)
+        cls.staff = User.objects.create_superuser('head', 'head@example.com', 'pw')
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_override = override_settings(REPORT_CARD_ROOT=self.root, SCHOOL_NAME='Test Ridge School')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_cards_are_written_outside_media_root(self):
+        result = generate_report_cards(self.school_class.id, self.term.id, workers=1)
+
+        self.assertEqual(result['cards'], 2)
+        zip_path = Path(result['zip_path'])
+        self.assertEqual(zip_path.parent, Path(self.root))
+        self.assertFalse(zip_path.is_relative_to(Path(settings.MEDIA_ROOT)))
+        with zipfile.ZipFile(zip_path) as bundle:
+            self.assertEqual(sorted(bundle.namelist()), ['VSS2024-0100.pdf', 'VSS2024-0101.pdf'])
+            pdf = bundle.read('VSS2024-0100.pdf')
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertIn(b'Test Ridge School', pdf)
+        self.assertIn(b'Class position: 1 of 2', pdf)
+
+    def test_staff_page_queues_and_the_worker_renders(self):
+        key = (self.school_class.id, self.term.id)
+        self.assertTrue(request_report_cards(*key))
+        self.assertFalse(request_report_cards(*key))  # already queued
+        self.assertIn(key, job_status()[0])
+
+        call_command('generate_report_cards', '--queued', '--workers', '1', stdout=io.StringIO())
+
+        pending, results = job_status()
+        self.assertNotIn(key, pending)
+        self.assertEqual(results[key]['cards'], 2)
+        self.assertTrue((Path(self.root) / f'term{self.term.id}_class{self.school_class.id}.zip').is_file())
+
+    def test_download_is_staff_only(self):
+        generate_report_cards(self.school_class.id, self.term.id, workers=1)
+        url = f'/staff/report-cards/term{self.term.id}_class{self.school_class.id}.zip/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        User.objects.create_user('parent', 'parent@example.com', 'pw')
+        self.client.login(username='parent', password='pw')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(zipfile.is_zipfile(io.BytesIO(b''.join(response.streaming_content))))
+        self.assertEqual(self.client.get(url.replace('.zip/', '.lock/')).status_code, 404)
@@ -0,0 +1,68 @@
+# results/trends.py
+from collections import defaultdict
+
+from django.db.models import Avg, Count
+
+from .terms import get_terms
+
+CHART_WIDTH = 320
+CHART_HEIGHT = 90
+
+
+def _chart_points(values):
+    """SVG polyline points for a list of 0-100 values (None values are skipped)."""
+    if not values:
+        return ''
+    step = CHART_WIDTH / max(len(values) - 1, 1)
+    points = []
+    for i, value in enumerate(values):
+        if value is not None:
+            y = CHART_HEIGHT - (value / 100) * CHART_HEIGHT
+            points.append(f"{round(i * step, 1)},{round(y, 1)}")
+    return ' '.join(points)
+
+
+def score_pivot(marks):
+    """
+    Subject-by-term pivot of average scores for a Mark queryset, from one
+    grouped query.
+
+    Pass one student's marks for their own scores, or a whole class's marks
+    for class averages. Terms run oldest to newest. Returns a dict with
+    'terms', 'rows' (subject, scores per term, change from first to last
+    recorded term), 'term_averages' and 'chart_points' for an inline chart.
+    """
+    grouped = (
+        marks.filter(term__isnull=False)
+        .order_by()
+        .values('subject__name', 'term_id')
+        .annotate(average=Avg('score'), count=Count('id'))
+    )
+
+    cells = defaultdict(dict)
+    term_totals = defaultdict(float)
+    term_counts = defaultdict(int)
+    for row in grouped:
+        average = float(row['average'])
+        cells[row['subject__name']][row['term_id']] = round(average, 2)
+        term_totals[row['term_id']] += average * row['count']
+        term_counts[row['term_id']] += row['count']
+
+    terms = [term for term in reversed(get_terms()) if term.id in term_counts]
+
+    rows = []
+    for subject in sorted(cells):
+        scores = [cells[subject].get(term.id) for term in terms]
+        recorded = [s for s in scores if s is not None]
+        change = round(recorded[-1] - recorded[0], 2) if len(recorded) > 1 else None
+        rows.append({'subject': subject, 'scores': scores, 'change': change})
+
+    term_averages = [round(term_totals[t.id] / term_counts[t.id], 2) for t in terms]
+    return {
+        'terms': terms,
+        'rows': rows,
+        'term_averages': term_averages,
+        'chart_points': _chart_points(term_averages),
+        'chart_width': CHART_WIDTH,
+        'chart_height': CHART_HEIGHT,
+    }
@@ -5,5 +5,7 @@ app_name = 'results'
 
 urlpatterns = [
     path('student/', views.student_results, name='student_results'),
+    path('student/trend/', views.student_trend, name='student_trend'),
     path('add-mark/', views.add_or_update_mark, name='add_or_update_mark'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
 ]
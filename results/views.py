@@ -1,11 +1,22 @@
 # results/views.py
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from .models import Mark, Term
-from teachers.models import Student, Subject, Teacher
+from .models import Mark, TermSummary
+from teachers.models import Student, Subject
 from django.urls import reverse
-from django.db.models import Avg
-
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from coreapp.identity import is_staff_user, teacher_required
+from coreapp.querybudget import query_budget
+from . import cache as results_cache
+from .cache import data_version, fragment_key, get_fragment, set_fragment
+from .terms import get_active_term, get_term, get_terms
+from .trends import score_pivot
+from .summaries import unsaved_summary
+
+@teacher_required
 def add_or_update_mark(request):
     """
     Endpoint for teacher POST to create/update a mark.
@@ -15,12 +26,7 @@ def add_or_update_mark(request):
     if request.method != 'POST':
         return redirect('teacher_dashboard')
 
-    teacher_id = request.session.get('teacher_id')
-    if not teacher_id:
-        messages.error(request, "Please login first.")
-        return redirect('teacher_login')
-
-    teacher = get_object_or_404(Teacher, id=teacher_id)
+    teacher = request.teacher
 
     # accept either student id or registration_number
     student_id = request.POST.get('student') or None
@@ -36,14 +42,16 @@ def add_or_update_mark(request):
     if student_id:
         student = get_object_or_404(Student, id=student_id)
     elif reg_no:
-        student = Student.objects.filter(registration_number__iexact=reg_no).first()
+        student = Student.objects.by_registration_number(reg_no).first()
 
     if not student or not subject_id or not term_id or score is None:
         messages.error(request, "Missing required fields.")
         return redirect('teacher_dashboard')
 
     subject = get_object_or_404(Subject, id=subject_id)
-    term = get_object_or_404(Term, id=term_id)
+    term = get_term(term_id)
+    if term is None:
+        raise Http404("No such term.")
 
     mark, created = Mark.objects.update_or_create(
         student=student,
@@ -57,52 +65,87 @@ def add_or_update_mark(request):
     url = reverse('results:student_results') + f'?student={student.id}&term={term.id}'
     return redirect(url)
 
+def _results_student(request):
+    """The student named by ?student=ID, else the logged-in student."""
+    if request.GET.get('student'):
+        return get_object_or_404(Student.objects.select_related('class_assigned'), id=request.GET['student'])
+    return request.student
+
+
+@query_budget(12)
 def student_results(request):
     # Allow viewing by logged-in student OR admin/teacher viewing a student's results by ?student=ID
-    session_student_id = request.session.get('student_id')
-    student_id = request.GET.get('student') or session_student_id
-
-    if not student_id:
+    student = _results_student(request)
+    if not student:
         messages.error(request, "Please login to view results.")
         return redirect('students:student_login')
 
-    student = get_object_or_404(Student, id=student_id)
-
     term_id = request.GET.get('term')
-    term = Term.objects.filter(id=term_id).first() if term_id else Term.objects.filter(is_active=True).first()
-
-    marks = Mark.objects.filter(student=student, term=term).select_related('subject', 'teacher') if term else []
-
-    # compute average
-    average = None
-    if marks:
-        avg = marks.aggregate(avg_score=Avg('score'))['avg_score']
-        if avg is not None:
-            average = round(float(avg), 2)
+    term = get_term(term_id) if term_id else get_active_term()
 
-    # compute class position if you want: average per student across same class and term
-    position = None
+    # The marks table is cached per (student, term, data version); any mark
+    # write in the class or roster change moves the version on.
+    key = None
+    results_table = None
     if term:
-        class_students = Student.objects.filter(class_assigned=student.class_assigned)
-        averages = []
-        for s in class_students:
-            s_avg = Mark.objects.filter(student=s, term=term).aggregate(avg_score=Avg('score'))['avg_score']
-            if s_avg is not None:
-                averages.append((s.id, float(s_avg)))
-        averages.sort(key=lambda x: x[1], reverse=True)
-        for idx, (sid, _) in enumerate(averages, start=1):
-            if sid == student.id:
-                position = idx
-                break
-
-    terms = Term.objects.all()
+        key = fragment_key(student.id, term.id, data_version(student.class_assigned_id, term.id))
+        results_table = get_fragment(key)
+
+    if results_table is None:
+        marks = (
+            Mark.objects.filter(student=student, term=term)
+            .select_related('subject', 'teacher')
+            .with_grade(term, student.class_assigned_id)
+        ) if term else []
+
+        # average, grade counts and class position are read from the summary row
+        summary = None
+        if term:
+            summary = TermSummary.objects.filter(student=student, term=term).first()
+            if summary is None and marks:
+                # marks recorded before summaries existed: work the figures out
+                # here rather than write during a GET
+                summary = unsaved_summary(student, term, marks)
+
+        average = float(summary.average) if summary and summary.average is not None else None
+        position = summary.position if summary else None
+
+        results_table = render_to_string('results/_results_table.html', {
+            'term': term,
+            'marks': marks,
+            'average': average,
+            'position': position,
+            'summary': summary,
+        })
+        if key:
+            set_fragment(key, results_table)
+
+    terms = get_terms()
     return render(request, 'results/student_results.html', {
         'student': student,
         'term': term,
         'terms': terms,
-        'marks': marks,
-        'average': average,
-        'position': position,
+        'results_table': mark_safe(results_table),
     })
 
+
+@query_budget(8)
+def student_trend(request):
+    """Subject-by-term scores for one student across every term."""
+    student = _results_student(request)
+    if not student:
+        messages.error(request, "Please login to view results.")
+        return redirect('students:student_login')
+    return render(request, 'results/student_trend.html', {
+        'student': student,
+        'pivot': score_pivot(Mark.objects.filter(student=student)),
+    })
+
+
+@login_required
+@user_passes_test(is_staff_user)
+def cache_stats(request):
+    """Hit and miss counters for the cached results tables."""
+    return JsonResponse(results_cache.stats())
+
 # Create your views here.
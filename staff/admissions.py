@@ -0,0 +1,192 @@
+# staff/admissions.py
+"""
+Admissions: deciding applications in bulk, and the counters staff watch.
+
+decide_applications() sets the status of the given applications with
+one UPDATE per current status; an application can be decided again, so
+a mistaken rejection can be turned into an approval. For approvals it
+queues the registration emails with one INSERT in the same transaction,
+so an approval is never recorded without its email. The outbox sends
+them after the commit (coreapp.outbox), so staff never wait on SMTP;
+undelivered_registrations() lists the ones that bounced for the next
+page load.
+
+admission_counts() gives the dashboard counters from one conditional
+aggregate. The result is cached for COUNTS_TIMEOUT seconds and dropped
+as soon as applications or students change. Saves and deletes do that
+through the receivers in staff.models. queryset.update() and
+bulk_create() send no signals, so code using them (decide_applications,
+staff.intake) calls counts_changed() itself, and updates the reporting
+rollup (staff.reporting) the same way.
+
+take_snapshot() saves the day's counters as an AdmissionsSnapshot for
+the dashboard's intake trend.
+
+applications_page() is the review list, newest first, one page at a time.
+It seeks past a (submitted_at, id) cursor instead of using OFFSET, so the
+last page costs the same as the first.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from coreapp.models import OutboundEmail
+from coreapp.outbox import enqueue_many
+from students.models import Student
+from students.utils import registration_email
+from .models import AdmissionsSnapshot, StudentApplication
+from .reporting import apply_deltas, status_deltas
+
+DECISIONS = {'approve': 'approved', 'reject': 'rejected'}
+COUNTS_KEY = 'admissions:counts'
+COUNTS_TIMEOUT = 60
+PAGE_SIZE = 50
+
+
+# --------------------------
+# Counters
+# --------------------------
+def count_admissions():
+    """The counters straight from the database, bypassing the cache."""
+    counts = StudentApplication.objects.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+        approved=Count('id', filter=Q(status='approved')),
+        rejected=Count('id', filter=Q(status='rejected')),
+    )
+    counts['students'] = Student.objects.count()
+    return counts
+
+
+def admission_counts():
+    """total / pending / approved / rejected applications and students, cached briefly."""
+    return cache.get_or_set(COUNTS_KEY, count_admissions, COUNTS_TIMEOUT)
+
+
+def counts_changed():
+    """Drop the cached counters once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(COUNTS_KEY))
+
+
+def take_snapshot(day=None):
+    """Record the counters for `day` (default today); rerunning a day overwrites it."""
+    day = day or timezone.localdate()
+    counts = count_admissions()
+    counts['received'] = StudentApplication.objects.filter(submitted_at__date=day).count()
+    snapshot, _ = AdmissionsSnapshot.objects.update_or_create(day=day, defaults=counts)
+    return snapshot
+
+
+def intake_trend(days=14):
+    """Snapshots from the last `days` days, oldest first."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(AdmissionsSnapshot.objects.filter(day__gte=since).order_by('day'))
+
+
+# --------------------------
+# Review list
+# --------------------------
+def encode_cursor(application):
+    return f"{application.submitted_at.isoformat()}|{application.id}"
+
+
+def decode_cursor(cursor):
+    """(submitted_at, id) from a cursor, or None if it isn't one."""
+    submitted, _, last_id = cursor.rpartition('|')
+    try:
+        submitted = datetime.fromisoformat(submitted)
+    except ValueError:
+        return None
+    if not last_id.isdigit() or timezone.is_naive(submitted):
+        return None
+    return submitted, int(last_id)
+
+
+def applications_page(status=None, class_id=None, after=None, size=None):
+    """
+    Up to `size` applications, newest first, optionally filtered by status
+    and applied class, starting after the decoded cursor `after`. Returns
+    (applications, cursor of the next page or None).
+    """
+    size = size or PAGE_SIZE
+    applications = StudentApplication.objects.select_related('applied_class')
+    if status:
+        applications = applications.filter(status=status)
+    if class_id:
+        applications = applications.filter(applied_class_id=class_id)
+    if after:
+        submitted, last_id = after
+        applications = applications.filter(
+            Q(submitted_at__lt=submitted) | Q(submitted_at=submitted, id__lt=last_id)
+        )
+
+    page = list(applications.order_by('-submitted_at', '-id')[:size + 1])
+    more = len(page) > size
+    page = page[:size]
+    return page, encode_cursor(page[-1]) if more else None
+
+
+# --------------------------
+# Decisions
+# --------------------------
+
+def decide_applications(ids, action):
+    """
+    Approve or reject the applications among `ids` that aren't in that
+    state already. Returns a dict of counts: 'decided', 'skipped' (already
+    in that state), 'missing' (no such application, e.g. deleted since the
+    page was loaded) and 'queued' registration emails.
+    """
+    status = DECISIONS[action]
+    ids = {int(i) for i in ids}
+
+    with transaction.atomic():
+        found = list(
+            StudentApplication.objects.filter(id__in=ids)
+            .values_list('id', 'email', 'registration_number', 'submitted_at', 'applied_class_id', 'status')
+        )
+        rows = [row for row in found if row[5] != status]
+        decided = 0
+        deltas = Counter()
+        for old_status in {row[5] for row in rows}:
+            group = [row for row in rows if row[5] == old_status]
+            decided += StudentApplication.objects.filter(
+                id__in=[row[0] for row in group], status=old_status,
+            ).update(status=status)
+            deltas.update(status_deltas(((row[3], row[4]) for row in group), old_status, status))
+        if decided:
+            # update() sends no post_save, so refresh what the receivers would have
+            counts_changed()
+            apply_deltas(deltas)
+
+        emails = []
+        if status == 'approved':
+            emails = enqueue_many((*registration_email(reg_no), [email]) for _, email, reg_no, _, _, _ in rows)
+
+    return {
+        'decided': decided,
+        'skipped': len(found) - len(rows),
+        'missing': len(ids) - len(found),
+        'queued': len(emails),
+    }
+
+
+def undelivered_registrations(days=7):
+    """(name, email) of approved applicants whose email was given up on in the last `days` days."""
+    since = timezone.now() - timedelta(days=days)
+    dead = {
+        address
+        for recipients in OutboundEmail.objects.filter(status='dead', created_at__gte=since)
+        .values_list('recipients', flat=True)
+        for address in recipients
+    }
+    if not dead:
+        return []
+    return list(
+        StudentApplication.objects.filter(status='approved', is_registered=False, email__in=dead)
+        .order_by('student_name').values_list('student_name', 'email')
+    )
@@ -0,0 +1,234 @@
+# staff/intake.py
+"""
+Spooled admissions intake.
+
+With ADMISSIONS_INTAKE_MODE = 'spool', student_apply validates a submission,
+gives it a registration number from a pre-reserved block and appends it as
+one JSON line to a journal under ADMISSIONS_SPOOL_DIR. Nothing is written
+to the database on the request, so a surge of applicants no longer queues
+on SQLite's write lock.
+
+flush_spool() (run by `manage.py flush_admissions`, usually with --loop)
+moves the journal aside and writes its lines to StudentApplication in
+batched transactions. Inserts ignore registration numbers that already
+exist, so replaying a journal after a crash is harmless.
+
+Appenders and the flusher serialise on an flock of the journal. An
+appender that locked a journal the flusher has just moved aside notices
+the changed inode and reopens the new one.
+"""
+import fcntl
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from students.models import Class
+from .admissions import counts_changed
+from .reporting import apply_deltas, created_deltas
+from .models import StudentApplication
+from .registration import RegistrationPool, format_registration_number
+
+JOURNAL_NAME = 'intake.jsonl'
+CLASS_IDS_KEY = 'admissions:class_ids'
+LAST_FLUSH_KEY = 'admissions:last_flush'
+
+# numbers are reserved in blocks so an applicant never waits on the database
+_pool = RegistrationPool(max(getattr(settings, 'REGISTRATION_BLOCK_SIZE', 1), 50))
+
+
+def intake_mode():
+    return getattr(settings, 'ADMISSIONS_INTAKE_MODE', 'direct')
+
+
+def spool_dir():
+    path = Path(getattr(settings, 'ADMISSIONS_SPOOL_DIR', Path(settings.BASE_DIR) / 'var' / 'admissions'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def valid_class_ids():
+    """
+    IDs of the classes applicants may pick, cached for five minutes. The
+    receivers in staff.models drop the cache when a class is added or removed.
+    """
+    return cache.get_or_set(CLASS_IDS_KEY, lambda: set(Class.objects.values_list('id', flat=True)), 300)
+
+
+def classes_changed():
+    transaction.on_commit(lambda: cache.delete(CLASS_IDS_KEY))
+
+
+def class_is_open(class_id):
+    """
+    Whether applicants may pick `class_id`. Spool mode checks the cached
+    IDs so a surge never queries Class; direct mode writes to the database
+    anyway, so it checks the table itself and a just-deleted class can't
+    reach the insert.
+    """
+    if intake_mode() == 'spool':
+        return class_id in valid_class_ids()
+    return Class.objects.filter(pk=class_id).exists()
+
+
+def next_intake_registration_number():
+    year = timezone.localdate().year
+    return format_registration_number(year, _pool.next(year))
+
+
+def spool_application(record):
+    """Durably append one validated application (a dict) to the journal."""
+    line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+    path = spool_dir() / JOURNAL_NAME
+    while True:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            if current is None or current.st_ino != os.fstat(fd).st_ino:
+                continue  # the flusher moved this journal aside; use the new one
+            os.write(fd, line)
+            os.fsync(fd)
+            return
+        finally:
+            os.close(fd)  # also releases the lock
+
+
+def _rotate():
+    """Move the live journal aside for flushing; returns the moved path or None."""
+    directory = spool_dir()
+    path = directory / JOURNAL_NAME
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if os.fstat(fd).st_size == 0:
+            return None
+        target = directory / f"flushing-{time.time_ns()}.jsonl"
+        os.replace(path, target)
+        return target
+    finally:
+        os.close(fd)
+
+
+def _read(path):
+    records = []
+    with open(path, 'rb') as journal:
+        for line in journal:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass  # a torn last line from a crash mid-write
+    return records
+
+
+def _count_lines(path):
+    try:
+        with open(path, 'rb') as journal:
+            return sum(1 for _ in journal)
+    except FileNotFoundError:
+        return 0
+
+
+def spool_status():
+    """Applications waiting in the spool, and how long the oldest has waited."""
+    directory = spool_dir()
+    files = [directory / JOURNAL_NAME, *sorted(directory.glob('flushing-*.jsonl'))]
+    depth = sum(_count_lines(f) for f in files)
+    oldest = None
+    for f in files:
+        try:
+            with open(f, 'rb') as journal:
+                first = journal.readline()
+            oldest = json.loads(first)['spooled_at']
+            break
+        except (FileNotFoundError, ValueError, KeyError):
+            continue
+    return {
+        'depth': depth,
+        'oldest_seconds': round(time.time() - oldest, 1) if depth and oldest else None,
+        'last_flush': cache.get(LAST_FLUSH_KEY),
+    }
+
+
+def flush_spool(batch_size=500):
+    """
+    Write everything spooled so far to StudentApplication. Journals left
+    behind by an interrupted flush are written first. Returns stats, or
+    None if another flusher holds the lock.
+    """
+    started = time.perf_counter()
+    directory = spool_dir()
+    lock_fd = os.open(directory / 'flush.lock', os.O_WRONLY | os.O_CREAT, 0o640)
+    try:
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None  # another flusher is running
+        return _flush(directory, batch_size, started)
+    finally:
+        os.close(lock_fd)
+
+
+def _flush(directory, batch_size, started):
+    _rotate()
+    pending = sorted(directory.glob('flushing-*.jsonl'))
+
+    class_ids = set(Class.objects.values_list('id', flat=True))
+    written = queued = batches = 0
+    oldest_wait = 0.0
+    for journal in pending:
+        records = _read(journal)
+        queued += len(records)
+        now = time.time()
+        for start in range(0, len(records), batch_size):
+            chunk = records[start:start + batch_size]
+            applications = [
+                StudentApplication(
+                    student_name=r['student_name'],
+                    email=r['email'],
+                    registration_number=r['registration_number'],
+                    # a class deleted since the applicant picked it
+                    applied_class_id=r['applied_class_id'] if r['applied_class_id'] in class_ids else None,
+                    previous_grade_level=r['previous_grade_level'],
+                    previous_grade_results=r['previous_grade_results'],
+                    status='pending',
+                )
+                for r in chunk
+            ]
+            with transaction.atomic():
+                existing = set(StudentApplication.objects.filter(
+                    registration_number__in=[a.registration_number for a in applications]
+                ).values_list('registration_number', flat=True))
+                StudentApplication.objects.bulk_create(applications, ignore_conflicts=True)
+                new = [a for a in applications if a.registration_number not in existing]
+                # bulk_create sends no post_save, so refresh what the receivers would have
+                counts_changed()
+                apply_deltas(created_deltas((a.submitted_at, a.applied_class_id, 'pending') for a in new))
+            written += len(new)
+            batches += 1
+            oldest_wait = max(oldest_wait, max(now - r.get('spooled_at', now) for r in chunk))
+        journal.unlink()
+
+    stats = {
+        'queued': queued,
+        'written': written,
+        'duplicates': queued - written,
+        'batches': batches,
+        'seconds': round(time.perf_counter() - started, 3),
+        'max_wait_seconds': round(oldest_wait, 1),
+        'finished_at': timezone.now().isoformat(),
+    }
+    if queued:
+        cache.set(LAST_FLUSH_KEY, stats, None)
+    return stats
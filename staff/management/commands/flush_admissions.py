@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from staff.intake import flush_spool, spool_status
+
+
+class Command(BaseCommand):
+    help = (
+        "Write spooled applications (ADMISSIONS_INTAKE_MODE = 'spool') to the database "
+        "in batches. Use --loop to keep flushing every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep running until interrupted.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between flushes with --loop.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Applications per transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.flush_once(options['batch_size'], quiet=options['loop'])
+                if not options['loop']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+
+    def flush_once(self, batch_size, quiet=False):
+        status = spool_status()
+        if quiet and not status['depth']:
+            return
+        waited = f", oldest waiting {status['oldest_seconds']}s" if status['oldest_seconds'] is not None else ''
+        self.stdout.write(f"Queue depth: {status['depth']}{waited}")
+
+        stats = flush_spool(batch_size)
+        if stats is None:
+            self.stdout.write(self.style.WARNING("Another flush is running; skipped."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {stats['written']} applications ({stats['duplicates']} duplicates skipped) "
+            f"in {stats['batches']} batch(es), {stats['seconds']}s; "
+            f"longest wait from submit to database {stats['max_wait_seconds']}s."
+        ))
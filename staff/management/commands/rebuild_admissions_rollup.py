@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from staff.reporting import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the admissions reporting rollup from StudentApplication "
+        "(needed after editing applications with raw SQL or queryset.update())."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_rollup()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} rollup rows."))
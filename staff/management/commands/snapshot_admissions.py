@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from staff.admissions import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Save today's admissions counters for the dashboard's intake trend. Run once a day, e.g. from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--day', help="Record under this day (YYYY-MM-DD), e.g. yesterday when run just after midnight.")
+
+    def handle(self, *args, **options):
+        day = None
+        if options['day']:
+            try:
+                day = date.fromisoformat(options['day'])
+            except ValueError:
+                raise CommandError("--day must look like 2025-01-31.")
+        snapshot = take_snapshot(day)
+        self.stdout.write(self.style.SUCCESS(
+            f"{snapshot.day}: {snapshot.received} received, {snapshot.pending} pending, "
+            f"{snapshot.approved} approved, {snapshot.rejected} rejected, {snapshot.students} students."
+        ))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_rollup(apps, schema_editor):
+    StudentApplication = apps.get_model('staff', 'StudentApplication')
+    AdmissionsRollup = apps.get_model('staff', 'AdmissionsRollup')
+    grouped = (
+        StudentApplication.objects.annotate(day=TruncDate('submitted_at'))
+        .values('day', 'applied_class_id')
+        .order_by()
+    )
+    rows = [
+        AdmissionsRollup(day=r['day'], applied_class_id=r['applied_class_id'], status=r['status'], count=r['n'])
+        for r in grouped.values('day', 'applied_class_id', 'status').annotate(n=Count('id'))
+    ]
+    rows += [
+        AdmissionsRollup(day=r['day'], applied_class_id=r['applied_class_id'], status='registered', count=r['n'])
+        for r in grouped.filter(is_registered=True).annotate(n=Count('id'))
+    ]
+    AdmissionsRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0014_admissionssnapshot'),
+        ('students', '0005_student_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdmissionsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('registered', 'Registered')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('applied_class', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='students.class')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'applied_class', 'status'), name='admissions_rollup_key')],
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0015_admissionsrollup'),
+        ('students', '0005_student_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentapplication',
+            index=models.Index(fields=['submitted_at', 'id'], name='application_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentapplication',
+            index=models.Index(fields=['status', 'submitted_at', 'id'], name='application_status_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentapplication',
+            index=models.Index(fields=['applied_class', 'submitted_at', 'id'], name='application_class_seek_idx'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
 # -------------------------
@@ -34,9 +34,81 @@ class StudentApplication(models.Model):
     previous_grade_results = models.TextField()
     is_registered = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # the review list, newest first, seeking past (submitted_at, id);
+            # one per filter so each page is a single index range
+            models.Index(fields=['submitted_at', 'id'], name='application_seek_idx'),
+            models.Index(fields=['status', 'submitted_at', 'id'], name='application_status_seek_idx'),
+            models.Index(fields=['applied_class', 'submitted_at', 'id'], name='application_class_seek_idx'),
+        ]
+
     def __str__(self):
         return f"{self.student_name} ({self.registration_number})"
 
+# -------------------------
+# RegistrationSequence model
+# -------------------------
+class RegistrationSequence(models.Model):
+    """
+    The last registration number handed out for an intake year. Numbers are
+    allocated through staff.registration, never by editing this row.
+    """
+    year = models.PositiveIntegerField(unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}: {self.last_value}"
+
+# -------------------------
+# AdmissionsSnapshot model
+# -------------------------
+class AdmissionsSnapshot(models.Model):
+    """
+    Admissions counters as they stood at the end of a day, written by
+    `manage.py snapshot_admissions`, so trends never need a table scan.
+    """
+    day = models.DateField(unique=True)
+    received = models.PositiveIntegerField(default=0)  # applications submitted that day
+    total = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    students = models.PositiveIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day}: {self.pending} pending of {self.total}"
+
+# -------------------------
+# AdmissionsRollup model
+# -------------------------
+class AdmissionsRollup(models.Model):
+    """
+    How many applications submitted on `day` for `applied_class` are now in
+    `status`. 'registered' counts approved applicants who went on to
+    register, so they're in 'approved' as well. Maintained by
+    staff.reporting; reports Sum() over it instead of scanning
+    StudentApplication.
+    """
+    STATUS_CHOICES = StudentApplication.STATUS_CHOICES + [('registered', 'Registered')]
+
+    day = models.DateField()
+    applied_class = models.ForeignKey('students.Class', on_delete=models.SET_NULL, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'applied_class', 'status'], name='admissions_rollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.applied_class_id} {self.status}: {self.count}"
+
 # -------------------------
 # Signals for StaffProfile
 # -------------------------
@@ -97,4 +169,69 @@ class LeadershipProfile(models.Model):
     order = models.IntegerField(default=0)        # 1 for Principal, 2 for Deputy...
 
     def __str__(self):
-        return f"{self.name} - {self.position}"
\ No newline at end of file
+        return f"{self.name} - {self.position}"
+
+# -------------------------
+# Signals for uploaded images
+# -------------------------
+@receiver(post_save, sender=GalleryItem)
+@receiver(post_save, sender=StudentLifeItem)
+@receiver(post_save, sender=LeadershipProfile)
+def prepare_image_renditions(sender, instance, **kwargs):
+    from coreapp.images import prepare_renditions
+
+    fields = [f.name for f in sender._meta.fields if isinstance(f, models.ImageField)]
+    prepare_renditions(instance, *fields)
+
+
+# -------------------------
+# Signals for the dashboard counters
+# -------------------------
+@receiver(post_save, sender=StudentApplication)
+@receiver(post_delete, sender=StudentApplication)
+@receiver(post_delete, sender='students.Student')
+def admissions_changed(sender, **kwargs):
+    from .admissions import counts_changed
+
+    counts_changed()
+
+
+@receiver(post_save, sender='students.Student')
+def student_added(sender, created, **kwargs):
+    from .admissions import counts_changed
+
+    if created:
+        counts_changed()
+
+
+@receiver(post_save, sender='students.Class')
+@receiver(post_delete, sender='students.Class')
+def class_list_changed(sender, **kwargs):
+    from .intake import classes_changed
+
+    classes_changed()
+
+
+# -------------------------
+# Signals for the admissions rollup
+# -------------------------
+@receiver(pre_save, sender=StudentApplication)
+@receiver(pre_delete, sender=StudentApplication)
+def load_rollup_state(sender, instance, **kwargs):
+    from .reporting import load_state
+
+    load_state(instance)
+
+
+@receiver(post_save, sender=StudentApplication)
+def application_saved_rollup(sender, instance, **kwargs):
+    from .reporting import record_saved
+
+    record_saved(instance)
+
+
+@receiver(post_delete, sender=StudentApplication)
+def application_deleted_rollup(sender, instance, **kwargs):
+    from .reporting import record_deleted
+
+    record_deleted(instance)
@@ -0,0 +1,94 @@
+# staff/registration.py
+"""
+Registration number allocation.
+
+Numbers look like VSS2025-0042: a prefix, the intake year and a counter that
+restarts every year. The counter lives in RegistrationSequence, one row per
+year, and is advanced with a single UPDATE ... SET last_value = last_value
++ n, so concurrent applicants can never be handed the same number.
+
+reserve_block() takes a whole range in one statement. RegistrationPool
+keeps a range per year in memory so a busy worker only touches the
+sequence once per block; numbers left in a block when the process exits
+are simply never used (gaps are fine, duplicates are not).
+"""
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RegistrationSequence, StudentApplication
+
+PREFIX = 'VSS'
+
+
+def format_registration_number(year, number):
+    return f"{PREFIX}{year}-{number:04d}"
+
+
+def _highest_issued(year):
+    """Highest counter already used for `year`, for numbers issued before the sequence existed."""
+    prefix = f"{PREFIX}{year}-"
+    highest = 0
+    for reg_no in StudentApplication.objects.filter(
+        registration_number__startswith=prefix
+    ).values_list('registration_number', flat=True):
+        suffix = reg_no[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def reserve_block(year, size=1):
+    """Reserve `size` consecutive counters for `year` and return them as a range."""
+    with transaction.atomic():
+        updated = RegistrationSequence.objects.filter(year=year).update(last_value=F('last_value') + size)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    RegistrationSequence.objects.create(year=year, last_value=_highest_issued(year) + size)
+            except IntegrityError:
+                # another worker created the row first
+                RegistrationSequence.objects.filter(year=year).update(last_value=F('last_value') + size)
+        # our UPDATE holds the row until commit, so this is still our value
+        last = RegistrationSequence.objects.filter(year=year).values_list('last_value', flat=True).get()
+    return range(last - size + 1, last + 1)
+
+
+class RegistrationPool:
+    """Hands out counters from blocks reserved ahead of time, per year."""
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next(self, year):
+        if connection.in_atomic_block:
+            # a block reserved here would be rolled back with the caller's
+            # transaction while this pool kept handing its numbers out
+            return reserve_block(year, 1)[0]
+        with self._lock:
+            block = self._blocks.get(year)
+            if not block:
+                block = self._blocks[year] = iter(reserve_block(year, self.block_size))
+            number = next(block, None)
+            if number is None:
+                block = self._blocks[year] = iter(reserve_block(year, self.block_size))
+                number = next(block)
+            return number
+
+
+_pool = RegistrationPool(getattr(settings, 'REGISTRATION_BLOCK_SIZE', 1))
+
+
+def next_registration_number(year=None):
+    """A new, never-used registration number for the intake year (default: this year)."""
+    year = year or timezone.localdate().year
+    if _pool.block_size > 1:
+        number = _pool.next(year)
+    else:
+        number = reserve_block(year, 1)[0]
+    return format_registration_number(year, number)
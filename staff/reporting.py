@@ -0,0 +1,218 @@
+# staff/reporting.py
+"""
+Admissions reports from a rollup table.
+
+AdmissionsRollup holds how many applications there are per (submission
+day, applied class, status), plus a 'registered' count for applicants
+who went on to register. Reports Sum() over it, so they cost the same
+however many applications there are.
+
+The rollup is kept current as applications change:
+  * saves and deletes, through the receivers in staff.models. The row is
+    read just before the change, so a save moves its count from the old
+    bucket to the new one;
+  * queryset.update() and bulk_create() send no signals, so their callers
+    (staff.admissions, staff.intake) hand the change to apply_deltas().
+
+`manage.py rebuild_admissions_rollup` recomputes it from scratch.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate, TruncWeek
+from django.utils import timezone
+
+from .models import AdmissionsRollup, StudentApplication
+
+STATE_FIELDS = ('status', 'is_registered', 'applied_class_id', 'submitted_at')
+STATUSES = ('pending', 'approved', 'rejected')
+
+
+def submission_day(submitted_at):
+    return timezone.localdate(submitted_at) if submitted_at else timezone.localdate()
+
+
+def _keys(status, is_registered, class_id, submitted_at):
+    day = submission_day(submitted_at)
+    keys = [(day, class_id, status)]
+    if is_registered:
+        keys.append((day, class_id, 'registered'))
+    return keys
+
+
+def apply_deltas(deltas):
+    """
+    Add a Counter of {(day, class_id, status): n} to the rollup in at most
+    three queries, however many keys there are.
+    """
+    deltas = {key: n for key, n in deltas.items() if n}
+    if not deltas:
+        return
+    existing = {}
+    rows = AdmissionsRollup.objects.filter(day__in={day for day, _, _ in deltas}).values_list(
+        'pk', 'day', 'applied_class_id', 'status',
+    )
+    for pk, *key in rows:
+        existing.setdefault(tuple(key), pk)
+
+    updates = {existing[key]: n for key, n in deltas.items() if key in existing}
+    if updates:
+        # count = count + n, so concurrent changes to the same row add up
+        AdmissionsRollup.objects.filter(pk__in=updates).update(count=F('count') + Case(
+            *(When(pk=pk, then=Value(n)) for pk, n in updates.items()), default=Value(0),
+        ))
+
+    missing = [
+        AdmissionsRollup(day=day, applied_class_id=class_id, status=status, count=n)
+        for (day, class_id, status), n in deltas.items() if (day, class_id, status) not in existing
+    ]
+    if missing:
+        try:
+            with transaction.atomic():
+                AdmissionsRollup.objects.bulk_create(missing)
+        except IntegrityError:
+            # another request created some of these rows first; add to them one by one
+            for row in missing:
+                _add_to_row(row.day, row.applied_class_id, row.status, row.count)
+
+
+def _add_to_row(day, class_id, status, n):
+    """Add n to one rollup row, creating it if it doesn't exist yet."""
+    while True:
+        updated = AdmissionsRollup.objects.filter(
+            day=day, applied_class_id=class_id, status=status,
+        ).update(count=F('count') + n)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                AdmissionsRollup.objects.create(day=day, applied_class_id=class_id, status=status, count=n)
+            return
+        except IntegrityError:
+            # created by someone else between the update and the insert; add to theirs
+            continue
+
+
+def created_deltas(rows):
+    """Deltas for new applications, given as (submitted_at, class_id, status) rows."""
+    deltas = Counter()
+    for submitted_at, class_id, status in rows:
+        deltas[(submission_day(submitted_at), class_id, status)] += 1
+    return deltas
+
+
+def status_deltas(rows, old_status, new_status):
+    """Deltas for applications, given as (submitted_at, class_id) rows, moving between statuses."""
+    deltas = Counter()
+    for submitted_at, class_id in rows:
+        day = submission_day(submitted_at)
+        deltas[(day, class_id, old_status)] -= 1
+        deltas[(day, class_id, new_status)] += 1
+    return deltas
+
+
+# --------------------------
+# Signal handlers (see staff.models)
+# --------------------------
+def _state(instance):
+    return tuple(getattr(instance, f) for f in STATE_FIELDS)
+
+
+def load_state(instance):
+    """
+    Before a save or delete, read the row as it stands in the database. The
+    instance's own values may be stale, e.g. after a bulk status change.
+    """
+    row = None
+    if instance.pk is not None:
+        row = StudentApplication.objects.filter(pk=instance.pk).values_list(*STATE_FIELDS).first()
+    instance._rollup_state = row
+
+
+def record_saved(instance):
+    old = getattr(instance, '_rollup_state', None)
+    new = _state(instance)
+    if old == new:
+        return
+    deltas = Counter()
+    if old is not None:
+        for key in _keys(*old):
+            deltas[key] -= 1
+    for key in _keys(*new):
+        deltas[key] += 1
+    apply_deltas(deltas)
+
+
+def record_deleted(instance):
+    state = getattr(instance, '_rollup_state', None)
+    if state is not None:
+        apply_deltas(Counter({key: -1 for key in _keys(*state)}))
+
+
+# --------------------------
+# Rebuild
+# --------------------------
+def rebuild_rollup():
+    """Recompute the whole rollup from StudentApplication. Returns the number of rows written."""
+    grouped = (
+        StudentApplication.objects.annotate(day=TruncDate('submitted_at'))
+        .values('day', 'applied_class_id')
+        .order_by()
+    )
+    rows = [
+        AdmissionsRollup(day=r['day'], applied_class_id=r['applied_class_id'], status=r['status'], count=r['n'])
+        for r in grouped.values('day', 'applied_class_id', 'status').annotate(n=Count('id'))
+    ]
+    rows += [
+        AdmissionsRollup(day=r['day'], applied_class_id=r['applied_class_id'], status='registered', count=r['n'])
+        for r in grouped.filter(is_registered=True).annotate(n=Count('id'))
+    ]
+    with transaction.atomic():
+        AdmissionsRollup.objects.all().delete()
+        AdmissionsRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# --------------------------
+# Reports
+# --------------------------
+def _sums():
+    sums = {s: Coalesce(Sum('count', filter=Q(status=s)), 0) for s in STATUSES + ('registered',)}
+    sums['total'] = Coalesce(Sum('count', filter=~Q(status='registered')), 0)
+    return sums
+
+
+def _rate(part, whole):
+    return round(100 * part / whole, 1) if whole else 0
+
+
+def class_counts(class_id):
+    """total / pending / approved / rejected / registered for one applied class, from the rollup."""
+    return AdmissionsRollup.objects.filter(applied_class_id=class_id).aggregate(**_sums())
+
+
+def admissions_report_data(weeks=12):
+    """Summary, per-class and per-week breakdowns, and the applied → approved → registered funnel."""
+    rollup = AdmissionsRollup.objects.order_by()
+    summary = rollup.aggregate(**_sums())
+
+    by_class = list(
+        rollup.values('applied_class__name').annotate(**_sums()).order_by('applied_class__name')
+    )
+    for row in by_class:
+        row['approval_rate'] = _rate(row['approved'], row['total'])
+
+    since = timezone.localdate() - timedelta(weeks=weeks)
+    by_week = list(
+        rollup.filter(day__gte=since).annotate(week=TruncWeek('day'))
+        .values('week').annotate(**_sums()).order_by('week')
+    )
+
+    funnel = [
+        {'stage': 'Applied', 'count': summary['total'], 'percent': 100 if summary['total'] else 0},
+        {'stage': 'Approved', 'count': summary['approved'], 'percent': _rate(summary['approved'], summary['total'])},
+        {'stage': 'Registered', 'count': summary['registered'], 'percent': _rate(summary['registered'], summary['total'])},
+    ]
+    return {'summary': summary, 'by_class': by_class, 'by_week': by_week, 'funnel': funnel, 'weeks': weeks}
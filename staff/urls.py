@@ -9,6 +9,11 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('applications/', views.applications_review, name='applications'),
     path('reports/', views.admissions_report, name='reports'),
+    path('marks/export/', views.export_marks, name='export_marks'),
+    path('analytics/subjects/', views.subject_stats, name='subject_stats'),
+    path('analytics/trends/', views.class_trends, name='class_trends'),
+    path('report-cards/', views.report_cards, name='report_cards'),
+    path('report-cards/<str:filename>/', views.download_report_cards, name='download_report_cards'),
     path('gallery/upload/', views.upload_media, name='upload_media'),
     path('gallery/delete/<int:pk>/', views.delete_gallery_item, name='delete_gallery_item'),
     path('student-life/manage/', views.manage_student_life, name='manage_student_life'),
@@ -1,16 +1,29 @@
+import csv
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Count, Q
-from students.models import Student
+from students.models import Student, Class
 from .models import StudentApplication, GalleryItem, StudentLifeItem, LeadershipProfile
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
-from django.conf import settings
-from django.shortcuts import get_object_or_404
-from students.utils import send_registration_email
 from .forms import GalleryUploadForm, StudentLifeForm, LeadershipForm
+from results.models import Mark
+from coreapp.identity import is_staff_user
+from coreapp.querybudget import query_budget
+from results.analytics import HISTOGRAM_BINS, subject_statistics
+from results.terms import get_active_term, get_term, get_terms
+from results.trends import score_pivot
+from results.reportcards import job_status, report_card_dir, request_report_cards
+from .admissions import (
+    DECISIONS, admission_counts, applications_page, decide_applications, decode_cursor, intake_trend,
+    undelivered_registrations,
+)
+from .intake import intake_mode, spool_status
+from .reporting import admissions_report_data, class_counts
 # --------------------------
 # STAFF LOGIN
 # --------------------------
@@ -27,32 +40,23 @@ def staff_login(request):
     return render(request, 'staff/login.html')
 
 
-# --------------------------
-# STAFF CHECK
-# --------------------------
-def is_staff_user(user):
-    """Allow only users in 'Staff' group or superusers."""
-    return user.groups.filter(name='Staff').exists() or user.is_superuser
-
-
 # --------------------------
 # DASHBOARD
 # --------------------------
 @login_required
 @user_passes_test(is_staff_user)
+@query_budget(6)
 def dashboard(request):
-    total_students = Student.objects.count()
-    total_applications = StudentApplication.objects.count()
-    pending_apps = StudentApplication.objects.filter(status='pending').count()
-    approved_apps = StudentApplication.objects.filter(status='approved').count()
-    rejected_apps = StudentApplication.objects.filter(status='rejected').count()
-
+    counts = admission_counts()
+    trend = intake_trend()
     context = {
-        'total_students': total_students,
-        'total_applications': total_applications,
-        'pending_apps': pending_apps,
-        'approved_apps': approved_apps,
-        'rejected_apps': rejected_apps,
+        'total_students': counts['students'],
+        'total_applications': counts['total'],
+        'pending_apps': counts['pending'],
+        'approved_apps': counts['approved'],
+        'rejected_apps': counts['rejected'],
+        'intake_trend': trend,
+        'intake_peak': max((s.received for s in trend), default=0),
     }
     return render(request, 'staff/dashboard.html', context)
 
@@ -62,66 +66,236 @@ def dashboard(request):
 # --------------------------
 @login_required
 @user_passes_test(is_staff_user)
+@query_budget(10)
 def applications_review(request):
-    applications = StudentApplication.objects.all().order_by('-submitted_at')
-
     if request.method == 'POST':
-        app_id = request.POST.get('application_id')
         action = request.POST.get('action')
-        application = get_object_or_404(StudentApplication, id=app_id)
-
-        if action == 'approve':
-            application.status = 'approved'
-            application.save()
-
-            try:
-                # ✅ Use your utility to send the correct registration email
-                send_registration_email(application.email, application.registration_number)
-                messages.success(
-                    request,
-                    f"{application.student_name}'s application was approved and an email was sent."
-                )
-            except Exception as e:
-                messages.warning(
-                    request,
-                    f"Application approved but email could not be sent: {e}"
-                )
-
-        elif action == 'reject':
-            application.status = 'rejected'
-            application.save()
-            messages.info(
-                request,
-                f"{application.student_name}'s application was rejected."
-            )
-
-        return redirect('staff:applications')
-
-    return render(request, 'staff/applications.html', {'applications': applications})
+        # the bulk form sends application_ids; a row's own buttons send application_id
+        ids = request.POST.getlist('application_ids') or request.POST.getlist('application_id')
+        ids = [i for i in ids if i.isdigit()]
+        if action not in DECISIONS or not ids:
+            messages.error(request, "Select at least one application, then approve or reject.")
+        else:
+            summary = decide_applications(ids, action)
+            _report_decisions(request, action, summary)
+        # back to the same page and filters
+        return redirect(request.get_full_path())
+
+    status = request.GET.get('status', '')
+    if status not in dict(StudentApplication.STATUS_CHOICES):
+        status = ''
+    class_id = request.GET.get('class', '')
+    class_id = int(class_id) if class_id.isdigit() else None
+    filters = {k: v for k, v in (('status', status), ('class', class_id)) if v}
+
+    after = None
+    if request.GET.get('after'):
+        after = decode_cursor(request.GET['after'])
+        if after is None:
+            messages.error(request, "That page link is no longer valid; showing the newest applications.")
+            return redirect(f"{request.path}?{urlencode(filters)}")
+
+    applications, next_cursor = applications_page(status, class_id, after)
+    # badges from the cached counters (or the rollup for one class), never a COUNT(*) per page
+    counts = class_counts(class_id) if class_id else admission_counts()
+
+    return render(request, 'staff/applications.html', {
+        'applications': applications,
+        'status_tabs': [('', 'All', counts['total'])] + [
+            (value, label, counts[value]) for value, label in StudentApplication.STATUS_CHOICES
+        ],
+        'classes': Class.objects.order_by('name'),
+        'status': status,
+        'class_id': class_id,
+        'filters': urlencode(filters),
+        'next_page': urlencode({**filters, 'after': next_cursor}) if next_cursor else None,
+        'first_page': bool(after),
+        # emails the outbox gave up on since the last decisions
+        'undelivered': undelivered_registrations(),
+        # spooled applications aren't in the table until flush_admissions runs
+        'spool': spool_status() if intake_mode() == 'spool' else None,
+    })
+
+
+def _report_decisions(request, action, summary):
+    decided = summary['decided']
+    if action == 'approve':
+        messages.success(
+            request,
+            f"Approved {decided} application{'s' if decided != 1 else ''}; "
+            f"{summary['queued']} registration email{'s' if summary['queued'] != 1 else ''} queued."
+        )
+    else:
+        messages.info(request, f"Rejected {decided} application{'s' if decided != 1 else ''}.")
+    if summary['skipped']:
+        messages.info(
+            request,
+            f"{summary['skipped']} selected application(s) were already {DECISIONS[action]} and were left as they were."
+        )
+    if summary['missing']:
+        messages.warning(request, f"{summary['missing']} selected application(s) no longer exist.")
 
 # --------------------------
 # ADMISSIONS REPORT
 # --------------------------
 @login_required
 @user_passes_test(is_staff_user)
+@query_budget(8)
 def admissions_report(request):
-    summary = StudentApplication.objects.aggregate(
-        total=Count('id'),
-        approved=Count('id', filter=Q(status='approved')),
-        rejected=Count('id', filter=Q(status='rejected')),
-        pending=Count('id', filter=Q(status='pending')),
-    )
-
-    by_class = StudentApplication.objects.values('class_applied').annotate(
-        total=Count('id')
-    ).order_by('class_applied')
-
-    return render(request, 'staff/reports.html', {
-        'summary': summary,
-        'by_class': by_class
+    # reads the rollup table, never StudentApplication itself
+    return render(request, 'staff/reports.html', admissions_report_data())
+
+
+# --------------------------
+# MARKS EXPORT
+# --------------------------
+MARKS_EXPORT_COLUMNS = [
+    ('Registration Number', 'student__registration_number'),
+    ('First Name', 'student__first_name'),
+    ('Last Name', 'student__last_name'),
+    ('Class', 'student__class_assigned__name'),
+    ('Term', 'term__name'),
+    ('Subject', 'subject__name'),
+    ('Score', 'score'),
+    ('Teacher', 'teacher__full_name'),
+    ('Comment', 'comment'),
+    ('Date Recorded', 'date_recorded'),
+]
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+    def write(self, value):
+        return value
+
+
+@login_required
+@user_passes_test(is_staff_user)
+def export_marks(request):
+    """
+    Stream marks as CSV, optionally filtered by ?class=, ?term= and ?subject=.
+    Rows are read in chunks as flat tuples, so memory stays flat however
+    many marks are exported.
+    """
+    marks = Mark.objects.all()
+    filename = ['marks']
+    for param, lookup in (('class', 'student__class_assigned_id'), ('term', 'term_id'), ('subject', 'subject_id')):
+        value = request.GET.get(param)
+        if value and value.isdigit():
+            marks = marks.filter(**{lookup: value})
+            filename.append(f"{param}{value}")
+
+    rows = marks.order_by(
+        'term_id', 'student__class_assigned__name', 'student__registration_number', 'subject__name'
+    ).values_list(*[field for _, field in MARKS_EXPORT_COLUMNS])
+
+    writer = csv.writer(Echo())
+
+    def stream():
+        yield writer.writerow([header for header, _ in MARKS_EXPORT_COLUMNS])
+        for row in rows.iterator(chunk_size=2000):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{"_".join(filename)}.csv"'
+    return response
+
+
+# --------------------------
+# SUBJECT STATISTICS
+# --------------------------
+@login_required
+@user_passes_test(is_staff_user)
+def subject_stats(request):
+    """Score statistics per subject for a class and term (?format=json for the raw numbers)."""
+    classes = Class.objects.all().order_by('name')
+    class_id = request.GET.get('class')
+    selected_class = classes.filter(id=class_id).first() if class_id and class_id.isdigit() else None
+    term = get_term(request.GET.get('term')) if request.GET.get('term') else get_active_term()
+
+    stats = subject_statistics(selected_class.id, term.id) if selected_class and term else []
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'class': selected_class.id if selected_class else None,
+            'term': term.id if term else None,
+            'subjects': stats,
+        })
+
+    for row in stats:
+        peak = max(row['histogram']) or 1
+        row['bars'] = [
+            {'label': f"{i * 100 // HISTOGRAM_BINS}+", 'count': count, 'height': round(100 * count / peak)}
+            for i, count in enumerate(row['histogram'])
+        ]
+
+    return render(request, 'staff/subject_stats.html', {
+        'classes': classes,
+        'terms': get_terms(),
+        'selected_class': selected_class,
+        'term': term,
+        'stats': stats,
+    })
+
+
+@login_required
+@user_passes_test(is_staff_user)
+def class_trends(request):
+    """Term-over-term class averages per subject."""
+    classes = Class.objects.all().order_by('name')
+    class_id = request.GET.get('class')
+    selected_class = classes.filter(id=class_id).first() if class_id and class_id.isdigit() else None
+    pivot = score_pivot(Mark.objects.filter(student__class_assigned=selected_class)) if selected_class else None
+
+    return render(request, 'staff/class_trends.html', {
+        'classes': classes,
+        'selected_class': selected_class,
+        'pivot': pivot,
     })
 
 
+# --------------------------
+# REPORT CARDS
+# --------------------------
+@login_required
+@user_passes_test(is_staff_user)
+def report_cards(request):
+    """Queue report card generation for a class and term, and list finished bundles."""
+    if request.method == 'POST':
+        class_obj = get_object_or_404(Class, id=request.POST.get('class_id'))
+        term = get_term(request.POST.get('term_id'))
+        if term is None:
+            raise Http404("No such term.")
+        if request_report_cards(class_obj.id, term.id):
+            messages.success(request, f"Report cards for {class_obj}, {term.name} are queued. Refresh this page in a minute.")
+        else:
+            messages.info(request, f"Report cards for {class_obj}, {term.name} are already queued or being generated.")
+        return redirect('staff:report_cards')
+
+    running, results = job_status()
+    bundles = []
+    for path in sorted(report_card_dir().glob('*.zip'), key=lambda p: p.stat().st_mtime, reverse=True):
+        stat = path.stat()
+        bundles.append({'name': path.name, 'size_kb': stat.st_size // 1024})
+
+    return render(request, 'staff/report_cards.html', {
+        'classes': Class.objects.all().order_by('name'),
+        'terms': get_terms(),
+        'running': running,
+        'results': results,
+        'bundles': bundles,
+    })
+
+
+@login_required
+@user_passes_test(is_staff_user)
+def download_report_cards(request, filename):
+    path = report_card_dir() / Path(filename).name
+    if path.suffix != '.zip' or not path.is_file():
+        raise Http404("No such report card bundle.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+
 # --------------------------
 # STAFF LOGOUT
 # --------------------------
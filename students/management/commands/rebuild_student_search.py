@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from students.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Refill the student search index from students.Student (needed after bulk imports)."
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING(
+                "No full-text index on this database; search uses a plain filter instead."
+            ))
+            return
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} students."))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:52
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_student_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Upper('registration_number'), name='student_reg_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['class_assigned', 'last_name', 'first_name'], name='student_class_name_idx'),
+        ),
+    ]
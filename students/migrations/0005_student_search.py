@@ -0,0 +1,40 @@
+from django.db import migrations
+
+FTS_TABLE = 'students_student_fts'
+
+
+def create_search_table(apps, schema_editor):
+    """SQLite only; other databases fall back to a plain filter."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        if not any('FTS5' in row[0] for row in cursor.fetchall()):
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "registration_number, reg_parts, first_name, last_name, "
+            "tokenize = \"unicode61 tokenchars '-'\")"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, registration_number, reg_parts, first_name, last_name) "
+            "SELECT id, registration_number, REPLACE(registration_number, '-', ' '), first_name, last_name "
+            "FROM students_student"
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0004_student_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
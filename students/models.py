@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.db.models.functions import Upper
 from django.contrib.auth.hashers import make_password, check_password
 
 class Class(models.Model):
@@ -34,6 +37,18 @@ class Class(models.Model):
 
 
 
+class StudentQuerySet(models.QuerySet):
+    def by_registration_number(self, reg_no):
+        """
+        Case-insensitive registration number match. Compares UPPER() on both
+        sides so it can use the student_reg_upper_idx expression index; an
+        __iexact lookup compiles to LIKE on SQLite and can't.
+        """
+        return self.alias(reg_upper=Upper('registration_number')).filter(
+            reg_upper=(reg_no or '').strip().upper()
+        )
+
+
 class Student(models.Model):
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
@@ -53,6 +68,15 @@ class Student(models.Model):
     ]
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
 
+    objects = StudentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(Upper('registration_number'), name='student_reg_upper_idx'),
+            # class lists, sorted by name
+            models.Index(fields=['class_assigned', 'last_name', 'first_name'], name='student_class_name_idx'),
+        ]
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -71,4 +95,33 @@ class Student(models.Model):
         return 'email'
 
 
-# Create your models here.
+# --------------------------
+# SEARCH INDEX
+# --------------------------
+@receiver(post_save, sender=Student)
+def student_saved_reindex(sender, instance, update_fields=None, **kwargs):
+    from .search import INDEXED_FIELDS, index_students
+
+    # logins and status changes don't touch the searchable fields
+    if update_fields is not None and not set(update_fields) & set(INDEXED_FIELDS):
+        return
+    index_students([instance])
+
+
+@receiver(post_delete, sender=Student)
+def student_deleted_unindex(sender, instance, **kwargs):
+    from .search import unindex_students
+
+    unindex_students([instance.pk])
+
+
+# --------------------------
+# PHOTO RENDITIONS
+# --------------------------
+@receiver(post_save, sender=Student)
+def student_saved_prepare_photo(sender, instance, update_fields=None, **kwargs):
+    from coreapp.images import prepare_renditions
+
+    if update_fields is not None and 'photo' not in update_fields:
+        return
+    prepare_renditions(instance, 'photo')
@@ -0,0 +1,150 @@
+# students/search.py
+"""
+Student search by registration number, first name and last name.
+
+On SQLite the searchable fields are mirrored into an FTS5 table
+(students_student_fts, rowid = student id) and every query is a prefix match
+against it, ranked by bm25. Student saves and deletes keep the table in step
+(see the receivers in students.models); rows written with bulk_create or
+queryset.update() need index_students() or the rebuild_student_search
+command. On other databases, or when SQLite was built without FTS5, a plain
+prefix/substring filter is used instead.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import Student
+
+FTS_TABLE = 'students_student_fts'
+INDEXED_FIELDS = ('registration_number', 'first_name', 'last_name')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+
+# reg_parts holds the registration number split at '-', so "0012" finds
+# VSS2025-0012 as well as "VSS2025-00" does
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "registration_number, reg_parts, first_name, last_name, "
+    "tokenize = \"unicode61 tokenchars '-'\")"
+)
+
+_available = {}
+
+
+def fts_available():
+    """Whether the FTS table exists on the current database connection."""
+    if connection.vendor != 'sqlite':
+        return False
+    alias = connection.alias
+    if alias not in _available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+            )
+            _available[alias] = cursor.fetchone() is not None
+    return _available[alias]
+
+
+def _document(reg_no, first_name, last_name):
+    reg_no = reg_no or ''
+    return [reg_no, reg_no.replace('-', ' '), first_name or '', last_name or '']
+
+
+def index_students(students):
+    """(Re)index Student objects or (id, reg_no, first, last) tuples."""
+    if not fts_available():
+        return
+    rows = []
+    for s in students:
+        if isinstance(s, Student):
+            s = (s.pk, s.registration_number, s.first_name, s.last_name)
+        rows.append([s[0], *_document(*s[1:])])
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[row[0]] for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, registration_number, reg_parts, first_name, last_name) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def unindex_students(student_ids):
+    if not fts_available() or not student_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [[pk] for pk in student_ids])
+
+
+def rebuild_index(batch_size=2000):
+    """Refill the FTS table from scratch. Returns the number of students indexed."""
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    total = 0
+    rows = Student.objects.order_by('pk').values_list('pk', *INDEXED_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            index_students(batch)
+            total += len(batch)
+            batch = []
+    index_students(batch)
+    return total + len(batch)
+
+
+def _tokens(query):
+    # keep letters, digits and dashes; everything else separates words
+    return [t for t in re.split(r"[^\w-]+", query or '') if t.strip('-')]
+
+
+def _fts_ids(tokens, limit, queryset=None):
+    """
+    Best-ranked matching ids. With a queryset, the FTS rows are joined to
+    its ids so the narrowing happens before the LIMIT.
+    """
+    match = ' '.join('"%s"*' % t for t in tokens)
+    join, params = '', []
+    if queryset is not None:
+        allowed, params = queryset.order_by().values(student_id=F('pk')).query.sql_with_params()
+        join = f"JOIN ({allowed}) AS allowed ON allowed.student_id = {FTS_TABLE}.rowid "
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} {join}"
+            f"WHERE {FTS_TABLE} MATCH %s ORDER BY {FTS_TABLE}.rank LIMIT %s",
+            [*params, match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_students(query, limit=DEFAULT_LIMIT, queryset=None):
+    """
+    Students matching every word of `query` as a prefix of their
+    registration number, first name or last name, best matches first.
+    `queryset` narrows the candidates (e.g. to one teacher's classes).
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    narrowed = queryset is not None
+    queryset = (queryset if narrowed else Student.objects.all()).select_related('class_assigned')
+
+    if fts_available():
+        ids = _fts_ids(tokens, limit, queryset if narrowed else None)
+        found = queryset.in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
+
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(registration_number__icontains=token)
+            | Q(first_name__istartswith=token)
+            | Q(last_name__istartswith=token)
+        )
+    return list(queryset.filter(condition).order_by('registration_number')[:limit])
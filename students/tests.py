@@ -1,3 +1,90 @@
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from students.models import Class, Student
+from students.search import fts_available, rebuild_index, search_students
+
+
+class StudentSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form1 = Class.objects.create(name='Form 1')
+        cls.form2 = Class.objects.create(name='Form 2')
+
+    def make(self, reg_no, first, last, school_class=None):
+        return Student.objects.create(
+            first_name=first, last_name=last, email=f'{reg_no}@example.com', password='!',
+            date_of_birth='2010-01-01', phone_number='1', registration_number=reg_no,
+            class_assigned=school_class or self.form1,
+        )
+
+    def regs(self, *args, **kwargs):
+        return [s.registration_number for s in search_students(*args, **kwargs)]
+
+    def test_search_uses_the_full_text_index(self):
+        self.assertTrue(fts_available())
+
+    def test_matches_name_and_registration_number_prefixes(self):
+        self.make('VSS2025-0012', 'Amina', 'Otieno')
+        self.make('VSS2025-0120', 'Brian', 'Kamau')
+
+        self.assertEqual(self.regs('ami'), ['VSS2025-0012'])
+        self.assertEqual(self.regs('kam'), ['VSS2025-0120'])
+        self.assertEqual(self.regs('0012'), ['VSS2025-0012'])
+        self.assertEqual(sorted(self.regs('VSS2025-0')), ['VSS2025-0012', 'VSS2025-0120'])
+        self.assertEqual(self.regs('amina otieno'), ['VSS2025-0012'])
+        self.assertEqual(self.regs('amina kamau'), [])
+
+    def test_saves_and_deletes_keep_the_index_in_step(self):
+        student = self.make('VSS2025-0031', 'Chloe', 'Wanjiru')
+        student.last_name = 'Njeri'
+        student.save()
+        self.assertEqual(self.regs('wanjiru'), [])
+        self.assertEqual(self.regs('njeri'), ['VSS2025-0031'])
+
+        student.delete()
+        self.assertEqual(self.regs('chloe'), [])
+
+    def test_rebuild_picks_up_rows_written_without_signals(self):
+        self.make('VSS2025-0040', 'David', 'Mwangi')
+        Student.objects.filter(registration_number='VSS2025-0040').update(first_name='Daudi')
+        self.assertEqual(self.regs('daudi'), [])
+
+        self.assertEqual(rebuild_index(), 1)
+        self.assertEqual(self.regs('daudi'), ['VSS2025-0040'])
+
+    def test_narrowing_applies_before_the_limit(self):
+        for i in range(12):
+            self.make(f'VSS2025-05{i:02d}', 'Esther', 'Achieng', self.form2)
+        mine = self.make('VSS2025-0600', 'Esther', 'Achieng Odhiambo', self.form1)
+
+        found = search_students('esther achieng', limit=1, queryset=Student.objects.filter(class_assigned=self.form1))
+        self.assertEqual(found, [mine])
+        self.assertEqual(len(search_students('esther', limit=5)), 5)
+
+
+class RegistrationNumberLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(
+            first_name='Faith', last_name='Chebet', email='f@example.com', password='!',
+            date_of_birth='2010-01-01', phone_number='1', registration_number='VSS2025-0077',
+        )
+
+    def test_any_case_and_surrounding_spaces_match(self):
+        for typed in ('VSS2025-0077', 'vss2025-0077', ' Vss2025-0077 '):
+            with self.subTest(typed=typed):
+                self.assertEqual(Student.objects.by_registration_number(typed).get(), self.student)
+
+    def test_partial_or_empty_input_matches_nothing(self):
+        for typed in ('vss2025-007', '', None):
+            with self.subTest(typed=typed):
+                self.assertFalse(Student.objects.by_registration_number(typed).exists())
+
+    def test_lookup_uses_the_expression_index(self):
+        queryset = Student.objects.by_registration_number('vss2025-0077')
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('student_reg_upper_idx', plan)
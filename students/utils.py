@@ -1,7 +1,8 @@
-from django.core.mail import send_mail
 from django.conf import settings
+from coreapp.outbox import enqueue
 
-def send_registration_email(email, reg_no):
+def registration_email(reg_no):
+    """Subject and body of the email telling an applicant how to register."""
     link = f"{settings.SITE_URL}/students/register/?reg_no={reg_no}"  # e.g. http://127.0.0.1:8000
     subject = "Application Received – Complete Your Registration"
     message = (
@@ -10,4 +11,8 @@ def send_registration_email(email, reg_no):
         f"Once approved, you will be able to complete registration using this link:\n{link}\n\n"
         f"Regards,\nSchool Administration"
     )
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email], fail_silently=False)
+    return subject, message
+
+def send_registration_email(email, reg_no):
+    subject, message = registration_email(reg_no)
+    enqueue(subject, message, [email])
@@ -1,18 +1,25 @@
+import time
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.core.exceptions import ValidationError
 from django.contrib import messages
-from django.contrib.auth.hashers import make_password, check_password
+from coreapp.passwords import HasherBusy, hash_password, verify_password
+from coreapp.throttle import throttle_attempt, throttled_message
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.tokens import PasswordResetTokenGenerator, default_token_generator
 from .utils import send_registration_email
 from django.views.decorators.csrf import csrf_exempt
 
 from .models import Student
+from coreapp.identity import student_required
+from coreapp.outbox import enqueue
 from .forms import ForgotPasswordForm, ResetPasswordForm
 from students.models import Class
 from staff.models import StudentApplication
+from staff.registration import next_registration_number
+from staff.intake import class_is_open, intake_mode, next_intake_registration_number, spool_application
 
 
 # Custom token generator for students
@@ -40,24 +47,49 @@ def student_apply(request):
             messages.error(request, "Please fill in all required fields.")
             return redirect('students:apply')
 
-        # ✅ Generate registration number safely
-        last_app = StudentApplication.objects.order_by('id').last()
-        new_id = (last_app.id + 1) if last_app else 1
-        reg_no = f"VSS2025-{new_id:04d}"
-
-        # ✅ Get selected class
-        applied_class = Class.objects.get(id=applied_class_id)
+        # ✅ Check the class (against the cached list in spool mode)
+        if not applied_class_id.isdigit() or not class_is_open(int(applied_class_id)):
+            messages.error(request, "Please choose one of the listed classes.")
+            return redirect('students:apply')
 
-        # ✅ Create and save the application
-        student_app = StudentApplication.objects.create(
+        # ✅ Check lengths and the email address before anything is saved or spooled
+        application = StudentApplication(
             student_name=name,
             email=email,
-            registration_number=reg_no,
-            applied_class=applied_class,
+            applied_class_id=int(applied_class_id),
             previous_grade_level=prev_grade_level,
             previous_grade_results=prev_grade_results,
-            status='pending'
+            status='pending',
         )
+        try:
+            application.full_clean(exclude=['registration_number', 'applied_class'], validate_unique=False)
+        except ValidationError as exc:
+            for field, errors in exc.message_dict.items():
+                label = StudentApplication._meta.get_field(field).verbose_name
+                messages.error(request, f"{label.capitalize()}: {errors[0]}")
+            return redirect('students:apply')
+
+        if intake_mode() == 'spool':
+            # surge mode: no database write here; flush_admissions saves it shortly
+            reg_no = next_intake_registration_number()
+            spool_application({
+                'student_name': name,
+                'email': email,
+                'registration_number': reg_no,
+                'applied_class_id': int(applied_class_id),
+                'previous_grade_level': prev_grade_level,
+                'previous_grade_results': prev_grade_results,
+                'spooled_at': time.time(),
+            })
+            messages.success(request, "Your application has been received! Please wait for approval.")
+            return redirect('students:application_success', reg_no=reg_no)
+
+        # ✅ Generate registration number safely (atomic per-year sequence)
+        reg_no = next_registration_number()
+
+        # ✅ Save the application
+        application.registration_number = reg_no
+        application.save()
 
         messages.success(request, "Your application has been submitted successfully! Please wait for approval.")
         return redirect('students:application_success', reg_no=reg_no)
@@ -86,18 +118,29 @@ def student_register(request):
         return redirect('students:student_login')
 
     if request.method == "POST":
+        wait = throttle_attempt(request, 'student_register', reg_no)
+        if wait:
+            messages.error(request, throttled_message(wait))
+            return redirect(f"{request.path}?reg_no={reg_no}")
+
         email = request.POST.get('email')
         if Student.objects.filter(email=email).exists():
             messages.error(request, "This email is already registered.")
             return redirect(f"{request.path}?reg_no={reg_no}")
 
+        try:
+            hashed = hash_password(request.POST.get('password'))
+        except HasherBusy:
+            messages.error(request, "The server is busy. Please try again in a moment.")
+            return redirect(f"{request.path}?reg_no={reg_no}")
+
         try:
             Student.objects.create(
                 registration_number=application.registration_number,
                 first_name=request.POST.get('first_name'),
                 last_name=request.POST.get('last_name'),
                 email=email,
-                password=make_password(request.POST.get('password')),
+                password=hashed,
                 date_of_birth=request.POST.get('date_of_birth'),
                 phone_number=request.POST.get('phone_number'),
                 photo=request.FILES.get('photo') or None
@@ -127,6 +170,12 @@ def student_login(request):
         reg_no = request.POST.get("reg_no", "").strip()
         password = request.POST.get("password", "")
 
+        # rejected before the database or the hasher is touched
+        wait = throttle_attempt(request, 'student_login', reg_no)
+        if wait:
+            messages.error(request, throttled_message(wait))
+            return render(request, "students/login.html", status=429)
+
         try:
             student = Student.objects.get(registration_number=reg_no)
         except Student.DoesNotExist:
@@ -136,7 +185,12 @@ def student_login(request):
         # Determine if stored password is hashed
         if student.password.startswith('pbkdf2_') or student.password.startswith('argon2$'):
             # hashed password
-            if check_password(password, student.password):
+            try:
+                valid = verify_password(password, student.password)
+            except HasherBusy:
+                messages.error(request, "The server is busy. Please try again in a moment.")
+                return redirect("students:student_login")
+            if valid:
                 request.session['student_id'] = student.id
                 return redirect("students:dashboard")
             else:
@@ -146,8 +200,11 @@ def student_login(request):
             # plain password
             if password == student.password:
                 # Optionally hash plain password after successful login
-                student.password = make_password(password)
-                student.save()
+                try:
+                    student.password = hash_password(password)
+                    student.save()
+                except HasherBusy:
+                    pass  # hash it on a later login
                 request.session['student_id'] = student.id
                 return redirect("students:dashboard")
             else:
@@ -158,15 +215,10 @@ def student_login(request):
 
 
 
+@student_required
 def dashboard(request):
     """Displays student dashboard."""
-    student_id = request.session.get('student_id')
-    if not student_id:
-        messages.error(request, "Please log in to access your dashboard.")
-        return redirect('students:login')
-
-    student = get_object_or_404(Student, id=student_id)
-    return render(request, 'students/dashboard.html', {'student': student})
+    return render(request, 'students/dashboard.html', {'student': request.student})
 
 
 def student_logout(request):
@@ -193,18 +245,16 @@ def forgot_password(request):
                 token = student_token_generator.make_token(student)
                 reset_link = request.build_absolute_uri(f"/students/reset-password/{uid}/{token}/")
 
-                # Send reset email
-                send_mail(
-                    subject="Password Reset Request",
-                    message=(
+                # Queue the reset email; the outbox sends it in the background
+                enqueue(
+                    "Password Reset Request",
+                    (
                         f"Dear {student.first_name},\n\n"
                         "You requested to reset your password.\n"
                         f"Click the link below to set a new password:\n{reset_link}\n\n"
                         "If you didn’t request this, please ignore this email."
                     ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[student.email],
-                    fail_silently=False,
+                    [student.email],
                 )
 
                 messages.success(request, "Password reset link sent to your email.")
@@ -227,13 +277,21 @@ def reset_password(request, uidb64, token):
 
     if student and default_token_generator.check_token(student, token):
         if request.method == 'POST':
+            wait = throttle_attempt(request, 'reset_password', student.pk)
+            if wait:
+                messages.error(request, throttled_message(wait))
+                return redirect(request.path)
             form = ResetPasswordForm(request.POST)
             if form.is_valid():
                 new_password = form.cleaned_data['new_password']
-                student.set_password(new_password)
+                try:
+                    student.password = hash_password(new_password)
+                except HasherBusy:
+                    messages.error(request, "The server is busy. Please try again in a moment.")
+                    return redirect(request.path)
                 student.save()
                 messages.success(request, "Password has been reset successfully.")
-                return redirect('students:login')
+                return redirect('students:student_login')
         else:
             form = ResetPasswordForm()
         return render(request, 'students/reset_password.html', {'form': form})
@@ -249,11 +307,6 @@ def view_calendar(request):
 
 def view_timetable(request):
     return render(request, 'students/timetable.html')
+@student_required
 def view_profile(request):
-    registration_number = request.session.get('student_id')
-    if not student_id:
-        messages.error(request, "Please log in to access your profile.")
-        return redirect('students:login')
-
-    student = get_object_or_404(Student, id=student_id)
-    return render(request, 'students/profile.html', {'student': student})
\ No newline at end of file
+    return render(request, 'students/profile.html', {'student': request.student})
\ No newline at end of file
@@ -1,3 +1,291 @@
-from django.test import TestCase
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from coreapp.querybudget import QueryBudgetTestMixin
+from results.bulk import import_gradebook
+from results.models import Mark, Term, TermSummary
+from students.models import Class, Student
+from teachers.models import Subject, Teacher
+
+
+class TeacherDashboardQueryTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create(national_id='1', full_name='T One', email='t@example.com', password='!')
+        school_class = Class.objects.create(name='Form 1')
+        cls.student = Student.objects.create(
+            first_name='Amina', last_name='Otieno', email='a@example.com', password='!',
+            date_of_birth='2010-01-01', phone_number='1', registration_number='VSS2025-0001',
+            class_assigned=school_class,
+        )
+        cls.term = Term.objects.create(name='Term 1')
+        for i in range(6):
+            cls.subject = Subject.objects.create(name=f'Subject {i}', class_assigned=school_class)
+            Mark.objects.create(student=cls.student, subject=cls.subject, term=cls.term, score=50 + i)
+        cls.teacher.subjects.add(cls.subject)
+        cls.classmates = [
+            Student.objects.create(
+                first_name='Pupil', last_name=str(i), email=f'p{i}@example.com', password='!',
+                date_of_birth='2010-01-01', phone_number='1', registration_number=f'VSS2025-01{i:02d}',
+                class_assigned=school_class,
+            )
+            for i in range(10)
+        ]
+
+    def setUp(self):
+        session = self.client.session
+        session['teacher_id'] = self.teacher.id
+        session.save()
+
+    def test_dashboard_marks_table_has_no_n_plus_one(self):
+        with self.assertQueryBudget(12):
+            response = self.client.get('/teachers/dashboard/', {'registration_number': 'VSS2025-0001'})
+        self.assertContains(response, 'Subject 5')
+
+    def test_autocomplete_budget(self):
+        with self.assertQueryBudget(5):
+            response = self.client.get('/teachers/students/search/', {'q': 'otie'})
+        self.assertEqual(response.json()['results'][0]['registration_number'], 'VSS2025-0001')
+
+    def test_gradebook_loads_whole_class_within_budget(self):
+        with self.assertQueryBudget(8):
+            response = self.client.get('/teachers/gradebook/', {'subject': self.subject.id, 'term': self.term.id})
+        self.assertEqual(len(response.context['rows']), 11)
+
+    def test_gradebook_saves_only_changed_cells(self):
+        data = {'subject': self.subject.id, 'term': self.term.id}
+        for student, score, original in [(self.student, '55.00', '55.00'), (self.classmates[0], '61', ''),
+                                         (self.classmates[1], '', '')]:
+            data.update({
+                f'score_{student.id}': score, f'original_score_{student.id}': original,
+                f'comment_{student.id}': '', f'original_comment_{student.id}': '',
+            })
+        self.client.post('/teachers/gradebook/', data)
+        marks = Mark.objects.filter(subject=self.subject, term=self.term)
+        self.assertEqual(sorted(marks.values_list('score', flat=True)), [55, 61])
+
+
+@override_settings(LOGIN_THROTTLE_LIMITS={'identity': (3, 300), 'ip': (100, 300)})
+class TeacherLoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_rejects_excess_attempts_for_one_national_id(self):
+        attempts = [
+            self.client.post('/teachers/login/', {'national_id': '42', 'password': 'guess'}).status_code
+            for _ in range(4)
+        ]
+        self.assertEqual(attempts, [200, 200, 200, 429])
+        # another identity from the same address still gets through
+        response = self.client.post('/teachers/login/', {'national_id': '43', 'password': 'guess'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_attacker_cannot_lock_the_owner_out(self):
+        guess = {'national_id': '42', 'password': 'guess'}
+        for _ in range(4):
+            self.client.post('/teachers/login/', guess, REMOTE_ADDR='10.0.0.9')
+        response = self.client.post('/teachers/login/', guess, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 200)
+
+
+    @override_settings(LOGIN_THROTTLE_LIMITS={'identity': (3, 300), 'account': (6, 900), 'ip': (100, 300)})
+    def test_guessing_from_many_addresses_hits_the_account_limit(self):
+        guess = {'national_id': '42', 'password': 'guess'}
+        attempts = [
+            self.client.post('/teachers/login/', guess, REMOTE_ADDR=f'10.0.{i}.1').status_code
+            for i in range(7)
+        ]
+        self.assertEqual(attempts, [200] * 6 + [429])
+
+class TeacherPasswordTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = Teacher(national_id='7', full_name='T Seven', email='t7@example.com')
+        self.teacher.set_password('s3cret-pass')
+        self.teacher.save()
+
+    def test_login_with_the_right_password(self):
+        response = self.client.post('/teachers/login/', {'national_id': '7', 'password': 's3cret-pass'})
+        self.assertRedirects(response, '/teachers/dashboard/', fetch_redirect_response=False)
+        self.assertEqual(self.client.session['teacher_id'], self.teacher.id)
+
+    def test_busy_hasher_is_handled_by_the_view_only(self):
+        with mock.patch('coreapp.passwords._slots', threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()  # every slot taken
+            response = self.client.post('/teachers/login/', {'national_id': '7', 'password': 's3cret-pass'})
+            self.assertContains(response, 'The server is busy')
+            self.assertNotIn('teacher_id', self.client.session)
+            # the model methods never go through the limiter
+            self.assertTrue(self.teacher.check_password('s3cret-pass'))
+
+
+class GradebookUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create(national_id='9', full_name='T Nine', email='t9@example.com', password='!')
+        form1 = Class.objects.create(name='Form 1')
+        form2 = Class.objects.create(name='Form 2')
+        cls.maths = Subject.objects.create(name='Mathematics', class_assigned=form1)
+        cls.teacher.subjects.add(cls.maths)
+        Subject.objects.create(name='Mathematics', class_assigned=form2)  # someone else's class
+        cls.term = Term.objects.create(name='Term 1', is_active=True)
+        cls.students = [
+            Student.objects.create(
+                first_name='Pupil', last_name=str(i), email=f'g{i}@example.com', password='!',
+                date_of_birth='2010-01-01', phone_number='1', registration_number=f'VSS2025-03{i:02d}',
+                class_assigned=form2 if i == 3 else form1,
+            )
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        session = self.client.session
+        session['teacher_id'] = self.teacher.id
+        session.save()
+
+    def sheet(self, *rows):
+        lines = ['registration_number,subject,term,score,comment', *rows]
+        return SimpleUploadedFile('marks.csv', '\n'.join(lines).encode(), content_type='text/csv')
+
+    def test_valid_rows_are_saved_with_their_summaries(self):
+        response = self.client.post('/teachers/upload-marks/', {'gradebook': self.sheet(
+            'VSS2025-0300,mathematics,term 1,81,Well done',
+            f'VSS2025-0301,MATHEMATICS,{self.term.id},64,',
+        )})
+
+        self.assertEqual(response.context['saved'], 2)
+        self.assertEqual(response.context['errors'], [])
+        marks = Mark.objects.filter(subject=self.maths, term=self.term).order_by('student_id')
+        self.assertEqual([(m.score, m.comment) for m in marks], [(81, 'Well done'), (64, '')])
+        summary = TermSummary.objects.get(student=self.students[0], term=self.term)
+        self.assertEqual((summary.mark_count, summary.position), (1, 1))
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        response = self.client.post('/teachers/upload-marks/', {'gradebook': self.sheet(
+            'VSS2025-0300,Mathematics,Term 1,70,',
+            ',Mathematics,Term 1,70,',
+            'VSS2099-0001,Mathematics,Term 1,70,',
+            'VSS2025-0301,Physics,Term 1,70,',
+            'VSS2025-0303,Mathematics,Term 1,70,',
+            'VSS2025-0302,Mathematics,Term 9,70,',
+            'VSS2025-0302,Mathematics,Term 1,101,',
+        )})
+
+        self.assertEqual(response.context['saved'], 1)
+        self.assertEqual(
+            [(e['line'], e['error']) for e in response.context['errors']],
+            [
+                (3, "Missing registration number."),
+                (4, "No student with this registration number."),
+                (5, "'Physics' is not one of your subjects."),
+                (6, "You don't teach Mathematics to this student's class."),
+                (7, "Unknown term 'Term 9'."),
+                (8, "Score '101' must be a number from 0 to 100."),
+            ],
+        )
+        self.assertEqual(Mark.objects.count(), 1)
+
+    def test_reimport_updates_marks_in_place(self):
+        self.client.post('/teachers/upload-marks/', {'gradebook': self.sheet('VSS2025-0300,Mathematics,Term 1,50,')})
+        self.client.post('/teachers/upload-marks/', {'gradebook': self.sheet(
+            'VSS2025-0300,Mathematics,Term 1,75,Improved',
+        )})
+
+        mark = Mark.objects.get()
+        self.assertEqual((mark.score, mark.comment), (75, 'Improved'))
+        self.assertEqual(TermSummary.objects.get(student=self.students[0]).average, 75)
+
+    def test_large_sheets_are_read_in_chunks(self):
+        upload = self.sheet(*(
+            f'VSS2025-030{i % 3},Mathematics,Term 1,{60 + i},' for i in range(7)
+        ))
+        saved, errors = import_gradebook(upload, self.teacher, chunk_size=2)
+
+        self.assertEqual((saved, errors), (3, []))
+        # the last row for each student wins, even when it lands in a later chunk
+        self.assertEqual(
+            sorted(Mark.objects.values_list('student__registration_number', 'score')),
+            [('VSS2025-0300', 66), ('VSS2025-0301', 64), ('VSS2025-0302', 65)],
+        )
+
+
+class AddMarksLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create(national_id='11', full_name='T Eleven', email='t11@example.com', password='!')
+        cls.form1 = Class.objects.create(name='Form 1')
+        cls.form2 = Class.objects.create(name='Form 2')
+        cls.teacher.classes.add(cls.form1)
+        cls.maths = Subject.objects.create(name='Mathematics', class_assigned=cls.form1)
+        cls.other_maths = Subject.objects.create(name='Mathematics', class_assigned=cls.form2)
+        cls.teacher.subjects.add(cls.maths, cls.other_maths)
+        cls.unassigned = Subject.objects.create(name='Physics', class_assigned=cls.form1)
+        cls.term = Term.objects.create(name='Term 1', is_active=True)
+        # registration numbers that share prefixes: VSS2025-001 < VSS2025-0010 < VSS2025-0011 ...
+        regs = ['VSS2025-001', *(f'VSS2025-001{i}' for i in range(10)), 'VSS2025-002', 'VSS2025-0020']
+        cls.mine = [cls.make(reg, cls.form1) for reg in regs]
+        cls.theirs = cls.make('VSS2025-0015X', cls.form2)
+
+    @classmethod
+    def make(cls, reg_no, school_class):
+        return Student.objects.create(
+            first_name='Pupil', last_name=reg_no.split('-')[1], email=f'{reg_no}@example.com', password='!',
+            date_of_birth='2010-01-01', phone_number='1', registration_number=reg_no,
+            class_assigned=school_class,
+        )
+
+    def setUp(self):
+        cache.clear()
+        session = self.client.session
+        session['teacher_id'] = self.teacher.id
+        session.save()
+
+    def lookup(self, **params):
+        return self.client.get('/teachers/students/lookup/', params).json()
+
+    def test_pages_walk_every_student_once_in_order(self):
+        seen, after = [], ''
+        with mock.patch('teachers.views.STUDENT_PAGE_SIZE', 4):
+            while True:
+                page = self.lookup(after=after)
+                self.assertLessEqual(len(page['results']), 4)
+                seen += [row['registration_number'] for row in page['results']]
+                if not page['next']:
+                    break
+                after = page['next']
+
+        self.assertEqual(seen, sorted(s.registration_number for s in self.mine))
+
+    def test_other_classes_stay_hidden(self):
+        regs = [row['registration_number'] for row in self.lookup(q='VSS2025-0015')['results']]
+        self.assertEqual(regs, ['VSS2025-0015'])
+        self.assertEqual(self.lookup(q='VSS2025-0015X')['results'], [])
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get('/teachers/students/lookup/', {'after': 'VSS2025-001|x'})
+        self.assertEqual(response.status_code, 400)
+
+    def post_mark(self, student, subject, score='72'):
+        response = self.client.post('/teachers/add-marks/', {
+            'student_id': student.id, 'subject': subject.id, 'term': self.term.id, 'score': score,
+        }, follow=True)
+        return [str(m) for m in response.context['messages']]
+
+    def test_add_marks_records_and_updates(self):
+        self.assertEqual(self.post_mark(self.mine[0], self.maths)[0][:13], 'Mark recorded')
+        self.assertEqual(self.post_mark(self.mine[0], self.maths, '80')[0][:12], 'Mark updated')
+        self.assertEqual(Mark.objects.get().score, 80)
+
+    def test_add_marks_rejects_what_the_teacher_does_not_teach(self):
+        self.assertEqual(self.post_mark(self.mine[0], self.unassigned), ["Pick one of your subjects."])
+        self.assertEqual(self.post_mark(self.theirs, self.other_maths), ["Pick one of the students in your classes."])
+        self.assertEqual(
+            self.post_mark(self.mine[0], self.other_maths), ["Pupil 001 doesn't take Mathematics - Form 2."],
+        )
+        self.assertFalse(Mark.objects.exists())
 
-# Create your tests here.
@@ -6,6 +6,10 @@ urlpatterns = [
     path('dashboard/', views.teacher_dashboard, name='teacher_dashboard'),
     path('logout/', views.teacher_logout, name='teacher_logout'),
     path('add-marks/', views.add_marks, name='add_marks'),
+    path('students/lookup/', views.student_lookup, name='student_lookup'),
+    path('upload-marks/', views.upload_marks, name='upload_marks'),
+    path('gradebook/', views.gradebook, name='gradebook'),
+    path('students/search/', views.student_search, name='student_search'),
     path('signup/', views.teacher_signup, name='teacher_signup'),
 
 ]
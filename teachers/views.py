@@ -1,11 +1,20 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from django.db.models import F, FilteredRelation, Q
+from django.http import JsonResponse
+from django.urls import reverse
 from .models import Teacher
 from django.shortcuts import get_object_or_404
 from students.models import Student
-from django.contrib.auth.hashers import make_password
+from students.search import DEFAULT_LIMIT, MAX_LIMIT, search_students
+from coreapp.passwords import HasherBusy, hash_password, verify_password
+from coreapp.throttle import throttle_attempt, throttled_message
 from .models import Teacher, Subject, Class
 from results.models import Term, Mark
+from results.terms import get_active_term, get_term, get_terms
+from results.bulk import GRADEBOOK_COLUMNS, GradebookError, import_gradebook, parse_score, upsert_marks
+from coreapp.identity import teacher_required
+from coreapp.querybudget import query_budget
 
 
 def teacher_login(request):
@@ -13,9 +22,14 @@ def teacher_login(request):
         national_id = request.POST.get('national_id')
         password = request.POST.get('password')
 
+        wait = throttle_attempt(request, 'teacher_login', national_id)
+        if wait:
+            messages.error(request, throttled_message(wait))
+            return render(request, 'teachers/login.html', status=429)
+
         try:
             teacher = Teacher.objects.get(national_id=national_id)
-            if teacher.check_password(password):
+            if verify_password(password, teacher.password):
                 request.session['teacher_id'] = teacher.id
                 messages.success(request, f"Welcome {teacher.full_name}!")
                 return redirect('teacher_dashboard')
@@ -23,33 +37,32 @@ def teacher_login(request):
                 messages.error(request, 'Invalid password')
         except Teacher.DoesNotExist:
             messages.error(request, 'No teacher found with that National ID')
+        except HasherBusy:
+            messages.error(request, "The server is busy. Please try again in a moment.")
 
     return render(request, 'teachers/login.html')
 
 
+@teacher_required
+@query_budget(12)
 def teacher_dashboard(request):
-    # Ensure teacher is logged in
-    teacher_id = request.session.get('teacher_id')
-    if not teacher_id:
-        messages.error(request, "Please login first")
-        return redirect('teacher_login')
-
-    teacher = get_object_or_404(Teacher, id=teacher_id)
+    teacher = request.teacher
     subjects = teacher.subjects.all()
-    terms = Term.objects.all()
+    terms = get_terms()
 
     search_reg = request.GET.get('registration_number')
-    students = Student.objects.all()
+    students = []
     student = None  # ✅ Define early to avoid UnboundLocalError
 
     if search_reg:
-        students = students.filter(registration_number__icontains=search_reg)
-        try:
-            student = Student.objects.get(registration_number=search_reg)
-        except Student.DoesNotExist:
+        students = search_students(search_reg, limit=MAX_LIMIT)
+        # an exact registration number selects that student, as does a single match
+        wanted = search_reg.strip().lower()
+        student = next((s for s in students if s.registration_number.lower() == wanted), None)
+        if student is None and len(students) == 1:
+            student = students[0]
+        if not students:
             messages.warning(request, "Student not found")
-    else:
-        students = []
 
     # Handle adding marks
     if request.method == 'POST':
@@ -63,7 +76,9 @@ def teacher_dashboard(request):
             try:
                 student = Student.objects.get(registration_number=student_reg)
                 subject = Subject.objects.get(id=subject_id)
-                term = Term.objects.get(id=term_id)
+                term = get_term(term_id)
+                if term is None:
+                    raise Term.DoesNotExist
 
                 Mark.objects.update_or_create(
                     student=student,
@@ -74,7 +89,7 @@ def teacher_dashboard(request):
                 messages.success(request, f"Mark recorded for {student.first_name + ' ' + student.last_name}")
 
                 search_reg = student.registration_number
-                students = Student.objects.filter(registration_number__icontains=search_reg)
+                students = [student]
 
             except Student.DoesNotExist:
                 messages.error(request, "No student found with that registration number")
@@ -84,7 +99,10 @@ def teacher_dashboard(request):
                 messages.error(request, "Selected term not found")
 
     # ✅ Safe mark retrieval
-    marks_records = Mark.objects.filter(student=student) if student else []
+    marks_records = (
+        Mark.objects.filter(student=student).select_related('student', 'subject', 'term')
+        if student else []
+    )
 
     return render(request, 'teachers/dashboard.html', {
         'teacher': teacher,
@@ -95,38 +113,235 @@ def teacher_dashboard(request):
         'marks_records': marks_records,
     })
 
+@teacher_required(json=True)
+@query_budget(5)
+def student_search(request):
+    """JSON autocomplete for the dashboard search box."""
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+
+    results = [
+        {
+            'id': s.id,
+            'registration_number': s.registration_number,
+            'name': s.full_name,
+            'class': s.class_assigned.name if s.class_assigned else '',
+        }
+        for s in search_students(request.GET.get('q', ''), limit=limit)
+    ]
+    return JsonResponse({'results': results})
+
 def teacher_logout(request):
     request.session.flush()
     messages.info(request, "You have been logged out.")
     return redirect('teacher_login')
 
 
+STUDENT_PAGE_SIZE = 20
+
+
+def _teacher_students(teacher):
+    """Students in the classes this teacher is assigned to (Teacher.classes)."""
+    return Student.objects.filter(class_assigned__teachers=teacher.pk)
+
+
+@teacher_required(json=True)
+@query_budget(5)
+def student_lookup(request):
+    """
+    One page of the teacher's own students as JSON, ordered by registration
+    number. Pass the returned `next` cursor as ?after= for the following
+    page; the page size stays the same however many students there are.
+    """
+    students = _teacher_students(request.teacher).select_related('class_assigned')
+
+    q = request.GET.get('q', '').strip()
+    if q:
+        students = students.filter(
+            Q(registration_number__istartswith=q) | Q(first_name__istartswith=q) | Q(last_name__istartswith=q)
+        )
+
+    after = request.GET.get('after', '')
+    if after:
+        reg_no, _, last_id = after.rpartition('|')
+        if not last_id.isdigit():
+            return JsonResponse({'error': "Bad cursor"}, status=400)
+        students = students.filter(
+            Q(registration_number__gt=reg_no) | Q(registration_number=reg_no, id__gt=int(last_id))
+        )
+
+    page = list(students.order_by('registration_number', 'id')[:STUDENT_PAGE_SIZE + 1])
+    more = len(page) > STUDENT_PAGE_SIZE
+    page = page[:STUDENT_PAGE_SIZE]
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': s.id,
+                'registration_number': s.registration_number,
+                'name': s.full_name,
+                'class': s.class_assigned.name if s.class_assigned else '',
+            }
+            for s in page
+        ],
+        'next': f"{page[-1].registration_number}|{page[-1].id}" if more else None,
+    })
+
+
+@teacher_required
 def add_marks(request):
-    teacher_id = request.session.get('teacher_id')
-    if not teacher_id:
-        messages.error(request, "Please log in first.")
-        return redirect('teacher_login')
+    teacher = request.teacher
+    subjects = teacher.subjects.all()
+    terms = get_terms()
+    active_term = get_active_term()
+
+    if request.method == 'POST':
+        student = _teacher_students(teacher).filter(id=request.POST.get('student_id') or 0).first()
+        subject = next((s for s in subjects if str(s.id) == request.POST.get('subject')), None)
+        term_id = request.POST.get('term')
+        term = get_term(term_id) if term_id else active_term
+        score = parse_score(request.POST.get('score', '').strip())
+
+        if student is None:
+            messages.error(request, "Pick one of the students in your classes.")
+        elif subject is None:
+            messages.error(request, "Pick one of your subjects.")
+        elif subject.class_assigned_id != student.class_assigned_id:
+            messages.error(request, f"{student.full_name} doesn't take {subject}.")
+        elif term is None:
+            messages.error(request, "Pick a term.")
+        elif score is None:
+            messages.error(request, "Score must be a number from 0 to 100.")
+        else:
+            _, created = Mark.objects.update_or_create(
+                student=student,
+                subject=subject,
+                term=term,
+                defaults={'score': score, 'comment': request.POST.get('comment', ''), 'teacher': teacher},
+            )
+            messages.success(
+                request,
+                f"Mark {'recorded' if created else 'updated'} for {student.full_name} - {subject.name}, {term.name}",
+            )
+        return redirect('add_marks')
+
+    return render(request, 'teachers/add_marks.html', {
+        'subjects': subjects,
+        'terms': terms,
+        'active_term': active_term,
+    })
+
+
+@teacher_required
+def upload_marks(request):
+    """Record a whole sheet of marks (CSV or XLSX) in one go."""
+    teacher = request.teacher
+    saved = None
+    errors = []
+
+    if request.method == 'POST':
+        upload = request.FILES.get('gradebook')
+        if not upload:
+            messages.error(request, "Please choose a CSV or Excel file to upload.")
+        else:
+            try:
+                saved, errors = import_gradebook(upload, teacher)
+            except GradebookError as e:
+                messages.error(request, str(e))
+            else:
+                if saved:
+                    messages.success(request, f"{saved} mark(s) saved.")
+                if errors:
+                    messages.warning(request, f"{len(errors)} row(s) were skipped. See the report below.")
 
-    teacher = Teacher.objects.get(id=teacher_id)
+    return render(request, 'teachers/upload_marks.html', {
+        'teacher': teacher,
+        'columns': GRADEBOOK_COLUMNS,
+        'saved': saved,
+        'errors': errors,
+    })
+
+
+@teacher_required
+@query_budget(8)
+def gradebook(request):
+    """Every student in a class against one subject and term, saved in one go."""
+    teacher = request.teacher
     subjects = teacher.subjects.all()
-    students = Student.objects.all()  # optionally filter by class
+    terms = get_terms()
+
+    params = request.POST if request.method == 'POST' else request.GET
+    subject_id = params.get('subject')
+    subject = next((s for s in subjects if str(s.id) == subject_id), None)
+    term = get_term(params.get('term')) if params.get('term') else get_active_term()
+
+    if subject is None or term is None:
+        return render(request, 'teachers/gradebook.html', {
+            'teacher': teacher, 'subjects': subjects, 'terms': terms,
+            'subject': subject, 'term': term, 'rows': [],
+        })
 
     if request.method == 'POST':
-        reg_number = request.POST.get('student_reg')
-        try:
-            student = Student.objects.get(registration_number=reg_number)
-        except Student.DoesNotExist:
-            messages.error(request, 'No student found with that registration number')
-            return redirect('teacher_dashboard')
-    
-        subject_id = request.POST.get('subject')
-        score = request.POST.get('score')
-        subject = Subject.objects.get(id=subject_id)
+        roster = dict(
+            Student.objects.filter(class_assigned_id=subject.class_assigned_id)
+            .values_list('id', 'registration_number')
+        )
+        marks, invalid = [], []
+        for student_id, reg_no in roster.items():
+            # unchanged cells are disabled in the browser and not sent at all
+            score = request.POST.get(f'score_{student_id}')
+            if score is None:
+                continue
+            score = score.strip()
+            comment = request.POST.get(f'comment_{student_id}', '').strip()
+            if (score == request.POST.get(f'original_score_{student_id}')
+                    and comment == request.POST.get(f'original_comment_{student_id}')):
+                continue
+            if not score:
+                continue  # a blank cell never removes a mark
+            value = parse_score(score)
+            if value is None:
+                invalid.append(reg_no)
+                continue
+            marks.append(Mark(
+                student_id=student_id, subject=subject, term=term,
+                score=value, comment=comment, teacher=teacher,
+            ))
 
-        Mark.objects.create(student=student, subject=subject, score=score)
-        messages.success(request, f"Mark recorded for {student.full_name}")
-        return redirect('teacher_dashboard')
-    return render(request, 'teachers/add_marks.html', {'subjects': subjects, 'students': students})
+        if invalid:
+            messages.error(
+                request,
+                f"Scores must be numbers from 0 to 100. Nothing was saved for: {', '.join(sorted(invalid))}.",
+            )
+        saved = upsert_marks(marks)
+        if saved:
+            messages.success(request, f"{saved} mark(s) saved for {subject.name}, {term.name}.")
+        elif not invalid:
+            messages.info(request, "No changes to save.")
+        return redirect(reverse('gradebook') + f'?subject={subject.id}&term={term.id}')
+
+    # one query: the class roster LEFT JOINed to this subject's marks for the term
+    rows = (
+        Student.objects.filter(class_assigned_id=subject.class_assigned_id)
+        .annotate(mark=FilteredRelation(
+            'result_marks',
+            condition=Q(result_marks__subject=subject, result_marks__term=term),
+        ))
+        .order_by('last_name', 'first_name', 'id')
+        .values('id', 'registration_number', 'first_name', 'last_name',
+                score=F('mark__score'), comment=F('mark__comment'))
+    )
+
+    return render(request, 'teachers/gradebook.html', {
+        'teacher': teacher,
+        'subjects': subjects,
+        'terms': terms,
+        'subject': subject,
+        'term': term,
+        'rows': rows,
+    })
 
 
 def teacher_signup(request):
@@ -136,17 +351,28 @@ def teacher_signup(request):
         email = request.POST.get('email')
         password = request.POST.get('password')
 
+        wait = throttle_attempt(request, 'teacher_signup', national_id)
+        if wait:
+            messages.error(request, throttled_message(wait))
+            return redirect('teacher_signup')
+
         # Check if National ID already exists
         if Teacher.objects.filter(national_id=national_id).exists():
             messages.error(request, 'A teacher with this National ID already exists.')
             return redirect('teacher_signup')
 
+        try:
+            hashed = hash_password(password)
+        except HasherBusy:
+            messages.error(request, "The server is busy. Please try again in a moment.")
+            return redirect('teacher_signup')
+
         # Create teacher account with hashed password
         teacher = Teacher.objects.create(
             full_name=full_name,
             national_id=national_id,
             email=email,
-            password=make_password(password)
+            password=hashed
         )
 
         messages.success(request, 'Account created successfully. You can now log in.')
@@ -54,11 +54,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'coreapp.querybudget.QueryBudgetMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'coreapp.identity.IdentityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -151,5 +153,63 @@ SITE_URL = "https://anotida2004.pythonanywhere.com"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Report card PDFs hold grades, so they live outside MEDIA_ROOT and are only
+# served through the staff download view. Staff queue them from the report
+# cards page; `manage.py generate_report_cards --queued --loop` renders them.
+REPORT_CARD_ROOT = BASE_DIR / 'var' / 'report_cards'
+SCHOOL_NAME = "Nikita Mangena High School"
+
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+
+# Cache shared by every worker process and management command. Results
+# pages, stats and the term list are invalidated by bumping version keys
+# (results.cache), which only works if every process sees the same keys; the
+# per-process default (LocMemCache) would leave other workers serving stale
+# pages. Swap in Redis or Memcached here if the host provides one.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+
+# Query budgets (coreapp.querybudget): record query counts per request and
+# warn about views over their @query_budget or repeating a query (N+1).
+QUERY_BUDGET_ENABLED = DEBUG
+QUERY_BUDGET_STRICT = False
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_REPEAT_THRESHOLD = 5
+
+# Password hashing (coreapp.passwords): at most PASSWORD_HASHER_WORKERS hashes
+# at once per process; others wait PASSWORD_HASHER_WAIT seconds, then are told
+# to retry. Login throttling (coreapp.throttle): limits are (attempts, per seconds).
+PASSWORD_HASHER_WORKERS = 2
+PASSWORD_HASHER_WAIT = 0
+LOGIN_THROTTLE_LIMITS = {
+    'identity': (5, 300),
+    'account': (20, 900),
+    'ip': (30, 300),
+}
+THROTTLE_TRUST_FORWARDED_FOR = False
+
+# Registration numbers (staff.registration). Above 1, each worker reserves
+# this many numbers at a time; unused ones are skipped, never reused.
+REGISTRATION_BLOCK_SIZE = 1
+
+# Admissions intake (staff.intake). 'spool' appends applications to a journal
+# under ADMISSIONS_SPOOL_DIR and `manage.py flush_admissions --loop` writes
+# them to the database in batches; 'direct' saves each one on the request.
+ADMISSIONS_INTAKE_MODE = 'direct'
+ADMISSIONS_SPOOL_DIR = BASE_DIR / 'var' / 'admissions'
+
+# Outgoing email (coreapp.outbox). Views queue mail; `manage.py send_outbox
+# --loop` sends it, and with OUTBOX_DRAIN_ON_COMMIT a background thread also
+# drains right after each enqueue. Retries wait OUTBOX_RETRY_BASE seconds,
+# doubling up to OUTBOX_RETRY_MAX, for at most OUTBOX_MAX_ATTEMPTS tries.
+OUTBOX_DRAIN_ON_COMMIT = True
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE = 60
+OUTBOX_RETRY_MAX = 6 * 3600